@@ -0,0 +1,130 @@
+"""
+Measures how long the analyzer spends per AST node on expression heavy code,
+along with the cost of finding each node's handler on its own, both through
+the dispatch tables and by building the method name as the analyzer used to.
+Run it from the root of the repository
+
+    python benchmarks/bench_dispatch.py --statements 20000
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules import pyanalyzer  # noqa: E402
+from modules import pytranslator  # noqa: E402
+
+
+def generate_script(statement_count):
+    """
+    Generates module level code made of long arithmetic, comparison and
+    boolean expressions over a few variables
+
+    Parameters
+    ----------
+    statement_count : int
+        Number of statements to generate after the variable declarations
+
+    Returns
+    -------
+    str
+        The text of the script
+    """
+    lines = ["a = 1", "b = 2.5", "c = 3", "flag = True"]
+    for index in range(statement_count):
+        if index % 3 == 0:
+            lines.append("c = (a + c * 2 - a % 3) + (c << 1) - (a | c) + (-a)")
+        elif index % 3 == 1:
+            lines.append("b = b * 1.5 + a / 2 - c // 4 + b - a * c + 7")
+        else:
+            lines.append("flag = (a < c and c >= 2) or not (a == 3 or b > c)")
+
+    return "\n".join(lines) + "\n"
+
+
+def time_lookups(analyzer, nodes, repeat):
+    """
+    Times finding the handler of every node, without calling it
+
+    Parameters
+    ----------
+    analyzer : PyAnalyzer
+        Analyzer whose handlers are looked up
+    nodes : list of ast nodes
+        Statement and expression nodes to look up
+    repeat : int
+        Number of timed runs, the fastest is returned
+
+    Returns
+    -------
+    table_seconds : float
+        Time taken using the dispatch tables
+    name_seconds : float
+        Time taken using getattr on "parse_" + the node's class name
+    """
+    statement_handlers = analyzer.statement_handlers
+    expression_handlers = analyzer.expression_handlers
+
+    table_seconds = None
+    name_seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for node in nodes:
+            statement_handlers.get(node.__class__) or expression_handlers.get(node.__class__)
+        elapsed = time.perf_counter() - start
+        if table_seconds is None or elapsed < table_seconds:
+            table_seconds = elapsed
+
+        start = time.perf_counter()
+        for node in nodes:
+            getattr(analyzer, "parse_" + node.__class__.__name__, analyzer.parse_unhandled)
+        elapsed = time.perf_counter() - start
+        if name_seconds is None or elapsed < name_seconds:
+            name_seconds = elapsed
+
+    return table_seconds, name_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--statements", type=int, default=20000,
+                        help="number of expression statements to analyze")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of timed runs, the fastest is reported")
+    arguments = parser.parse_args()
+
+    text = generate_script(arguments.statements)
+    tree = ast.parse(text)
+    lines = text.splitlines()
+    nodes = [node for node in ast.walk(tree)
+             if isinstance(node, (ast.stmt, ast.expr))]
+    node_count = len(nodes)
+
+    best = None
+    for _ in range(arguments.repeat):
+        output_files = pytranslator.PyTranslator.create_output_files()
+        analyzer = pyanalyzer.PyAnalyzer(output_files, lines)
+
+        start = time.perf_counter()
+        analyzer.analyze(tree.body, 0, "0", 1)
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    table_seconds, name_seconds = time_lookups(analyzer, nodes, arguments.repeat)
+
+    print(json.dumps({"statements": arguments.statements,
+                      "nodes": node_count,
+                      "seconds": round(best, 4),
+                      "ns_per_node": round(best * 1e9 / node_count, 1),
+                      "table_lookup_ns_per_node": round(table_seconds * 1e9 / node_count, 1),
+                      "name_lookup_ns_per_node": round(name_seconds * 1e9 / node_count, 1)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Measures the peak memory of translating a large synthetic script, which is
+dominated by the CPPCodeLine, CPPVariable and CPPFunction objects the analyzer
+builds. Run it from the root of the repository
+
+    python benchmarks/bench_ir_memory.py --functions 50000
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules import pytranslator  # noqa: E402
+
+
+def generate_script(function_count):
+    """
+    Generates a script made of many small functions that are all called from
+    module level code
+
+    Parameters
+    ----------
+    function_count : int
+        Number of functions to generate
+
+    Returns
+    -------
+    str
+        The text of the script
+    """
+    parts = []
+    for index in range(function_count):
+        parts.append("def func_" + str(index) + "(a, b):\n"
+                     "    # Works out a value for function " + str(index) + "\n"
+                     "    c = a + b\n"
+                     "    if c > 10:\n"
+                     "        c = c - 1  # keep it small\n"
+                     "    while c < 100:\n"
+                     "        c = c * 2\n"
+                     "    print(c)\n"
+                     "    return c\n\n\n")
+    for index in range(function_count):
+        parts.append("x_" + str(index) + " = func_" + str(index) + "(1, 2)\n")
+
+    return "".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--functions", type=int, default=20000,
+                        help="number of functions in the synthetic script")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also report the bytes still held by the IR after "
+                             "the run, which slows the run down")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_path:
+        script_path = os.path.join(temp_path, "script.py")
+        with open(script_path, "w") as f:
+            f.write(generate_script(arguments.functions))
+
+        if arguments.tracemalloc:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        translator = pytranslator.PyTranslator(script_path, temp_path + os.sep,
+                                               verbose=False)
+        translator.run()
+        elapsed = time.perf_counter() - start
+
+        report = {"functions": arguments.functions,
+                  "lines": sum(len(function.lines)
+                               for function in translator.output_files[0].functions.values()),
+                  "seconds": round(elapsed, 3),
+                  # ru_maxrss is in kilobytes on Linux
+                  "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+        if arguments.tracemalloc:
+            report["ir_mb"] = round(tracemalloc.get_traced_memory()[0] / (1024 * 1024), 1)
+
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Measures how the translator scales on synthetic scripts of different shapes,
+timing each phase of a translation and reporting lines per second and peak
+memory as JSON. Run it from the root of the repository
+
+    python benchmarks/bench_throughput.py --size 2000 --output results.json
+
+Each workload runs in a fresh process so its peak memory isn't hidden by the
+workloads before it. Passing --compare with the output of an earlier run
+reports any workload that got slower by more than the tolerance and exits
+with a non-zero status
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules import pytranslator  # noqa: E402
+from modules import translationprofiler  # noqa: E402
+
+
+def generate_functions(size):
+    """
+    Generates many small functions that are all called from module level
+
+    Parameters
+    ----------
+    size : int
+        Number of functions
+
+    Returns
+    -------
+    str
+        The text of the script
+    """
+    parts = []
+    for index in range(size):
+        parts.append("def func_" + str(index) + "(a, b):\n"
+                     "    c = a + b\n"
+                     "    if c > 10:\n"
+                     "        c = c - 1\n"
+                     "    return c\n\n\n")
+    for index in range(size):
+        parts.append("x_" + str(index) + " = func_" + str(index) + "(1, 2)\n")
+
+    return "".join(parts)
+
+
+def generate_nesting(size, depth=20):
+    """
+    Generates blocks of If and While statements nested inside each other
+
+    Parameters
+    ----------
+    size : int
+        Number of nested blocks
+    depth : int
+        How deep each block nests
+
+    Returns
+    -------
+    str
+        The text of the script
+    """
+    parts = ["count = 0\n"]
+    for _ in range(size):
+        for level in range(depth):
+            keyword = "if" if level % 2 == 0 else "while"
+            parts.append("    " * level + keyword + " count < " + str(level + 100) + ":\n")
+        parts.append("    " * depth + "count = count + 1\n")
+
+    return "".join(parts)
+
+
+def generate_expressions(size, length=40):
+    """
+    Generates assignments of long arithmetic expressions
+
+    Parameters
+    ----------
+    size : int
+        Number of assignments
+    length : int
+        Number of operands in each expression
+
+    Returns
+    -------
+    str
+        The text of the script
+    """
+    operators = (" + ", " * ", " - ", " % ")
+    parts = ["a = 1\n", "b = 2\n"]
+    for index in range(size):
+        terms = ["a"]
+        for term in range(1, length):
+            terms.append(operators[term % len(operators)])
+            terms.append("b" if term % 3 else str(term))
+        parts.append("v_" + str(index) + " = " + "".join(terms) + "\n")
+
+    return "".join(parts)
+
+
+def generate_comments(size):
+    """
+    Generates a script where most lines are comments, both on their own and
+    after code
+
+    Parameters
+    ----------
+    size : int
+        Number of blocks of commented code
+
+    Returns
+    -------
+    str
+        The text of the script
+    """
+    parts = []
+    for index in range(size):
+        parts.append("# Block " + str(index) + " starts here\n"
+                     "# and explains what it does at some length\n"
+                     "\n"
+                     "y_" + str(index) + " = " + str(index) + "  # a value\n"
+                     "# trailing note for block " + str(index) + "\n")
+
+    return "".join(parts)
+
+
+def generate_docstrings(size, lines=30):
+    """
+    Generates functions with large docstrings
+
+    Parameters
+    ----------
+    size : int
+        Number of functions
+    lines : int
+        Number of lines in each docstring
+
+    Returns
+    -------
+    str
+        The text of the script
+    """
+    docstring = "".join("    Line " + str(line) + " of the documentation\n"
+                        for line in range(lines))
+    parts = []
+    for index in range(size):
+        parts.append("def doc_" + str(index) + "(a):\n"
+                     "    \"\"\"\n" + docstring + "    \"\"\"\n"
+                     "    return a\n\n\n")
+
+    return "".join(parts)
+
+
+# Workload name to (generator, how many units make up one step of --size)
+workloads = {"functions": (generate_functions, 1),
+             "nesting": (generate_nesting, 0.05),
+             "expressions": (generate_expressions, 0.5),
+             "comments": (generate_comments, 1),
+             "docstrings": (generate_docstrings, 0.2)}
+
+
+def run_workload(name, size, repeat):
+    """
+    Translates one synthetic script, timing every phase of the translation
+    with a TranslationProfiler. This is a module level function so it can run
+    in a fresh process
+
+    Parameters
+    ----------
+    name : str
+        Name of the workload in the workloads table
+    size : int
+        Size of the workload before its scale is applied
+    repeat : int
+        Number of timed runs, the fastest of each phase is reported
+
+    Returns
+    -------
+    dict
+        The results of the workload
+    """
+    generator, scale = workloads[name]
+    units = max(1, int(size * scale))
+    text = generator(units)
+
+    phases = {}
+    with tempfile.TemporaryDirectory() as temp_path:
+        script_path = os.path.join(temp_path, "script.py")
+        with open(script_path, "w") as f:
+            f.write(text)
+
+        for _ in range(repeat):
+            reports = []
+            profiler = translationprofiler.TranslationProfiler(reports.append)
+            translator = pytranslator.PyTranslator(script_path, temp_path + os.sep,
+                                                   verbose=False, profiler=profiler)
+            translator.run()
+
+            for phase, record in reports[-1]["phases"].items():
+                if phase not in phases or record["seconds"] < phases[phase]:
+                    phases[phase] = record["seconds"]
+
+    total = sum(phases.values())
+    line_count = text.count("\n")
+
+    return {"name": name,
+            "units": units,
+            "lines": line_count,
+            "bytes": len(text),
+            "phases": {phase: round(seconds, 4) for phase, seconds in phases.items()},
+            "seconds": round(total, 4),
+            "lines_per_second": round(line_count / total) if total > 0 else None,
+            # ru_maxrss is in kilobytes on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+
+def compare_results(results, baseline, tolerance):
+    """
+    Finds the workloads that got slower than in an earlier run
+
+    Parameters
+    ----------
+    results : dict
+        Results of this run
+    baseline : dict
+        Results of the earlier run
+    tolerance : float
+        Fraction a workload may slow down by before it counts as a regression
+
+    Returns
+    -------
+    list of str
+        A description of each regression
+    """
+    baseline_rates = {workload["name"]: workload["lines_per_second"]
+                      for workload in baseline["workloads"]}
+
+    regressions = []
+    for workload in results["workloads"]:
+        old_rate = baseline_rates.get(workload["name"])
+        new_rate = workload["lines_per_second"]
+        if old_rate is None or new_rate is None:
+            continue
+        if new_rate < old_rate * (1 - tolerance):
+            regressions.append(workload["name"] + ": " + str(old_rate) + " -> "
+                               + str(new_rate) + " lines/sec")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=2000,
+                        help="size of each workload, roughly in functions")
+    parser.add_argument("--workloads", nargs="+", default=list(workloads.keys()),
+                        choices=list(workloads.keys()),
+                        help="workloads to run, defaults to all of them")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of timed runs of each workload")
+    parser.add_argument("--output", default=None,
+                        help="file to write the JSON results to")
+    parser.add_argument("--compare", default=None,
+                        help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slow down allowed before --compare reports a regression")
+    arguments = parser.parse_args()
+
+    # A fresh process per workload keeps each peak memory reading separate
+    context = multiprocessing.get_context("spawn")
+    workload_results = []
+    for name in arguments.workloads:
+        with context.Pool(1) as pool:
+            workload_results.append(pool.apply(run_workload,
+                                               (name, arguments.size, arguments.repeat)))
+
+    results = {"translator_version": pytranslator.PyTranslator.translator_version,
+               "python": platform.python_version(),
+               "size": arguments.size,
+               "workloads": workload_results}
+
+    text = json.dumps(results, indent=2)
+    if arguments.output is not None:
+        with open(arguments.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if arguments.compare is not None:
+        with open(arguments.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, arguments.tolerance)
+        for regression in regressions:
+            print("Regression in " + regression, file=sys.stderr)
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
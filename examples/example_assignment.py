@@ -9,14 +9,15 @@ z = False
 
 a = "Hello!"
 
-# Lists aren't supported yet, so there will be a warning during the conversion
+# Lists become vectors holding the type of their items
 b = [1, 2, 3]
 
 # Variable reassignment
 x = 5
 
-# We'd lose precision, so this would generate a warning during the conversion
+# Assigning a float widens x, so it is declared as a double from the start
+# and no precision is lost
 x = 3.3
 
-# We wouldn't lose precision, so this type change is allowed
+# An int fits in y's double, so y stays a double
 y = 1
\ No newline at end of file
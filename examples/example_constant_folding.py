@@ -0,0 +1,34 @@
+# Example script demonstrating how constant expressions are worked out
+# during the conversion
+
+# Operators on constants are replaced by their results, with python's
+# rounding, so this becomes -4 rather than C++'s -3
+a = -7 // 2
+
+# Powers have no C++ operator, so they are worked out too
+b = 2 ** 10
+
+# Names assigned once at the top of the script are module constants. The
+# main function keeps them as the variables they are in C++, so LIMIT is
+# worked out from b when the program runs there, while functions and
+# conditions read their values
+DEBUG = False
+LIMIT = b // 4
+
+
+def scale(value):
+    # Functions can't see the variables of the main function in C++, so they
+    # read the values of module constants directly
+    return value * LIMIT
+
+
+# Conditions known during the conversion only keep the branch that runs, so
+# only the else branch is translated here
+if DEBUG:
+    print("a is", a, "and b is", b)
+else:
+    print(scale(a))
+
+# A loop that never runs is left out entirely
+while DEBUG:
+    print("Debugging")
@@ -1,13 +1,16 @@
 from math import sqrt
 
-# Example script demonstrating conversion of if statements
-x = True
+# Example script demonstrating conversion of if statements. The value of b
+# isn't known until the script runs, so none of these conditions are worked
+# out during the conversion. See example_constant_folding.py for conditions
+# that are
+a = 3
+b = sqrt(20.25)
+
+x = b > a
 if x:
     print("X was true")
 
-a = 3
-b = 4.5
-
 if b > a:
     print("B was greater than a")
 elif a > b:
@@ -16,7 +19,7 @@ else:
     print("They are equal")
 
 # Nested ifs are supported
-if True:
+if b > 0:
     if b < a:
         if b < 0:
             print("b is negative")
@@ -25,11 +28,11 @@ if True:
 if sqrt(b) > a:
     print("Square Root B was greater than a")
 
-# Cannot handle certain python calls such as is and in
+# Cannot handle certain python calls such as is
 if a is b:
     print("a is b")
 
-# Lists currently not supported during translation
+# Membership tests search lists, and look up sets and dicts by hash
 l = [1, 2, 3]
 
 if a in l:
@@ -15,3 +15,14 @@ while True:
         print(index)
         index = index + 1   # increment index to avoid infinite loop
         continue
+
+# For loops over a range become counted loops, counting down with a negative step
+for index in range(10, 0, -2):
+    print(index)
+
+# The else of a for loop only runs when the loop wasn't broken out of
+for index in range(5):
+    if index == 7:
+        break
+else:
+    print("No break")
@@ -3,6 +3,20 @@ from .portedfunctions import *
 from .pyplusexceptions import *
 from .pyanalyzer import *
 from .pytranslator import *
+from .pybatchtranslator import *
+from .pyasynctranslator import *
+from .translationcache import *
+from .incrementalstate import *
+from .pysource import *
+from .outputwriter import *
+from .typesolver import *
+from .constantfolder import *
+from .translationprofiler import *
+from .translationdaemon import *
+from .translationwatcher import *
+from .translationcontext import *
+from .buildgenerator import *
+from .compilechecker import *
 from .cppfile import *
 from .cppvariable import *
 from .cppcodeline import *
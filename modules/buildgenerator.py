@@ -0,0 +1,269 @@
+import re
+
+
+class BuildGenerator():
+    """
+    Generates a build description for the translated files, so every
+    translation comes with an optimized build instead of hand written build
+    files. CMake builds can change their profile, link time optimization and
+    unity build when they are configured, while Ninja builds are fixed to
+    the settings they were generated with
+    """
+
+    # Build systems that can be generated, mapped to the file they write
+    build_files = {"cmake": "CMakeLists.txt", "ninja": "build.ninja"}
+
+    # Compiler flags of each build profile
+    profile_flags = {"release": ["-O3", "-DNDEBUG"],
+                     "debug": ["-O0", "-g"],
+                     "native": ["-O3", "-march=native", "-DNDEBUG"]}
+
+    # System headers mapped to the library that has to be linked for them
+    link_libraries = {"math.h": "m", "cmath": "m"}
+
+    # C++ standard the translated code is compiled with
+    cxx_standard = "11"
+
+    # Target names the build systems keep for themselves
+    reserved_targets = ("all", "clean", "help", "install", "package", "test")
+
+    def __init__(self, build_system="cmake", profile="release", lto=False,
+                 unity=False):
+        """
+        Constructs a BuildGenerator object
+
+        Parameters
+        ----------
+        build_system : str
+            Either cmake or ninja
+        profile : str
+            Either release, debug or native. native builds for the processor
+            of the machine that compiles the code
+        lto : bool
+            Whether to use link time optimization
+        unity : bool
+            Whether to compile all of the files as a single unit
+        """
+        if build_system not in self.build_files:
+            raise ValueError("Unknown build system: " + build_system)
+        if profile not in self.profile_flags:
+            raise ValueError("Unknown build profile: " + profile)
+
+        self.build_system = build_system
+
+        self.profile = profile
+
+        self.lto = lto
+
+        self.unity = unity
+
+    def get_settings(self):
+        """
+        Gets every setting that can change the generated build, for use in
+        cache keys
+
+        Returns
+        -------
+        tuple
+            The settings
+        """
+        return (self.build_system, self.profile, self.lto, self.unity)
+
+    @staticmethod
+    def get_target_name(script_path):
+        """
+        Names the executable after the script, keeping only characters every
+        build system accepts
+
+        Parameters
+        ----------
+        script_path : str
+            Path to the python script
+
+        Returns
+        -------
+        str
+            Name of the executable
+        """
+        name = re.sub(r"\W", "_", re.split(r"[\\/]", script_path)[-1].rsplit(".", 1)[0])
+        if name.strip("_") == "":
+            return "main"
+        if name in BuildGenerator.reserved_targets:
+            return name + "_program"
+
+        return name
+
+    def get_libraries(self, includes):
+        """
+        Finds the libraries to link for the system headers the translated
+        code includes
+
+        Parameters
+        ----------
+        includes : list of str
+            The recorded include files
+
+        Returns
+        -------
+        list of str
+            Names of the libraries, without duplicates
+        """
+        libraries = []
+        for file in includes:
+            library = self.link_libraries.get(file)
+            if library is not None and library not in libraries:
+                libraries.append(library)
+
+        return libraries
+
+    def iter_build_files(self, target, sources, includes):
+        """
+        Generates the build description of one program
+
+        Parameters
+        ----------
+        target : str
+            Name of the executable
+        sources : list of str
+            The .cpp files of the program, relative to the output directory
+        includes : list of str
+            The system headers the translated code includes
+
+        Yields
+        ------
+        str
+            Name of the next file
+        str
+            Its text
+        """
+        libraries = self.get_libraries(includes)
+        if self.build_system == "cmake":
+            yield self.build_files["cmake"], self.get_cmake_text(target, sources,
+                                                                 libraries)
+            return
+
+        if self.unity and len(sources) > 1:
+            # Ninja has no unity builds of its own, so a file including every
+            # unit is compiled instead
+            unity_source = target + "_unity.cpp"
+            yield unity_source, "".join("#include \"" + source + "\"\n"
+                                        for source in sources)
+            sources = [unity_source]
+
+        yield self.build_files["ninja"], self.get_ninja_text(target, sources,
+                                                             libraries)
+
+    def get_cmake_text(self, target, sources, libraries):
+        """
+        Generates a CMakeLists.txt. The profile, link time optimization and
+        unity build are cache options defaulting to the settings of this
+        generator
+
+        Parameters
+        ----------
+        target : str
+            Name of the executable
+        sources : list of str
+            The .cpp files of the program
+        libraries : list of str
+            The libraries to link
+
+        Returns
+        -------
+        str
+            The text of the file
+        """
+        lines = ["cmake_minimum_required(VERSION 3.16)",
+                 "project(" + target + " CXX)",
+                 "",
+                 "set(CMAKE_CXX_STANDARD " + self.cxx_standard + ")",
+                 "set(PYPLUS_PROFILE \"" + self.profile + "\" CACHE STRING "
+                 "\"Build profile: " + ", ".join(self.profile_flags) + "\")",
+                 "option(PYPLUS_LTO \"Use link time optimization\" "
+                 + ("ON" if self.lto else "OFF") + ")",
+                 "option(PYPLUS_UNITY \"Compile every file as one unit\" "
+                 + ("ON" if self.unity else "OFF") + ")",
+                 "",
+                 "add_executable(" + target]
+        lines += ["    " + source for source in sources]
+        lines[-1] += ")"
+        lines.append("")
+
+        keyword = "if"
+        for profile, flags in self.profile_flags.items():
+            lines.append(keyword + "(PYPLUS_PROFILE STREQUAL \"" + profile + "\")")
+            lines.append("    target_compile_options(" + target + " PRIVATE "
+                         + " ".join(flags) + ")")
+            keyword = "elseif"
+        lines += ["else()",
+                  "    message(FATAL_ERROR \"Unknown build profile: ${PYPLUS_PROFILE}\")",
+                  "endif()",
+                  "",
+                  "if(PYPLUS_LTO)",
+                  "    include(CheckIPOSupported)",
+                  "    check_ipo_supported(RESULT lto_supported)",
+                  "    if(lto_supported)",
+                  "        set_property(TARGET " + target
+                  + " PROPERTY INTERPROCEDURAL_OPTIMIZATION ON)",
+                  "    endif()",
+                  "endif()",
+                  "",
+                  "if(PYPLUS_UNITY)",
+                  "    set_property(TARGET " + target + " PROPERTY UNITY_BUILD ON)",
+                  "endif()"]
+        if len(libraries) > 0:
+            lines += ["", "target_link_libraries(" + target + " PRIVATE "
+                      + " ".join(libraries) + ")"]
+
+        return "\n".join(lines) + "\n"
+
+    def get_ninja_text(self, target, sources, libraries):
+        """
+        Generates a build.ninja for the settings of this generator
+
+        Parameters
+        ----------
+        target : str
+            Name of the executable
+        sources : list of str
+            The .cpp files of the program
+        libraries : list of str
+            The libraries to link
+
+        Returns
+        -------
+        str
+            The text of the file
+        """
+        flags = ["-std=c++" + self.cxx_standard] + self.profile_flags[self.profile]
+        if self.lto:
+            flags.append("-flto")
+
+        lines = ["# Profile: " + self.profile
+                 + ", LTO: " + ("on" if self.lto else "off")
+                 + ", unity build: " + ("on" if self.unity else "off"),
+                 "cxx = c++",
+                 "cxxflags = " + " ".join(flags),
+                 "libs = " + " ".join("-l" + library for library in libraries),
+                 "",
+                 "rule cxx",
+                 "  command = $cxx $cxxflags -MMD -MF $out.d -c $in -o $out",
+                 "  depfile = $out.d",
+                 "  deps = gcc",
+                 "  description = CXX $out",
+                 "",
+                 "rule link",
+                 "  command = $cxx $cxxflags $in -o $out $libs",
+                 "  description = LINK $out",
+                 ""]
+
+        objects = []
+        for source in sources:
+            objects.append(source.rsplit(".", 1)[0] + ".o")
+            lines.append("build " + objects[-1] + ": cxx " + source)
+
+        lines += ["build " + target + ": link " + " ".join(objects),
+                  "",
+                  "default " + target]
+
+        return "\n".join(lines) + "\n"
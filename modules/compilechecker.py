@@ -0,0 +1,226 @@
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import subprocess
+from modules import outputwriter as ow
+
+# Matches the messages compilers in the style of gcc and clang print, such as
+# script.py:12:5: error: expected ';' before '}' token
+diagnostic_pattern = re.compile(r"^(.*?):(\d+):(?:(\d+):)? (fatal error|error|warning): (.*)$")
+
+
+def get_compile_command(compiler="g++", full=False, flags=None):
+    """
+    Builds the command that checks a translation, which is run with the path
+    of each .cpp file added to the end
+
+    Parameters
+    ----------
+    compiler : str
+        The C++ compiler to run
+    full : bool
+        Whether to compile the code instead of only checking its syntax,
+        which also catches errors found by code generation
+    flags : list of str
+        Extra flags to pass to the compiler
+
+    Returns
+    -------
+    list of str
+        The command
+    """
+    command = [compiler, "-std=c++11"]
+    if full:
+        command += ["-c", "-o", os.devnull]
+    else:
+        command.append("-fsyntax-only")
+    if flags is not None:
+        command += flags
+
+    return command + ["-x", "c++"]
+
+
+def parse_diagnostics(output, script_path):
+    """
+    Finds the errors and warnings in compiler output. The translation is
+    checked with #line directives, so messages about translated code already
+    name the python line it came from
+
+    Parameters
+    ----------
+    output : str
+        What the compiler printed
+    script_path : str
+        Path to the python script the translation came from
+
+    Returns
+    -------
+    list of dict
+        Each message with its severity, text, and python line and column.
+        The line is None for code that didn't come from a python line, such
+        as forward declarations
+    """
+    diagnostics = []
+    for line in output.splitlines():
+        match = diagnostic_pattern.match(line)
+        if match is None:
+            continue
+
+        from_script = match.group(1) == script_path
+        diagnostics.append({"severity": match.group(4),
+                            "message": match.group(5),
+                            "line": int(match.group(2)) if from_script else None,
+                            "column": int(match.group(3)) if from_script and match.group(3) else None})
+
+    return diagnostics
+
+
+def check_script(script_path, output_path, files, units, command, cache_path=None):
+    """
+    Checks that the files written for a script compile, compiling each of its
+    .cpp units. Results are cached by a hash of the compiler command and the
+    text of the files, so only translations that changed are compiled again.
+    This is a module level function so it can be sent to worker processes
+
+    Parameters
+    ----------
+    script_path : str
+        Path to the python file the files were translated from
+    output_path : str
+        Path to the directory the files were written to
+    files : list of str
+        Names of every file written for the script, relative to the output
+        path
+    units : list of str
+        Names of the .cpp files holding the translated code
+    command : list of str
+        The compiler command, without the file to compile
+    cache_path : str
+        Path to the directory results are cached in. None disables caching
+
+    Returns
+    -------
+    dict
+        Summary of the check with the script path, whether the translation
+        compiled, the compiler messages with their python lines, whether the
+        result came from the cache and any error that stopped the check
+    """
+    summary = {"script_path": script_path, "success": False, "diagnostics": [],
+               "cached": False, "error": ""}
+
+    try:
+        # Headers are part of the key since every unit includes them
+        key_hash = hashlib.sha256(repr(command).encode())
+        for filename in files:
+            if filename.endswith((".cpp", ".hpp")):
+                with open(os.path.join(output_path, filename), "rb") as f:
+                    key_hash.update(filename.encode() + b"\0" + f.read() + b"\0")
+
+        result_path = None
+        if cache_path is not None:
+            result_path = os.path.join(cache_path, key_hash.hexdigest() + ".json")
+            try:
+                with open(result_path, "r") as f:
+                    result = json.load(f)
+                summary.update(result)
+                summary["cached"] = True
+                return summary
+            except (OSError, ValueError):
+                pass
+
+        result = {"success": True, "diagnostics": []}
+        for unit in units:
+            process = subprocess.run(command + [os.path.join(output_path, unit)],
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                     universal_newlines=True)
+            result["success"] = result["success"] and process.returncode == 0
+            # Messages about a shared header come back from every unit
+            for diagnostic in parse_diagnostics(process.stdout, script_path):
+                if diagnostic not in result["diagnostics"]:
+                    result["diagnostics"].append(diagnostic)
+        summary.update(result)
+
+        if result_path is not None:
+            os.makedirs(cache_path, exist_ok=True)
+            ow.write_text_if_changed(result_path, json.dumps(result))
+
+    except Exception as ex:
+        # Unreadable output or a missing compiler shouldn't stop the other
+        # checks
+        summary["error"] = ex.__class__.__name__ + ": " + str(ex)
+
+    return summary
+
+
+class CompileChecker():
+    """
+    Checks that the translations of many scripts compile by running the C++
+    compiler on the files written for them across a pool of worker
+    processes, reporting every compiler message at the python line it came
+    from
+    """
+
+    def __init__(self, translations, jobs=None, cache_path=None,
+                 compiler="g++", full=False, flags=None):
+        """
+        Constructs a CompileChecker object
+
+        Parameters
+        ----------
+        translations : list of dict
+            Summaries of the translations to check, as returned by a batch
+            translation, each with the script path, the output path and the
+            files and units written there
+        jobs : int
+            Number of worker processes to use. Defaults to the core count
+        cache_path : str
+            Path to the directory results are cached in. None disables
+            caching
+        compiler : str
+            The C++ compiler to run
+        full : bool
+            Whether to compile the code instead of only checking its syntax
+        flags : list of str
+            Extra flags to pass to the compiler
+        """
+        self.translations = translations
+
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        self.jobs = max(1, jobs)
+
+        self.cache_path = cache_path
+
+        self.command = get_compile_command(compiler, full, flags)
+
+    def run(self):
+        """
+        Checks every translation
+
+        Returns
+        -------
+        list of dict
+            One summary per translation, in the order they were given
+        """
+        if len(self.translations) == 0:
+            return []
+
+        script_paths = [translation["script_path"] for translation in self.translations]
+        output_paths = [translation["output_path"] for translation in self.translations]
+        files = [translation["files"] for translation in self.translations]
+        units = [translation["units"] for translation in self.translations]
+        commands = [self.command] * len(self.translations)
+        cache_paths = [self.cache_path] * len(self.translations)
+
+        # No need to pay for process start up when there's one worker
+        if self.jobs == 1 or len(self.translations) == 1:
+            return list(map(check_script, script_paths, output_paths, files, units,
+                            commands, cache_paths))
+
+        # Each check mostly waits on its compiler, so scripts are handed out
+        # one at a time to keep every core busy with the slow ones
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            return list(executor.map(check_script, script_paths, output_paths, files,
+                                     units, commands, cache_paths))
@@ -0,0 +1,410 @@
+import ast
+import math
+import operator
+from modules import pyplusexceptions as ppex
+
+
+class ConstantFolder():
+    """
+    Works out the values of expressions at translation time, with the same
+    results python would get when running them. Names assigned once outside
+    of functions are module constants. Functions can't see the variables of
+    the main function in C++, so they read the values of the constants
+    instead, while the main function keeps its variables and only reads the
+    values when asked to, such as to find the branches that never run. Only
+    values the C++ types hold exactly are folded
+    """
+
+    # Python operators run at translation time, stored as
+    # {ast Operator Class: Function}
+    binary_operators = {ast.Add: operator.add, ast.Sub: operator.sub,
+                        ast.Mult: operator.mul, ast.Div: operator.truediv,
+                        ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+                        ast.Pow: operator.pow, ast.LShift: operator.lshift,
+                        ast.RShift: operator.rshift, ast.BitOr: operator.or_,
+                        ast.BitXor: operator.xor, ast.BitAnd: operator.and_}
+
+    unary_operators = {ast.Not: operator.not_, ast.Invert: operator.invert,
+                       ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+    comparison_operators = {ast.Eq: operator.eq, ast.NotEq: operator.ne,
+                            ast.Lt: operator.lt, ast.LtE: operator.le,
+                            ast.Gt: operator.gt, ast.GtE: operator.ge,
+                            ast.In: lambda item, container: item in container,
+                            ast.NotIn: lambda item, container: item not in container}
+
+    # Types of the values that can be written out as C++ literals
+    constant_types = (bool, int, float, str)
+
+    # Folded ints have to fit in a C++ int, anything larger is left to
+    # run as it would have without folding
+    int_bits = 32
+
+    # Longest string that is folded, so repeating a string doesn't build a
+    # huge literal
+    max_str_length = 4096
+
+    def __init__(self, tree=None, main_key="0"):
+        """
+        Constructs a ConstantFolder object
+
+        Parameters
+        ----------
+        tree : List of ast nodes
+            The module body from ast.parse. None folds literals only
+        main_key : str
+            Key of the function the code outside of functions goes into
+        """
+        self.main_key = main_key
+
+        # Names assigned once outside of functions, stored as a dictionary of
+        # {Variable Name: Value}
+        self.constants = {}
+
+        # Names each function assigns, which hide the module constants of
+        # the same name, stored as a dictionary of {Function Key: Names}
+        self.local_names = {}
+
+        # Values of the expressions folded so far, and the expressions that
+        # can't be folded, so nested expressions are only worked out once.
+        # Both are keyed by (Node, Whether Constants Were Read)
+        self.values = {}
+        self.not_constant = set()
+
+        if tree is None:
+            return
+
+        self.constants = self.find_module_constants(tree)
+        for node in tree:
+            if node.__class__ is ast.FunctionDef:
+                self.local_names[node.name] = self.get_bound_names(node.body) \
+                    | {arg.arg for arg in node.args.args}
+
+    @classmethod
+    def find_module_constants(cls, tree):
+        """
+        Finds the module constants of a script. A name is a module constant
+        when its only assignment is a single name being assigned a value
+        that folds, directly in the module body, and no function declares
+        it global
+
+        Parameters
+        ----------
+        tree : List of ast nodes
+            The module body from ast.parse
+
+        Returns
+        -------
+        dict of {str: object}
+            The value of each module constant
+        """
+        # Global statements can't be in the module body itself
+        global_names = set()
+        for node in tree:
+            if node.__class__ in (ast.FunctionDef, ast.ClassDef):
+                for internal_node in ast.walk(node):
+                    if internal_node.__class__ is ast.Global:
+                        global_names.update(internal_node.names)
+
+        bind_counts = {}
+        for node in tree:
+            if node.__class__ in (ast.FunctionDef, ast.ClassDef):
+                names = [node.name]
+            else:
+                names = cls.get_bound_names([node], True)
+            for name in names:
+                bind_counts[name] = bind_counts.get(name, 0) + 1
+
+        # Constants can be worked out from the ones assigned before them
+        folder = cls()
+        for node in tree:
+            if node.__class__ is not ast.Assign or len(node.targets) != 1 \
+                    or node.targets[0].__class__ is not ast.Name:
+                continue
+
+            name = node.targets[0].id
+            if bind_counts[name] != 1 or name in global_names:
+                continue
+
+            try:
+                folder.constants[name] = folder.get_value(node.value, folder.main_key,
+                                                          True)
+            except ppex.NotConstant:
+                pass
+
+        return folder.constants
+
+    @staticmethod
+    def get_bound_names(tree, count_repeats=False):
+        """
+        Finds the names assigned, deleted, imported or defined in a list of
+        statements, including inside nested blocks
+
+        Parameters
+        ----------
+        tree : List of ast nodes
+            The statements to search
+        count_repeats : bool
+            Whether to give a name once for every time it is bound
+
+        Returns
+        -------
+        set of str or list of str
+            The bound names, as a list when counting repeats
+        """
+        names = []
+        for node in tree:
+            for internal_node in ast.walk(node):
+                node_class = internal_node.__class__
+                if node_class is ast.Name and internal_node.ctx.__class__ is not ast.Load:
+                    names.append(internal_node.id)
+                elif node_class in (ast.FunctionDef, ast.ClassDef):
+                    names.append(internal_node.name)
+                elif node_class in (ast.Import, ast.ImportFrom):
+                    names += [(alias.asname or alias.name).split(".")[0]
+                              for alias in internal_node.names]
+                elif node_class in (ast.Global, ast.Nonlocal):
+                    names += internal_node.names
+                elif node_class is ast.ExceptHandler and internal_node.name is not None:
+                    names.append(internal_node.name)
+
+        if count_repeats:
+            return names
+
+        return set(names)
+
+    def get_value(self, node, function_key, read_constants=False):
+        """
+        Works out the value of an expression at translation time
+
+        Parameters
+        ----------
+        node : ast node
+            The expression to fold
+        function_key : str
+            Key of the function the expression is in
+        read_constants : bool
+            Whether the main function reads the values of module constants
+            instead of leaving them to its variables
+
+        Returns
+        -------
+        bool, int, float or str
+            The value of the expression
+
+        Raises
+        ------
+        NotConstant
+            If the value isn't known until the code runs, or it can't be
+            written out as a C++ literal
+        """
+        read_constants = read_constants or function_key != self.main_key
+        if (node, read_constants) in self.values:
+            return self.values[node, read_constants]
+        if (node, read_constants) in self.not_constant:
+            raise ppex.NotConstant()
+
+        try:
+            value = self.check_value(self.evaluate(node, function_key, read_constants))
+        except ppex.NotConstant:
+            self.not_constant.add((node, read_constants))
+            raise
+
+        self.values[node, read_constants] = value
+        return value
+
+    def get_remaining_values(self, node, function_key):
+        """
+        Leaves out the values at the start of a boolean operation that are
+        known not to decide its result, which python would skip past
+
+        Parameters
+        ----------
+        node : ast.BoolOp
+            The boolean operation
+        function_key : str
+            Key of the function the operation is in
+
+        Returns
+        -------
+        list of ast nodes
+            The values still to be checked when the code runs
+        """
+        deciding_truth = node.op.__class__ is ast.Or
+        remaining = list(node.values)
+        while len(remaining) > 1:
+            try:
+                value = self.get_value(remaining[0], function_key)
+            except ppex.NotConstant:
+                break
+            if bool(value) is deciding_truth:
+                break
+            remaining.pop(0)
+
+        return remaining
+
+    def evaluate(self, node, function_key, read_constants):
+        """
+        Runs an expression made of constants with python's semantics
+
+        Parameters
+        ----------
+        node : ast node
+            The expression to run
+        function_key : str
+            Key of the function the expression is in
+        read_constants : bool
+            Whether to read the values of module constants
+
+        Returns
+        -------
+        object
+            The value of the expression
+
+        Raises
+        ------
+        NotConstant
+            If the value isn't known until the code runs
+        """
+        node_class = node.__class__
+        if node_class is ast.Constant:
+            return node.value
+
+        if node_class is ast.Name:
+            if not read_constants or node.id not in self.constants \
+                    or node.id in self.local_names.get(function_key, ()):
+                raise ppex.NotConstant()
+            return self.constants[node.id]
+
+        if node_class is ast.BinOp:
+            operator_class = node.op.__class__
+            if operator_class not in self.binary_operators:
+                raise ppex.NotConstant()
+            left = self.get_value(node.left, function_key, read_constants)
+            right = self.get_value(node.right, function_key, read_constants)
+            self.check_operands(operator_class, left, right)
+            return self.run_operator(self.binary_operators[operator_class], left, right)
+
+        if node_class is ast.UnaryOp:
+            operand = self.get_value(node.operand, function_key, read_constants)
+            return self.run_operator(self.unary_operators[node.op.__class__], operand)
+
+        if node_class is ast.BoolOp:
+            # The first value with the deciding truth is the result, or the
+            # last value if none of them have it
+            deciding_truth = node.op.__class__ is ast.Or
+            for value_node in node.values:
+                value = self.get_value(value_node, function_key, read_constants)
+                if bool(value) is deciding_truth:
+                    break
+            return value
+
+        if node_class is ast.Compare:
+            for op in node.ops:
+                if op.__class__ not in self.comparison_operators:
+                    raise ppex.NotConstant()
+
+            left = self.get_value(node.left, function_key, read_constants)
+            for op, comparator_node in zip(node.ops, node.comparators):
+                if op.__class__ in (ast.In, ast.NotIn) \
+                        and comparator_node.__class__ in (ast.List, ast.Set, ast.Tuple):
+                    right = [self.get_value(item, function_key, read_constants)
+                             for item in comparator_node.elts]
+                else:
+                    right = self.get_value(comparator_node, function_key, read_constants)
+
+                if not self.run_operator(self.comparison_operators[op.__class__], left, right):
+                    return False
+                left = right
+            return True
+
+        raise ppex.NotConstant()
+
+    def check_operands(self, operator_class, left, right):
+        """
+        Stops operators that would take a long time or a lot of memory to
+        give a result too large to fold anyway
+
+        Parameters
+        ----------
+        operator_class : type
+            Class of the ast operator
+        left : object
+            The left operand
+        right : object
+            The right operand
+
+        Raises
+        ------
+        NotConstant
+            If the result would be too large
+        """
+        if type(left) in (bool, int) and type(right) in (bool, int):
+            if operator_class is ast.Pow and abs(left) > 1 \
+                    and right * (abs(left).bit_length() - 1) > self.int_bits:
+                raise ppex.NotConstant()
+            if operator_class is ast.LShift and right > self.int_bits:
+                raise ppex.NotConstant()
+
+        elif operator_class is ast.Mult:
+            for text, count in ((left, right), (right, left)):
+                if type(text) is str and type(count) in (bool, int) \
+                        and len(text) * count > self.max_str_length:
+                    raise ppex.NotConstant()
+
+    @staticmethod
+    def run_operator(function, *operands):
+        """
+        Runs an operator on constants
+
+        Parameters
+        ----------
+        function : function
+            The operator
+        operands : objects
+            The values to run it on
+
+        Returns
+        -------
+        object
+            The result
+
+        Raises
+        ------
+        NotConstant
+            If python would raise an error running the operator, which is
+            then left to happen when the code runs
+        """
+        try:
+            return function(*operands)
+        except (ArithmeticError, TypeError, ValueError):
+            raise ppex.NotConstant()
+
+    def check_value(self, value):
+        """
+        Checks that a value can be written out as a C++ literal of the type
+        the variable holding it will have
+
+        Parameters
+        ----------
+        value : object
+            The folded value
+
+        Returns
+        -------
+        object
+            The same value
+
+        Raises
+        ------
+        NotConstant
+            If the value can't be written out
+        """
+        value_type = type(value)
+        if value_type not in self.constant_types \
+                or value_type is int and not -2**(self.int_bits - 1) <= value < 2**(self.int_bits - 1) \
+                or value_type is float and not math.isfinite(value) \
+                or value_type is str and len(value) > self.max_str_length:
+            raise ppex.NotConstant()
+
+        return value
@@ -3,6 +3,11 @@ class CPPCodeLine():
     Class to represent a line of code in C++
     """
 
+    # Every translated line becomes one of these, so slots are used to avoid a
+    # dictionary per line on large scripts
+    __slots__ = ("start_line_num", "end_line_num", "end_char_index", "indent",
+                 "code_str", "comment_str", "pre_comment_str")
+
     # Using a variable in case we want to use tabs instead of spaces
     tab_delimiter = "    "
 
@@ -63,30 +68,30 @@ class CPPCodeLine():
         str
             A string with the converted C++ code
         """
-        return_str = ""
+        # Pieces are collected in a list and joined once rather than
+        # concatenated one at a time
+        parts = []
+        indent_str = CPPCodeLine.tab_delimiter * self.indent
+
         # Goes through various permutations of how this object could be
         # populated. We need different handlers to ensure indentation is done
         # correctly
         if self.pre_comment_str != "":
-            return_str += CPPCodeLine.tab_delimiter * self.indent \
-                          + "//" + self.pre_comment_str + "\n"
+            parts += [indent_str, "//", self.pre_comment_str, "\n"]
 
         if self.code_str != "":
             # Standard code line
-            return_str += CPPCodeLine.tab_delimiter * self.indent \
-                          + self.code_str
+            parts += [indent_str, self.code_str]
             if self.comment_str != "":
                 # Inline comment as well
-                return_str += CPPCodeLine.tab_delimiter \
-                              + "//" + self.comment_str
+                parts += [CPPCodeLine.tab_delimiter, "//", self.comment_str]
 
         elif self.comment_str != "":
             # Only a comment present
-            return_str += CPPCodeLine.tab_delimiter * self.indent \
-                          + "//" + self.comment_str
+            parts += [indent_str, "//", self.comment_str]
 
         else:
             # Empty line
-            return_str += CPPCodeLine.tab_delimiter * self.indent
+            parts.append(indent_str)
 
-        return return_str
+        return "".join(parts)
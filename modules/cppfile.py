@@ -1,9 +1,16 @@
+import itertools
+from modules import translationcontext as tctx
+
+
 class CPPFile():
     """
     Class to represent a C++ file that will be exported
     """
 
-    def __init__(self, filename):
+    # Line main starts with when fast_io is set and the file uses iostream
+    fast_io_preamble = "std::ios::sync_with_stdio(false);"
+
+    def __init__(self, filename, types=None, fast_io=False):
         """
         Constructs a CPPFile object
 
@@ -11,6 +18,12 @@ class CPPFile():
         ----------
         filename : str
             Name for the file
+        types : dict of {str: str}
+            Python type names mapped to the C++ types to declare functions
+            with. None uses the default types
+        fast_io : bool
+            Whether main should turn off the syncing of the C++ streams with
+            C's stdio when the file uses iostream
         """
         # Includes are just strings of name of include file
         self.includes = []
@@ -20,6 +33,12 @@ class CPPFile():
 
         self.filename = filename
 
+        if types is None:
+            types = tctx.TranslationContext.types
+        self.types = types
+
+        self.fast_io = fast_io
+
     def add_include_file(self, file):
         """
         Adds the provided include file to the current cpp file if it doesn't
@@ -39,26 +58,144 @@ class CPPFile():
 
         Returns
         -------
-        return_str : str
+        str
             The text of the converted C++ file
         """
-        return_str = ""
+        return "".join(self.iter_formatted_file_text())
 
+    def iter_formatted_file_text(self, line_file=None):
+        """
+        Generates the text of the C++ file piece by piece. Writing the pieces
+        as they are made keeps memory use bounded on very large outputs and
+        avoids rebuilding an ever growing string
+
+        Parameters
+        ----------
+        line_file : str
+            Name of the python file to point #line directives at. None leaves
+            the directives out
+
+        Yields
+        ------
+        str
+            The next piece of the C++ file
+        """
+        yield from self.iter_declarations()
+
+        # Now we put in all of the functions for the file
+        yield from self.iter_function_text(self.functions.values(), line_file)
+
+    def iter_declarations(self):
+        """
+        Generates the include files and forward declarations that start the
+        C++ file, or make up its header when it is split
+
+        Yields
+        ------
+        str
+            The next piece of the declarations
+        """
         # We start with include files
         for file in self.includes:
-            return_str += "#include <" + file + ">\n"
+            yield "#include <" + file + ">\n"
 
-        return_str += "\n"
+        yield "\n"
 
         # Now put in forward declarations
         # Skip main since it doesn't need a forward declaration
-        for function_key in list(self.functions.keys())[1:]:
-            return_str += self.functions[function_key].get_forward_declaration() + ";\n"
+        for function in itertools.islice(self.functions.values(), 1, None):
+            yield function.get_forward_declaration(self.types) + ";\n"
 
-        return_str += "\n"
+        yield "\n"
 
-        # Now we put in all of the functions for the file
+    def iter_function_text(self, functions, line_file=None):
+        """
+        Generates the code of some of the functions of this file
+
+        Parameters
+        ----------
+        functions : iterable of CPPFunction
+            The functions to generate, in order
+        line_file : str
+            Name of the python file to point #line directives at. None leaves
+            the directives out
+
+        Yields
+        ------
+        str
+            The next piece of the functions' C++ code
+        """
+        for function in functions:
+            preamble = None
+            if function.name == "0" and self.fast_io and "iostream" in self.includes:
+                preamble = [self.fast_io_preamble]
+            yield from function.iter_formatted_function_text(self.types, line_file,
+                                                             preamble)
+            yield "\n\n"
+
+    def split_units(self, unit_size):
+        """
+        Groups the functions into translation units that can be compiled in
+        parallel. Functions stay in their order, and a unit is closed once
+        adding the next function would take it past the target size, so a
+        function larger than the target gets a unit of its own
+
+        Parameters
+        ----------
+        unit_size : int
+            Target number of code lines in each unit
+
+        Returns
+        -------
+        list of list of CPPFunction
+            The functions of each unit. The first unit holds main
+        """
+        units = [[]]
+        unit_lines = 0
         for function in self.functions.values():
-            return_str += function.get_formatted_function_text() + "\n\n"
+            function_lines = len(function.lines) + 2
+            if len(units[-1]) > 0 and unit_lines + function_lines > unit_size:
+                units.append([])
+                unit_lines = 0
+            units[-1].append(function)
+            unit_lines += function_lines
+
+        return units
+
+    def iter_output_files(self, unit_size=None, line_file=None):
+        """
+        Generates the files this C++ file is written as. Without a unit size
+        that is a single .cpp file. With one, the functions are split across
+        several .cpp files that share a .hpp header of the includes and
+        forward declarations, so a large script compiles on every core
+
+        Parameters
+        ----------
+        unit_size : int
+            Target number of code lines in each .cpp file. None writes a
+            single file
+        line_file : str
+            Name of the python file to point #line directives at. None leaves
+            the directives out
+
+        Yields
+        ------
+        str
+            Name of the next file
+        iterable of str
+            The pieces of its text
+        """
+        if unit_size is None:
+            yield self.filename + ".cpp", self.iter_formatted_file_text(line_file)
+            return
+
+        header_name = self.filename + ".hpp"
+        yield header_name, itertools.chain(("#pragma once\n\n",),
+                                           self.iter_declarations())
 
-        return return_str
+        for index, functions in enumerate(self.split_units(unit_size)):
+            unit_name = self.filename
+            if index > 0:
+                unit_name += "_" + str(index)
+            yield unit_name + ".cpp", itertools.chain(("#include \"" + header_name + "\"\n\n",),
+                                                      self.iter_function_text(functions, line_file))
@@ -1,11 +1,39 @@
-from modules import cppvariable as cvar
+from modules import cppcodeline as cline
+from modules import translationcontext as tctx
+from modules import typesolver as ts
+
+
+def get_line_directive(line_num, line_file):
+    """
+    Generates a #line directive, which makes the compiler number the lines
+    after it from a line of another file
+
+    Parameters
+    ----------
+    line_num : int
+        Line number of the line after the directive
+    line_file : str
+        Name of the file the line came from
+
+    Returns
+    -------
+    str
+        The directive
+    """
+    return "#line " + str(line_num) + " \"" \
+        + line_file.replace("\\", "\\\\").replace("\"", "\\\"") + "\"\n"
+
 
 class CPPFunction():
     """
     Class to represent Python functions as C++ functions
     """
 
-    def __init__(self, name, lineno, end_lineno, parameters={}):
+    __slots__ = ("name", "lineno", "end_lineno", "parameters", "lines",
+                 "variables", "return_type", "includes", "reference_parameters",
+                 "copied_parameters")
+
+    def __init__(self, name, lineno, end_lineno, parameters=None):
         """
         Constructs a CPPFunction object
 
@@ -32,6 +60,8 @@ class CPPFunction():
         # Provides a lookup table for parameters, allowing for type updates
         # as file is parsed
         # Dictionary of {Variable Name : CPPVariable Object}
+        if parameters is None:
+            parameters = {}
         self.parameters = parameters
 
         # Lines in a function stored as a dictionary of format
@@ -44,42 +74,126 @@ class CPPFunction():
         # Dictionary of Variable Name : CPPVariable Object
         self.variables = {}
 
-        # Using a list so type gets updated if more information is found about
-        # a related variable
-        self.return_type = ["void"]
+        # Rises from void as the types of returned values are found
+        self.return_type = ts.TypeVariable("void")
+
+        # Include files needed by the code in this function. Kept per function
+        # so the includes of a function reused by an incremental run can be
+        # added back to its file
+        self.includes = []
+
+        # Names of the container parameters this function changes, which are
+        # passed by reference so the caller sees the changes
+        self.reference_parameters = set()
+
+        # Names of the parameters this function assigns new values to, which
+        # are passed by value so the caller keeps its own
+        self.copied_parameters = set()
+
+    def shift_lines(self, offset):
+        """
+        Moves every line of this function by the given number of lines. Used
+        when a function is reused after code above it was added or removed
+
+        Parameters
+        ----------
+        offset : int
+            Number of lines to move the function by, negative to move it up
+        """
+        if offset == 0:
+            return
+
+        self.lineno += offset
+        self.end_lineno += offset
 
-    def get_forward_declaration(self):
+        shifted_lines = {}
+        for line_num, line in self.lines.items():
+            line.start_line_num += offset
+            line.end_line_num += offset
+            shifted_lines[line_num + offset] = line
+        self.lines = shifted_lines
+
+        for variable in self.variables.values():
+            variable.line_num += offset
+
+    def get_forward_declaration(self, types=None):
         """
         Generates the string representation of this function's forward
         declaration. This is separate from get signature because we don't
         want to include any default values in the forward declaration
 
+        Parameters
+        ----------
+        types : dict of {str: str}
+            Python type names mapped to C++ types. None uses the default types
+
         Returns
         -------
         str
             The function's forward declaration
         """
-        function_signature = cvar.CPPVariable.types[self.return_type[0]]
+        if types is None:
+            types = tctx.TranslationContext.types
+
+        function_signature = self.return_type.get_cpp_type(types)
         function_signature += self.name + "("
 
         if len(self.parameters) > 0:
             for parameter in self.parameters:
-                function_signature += cvar.CPPVariable.types[self.parameters[parameter].py_var_type[0]]
+                function_signature += self.get_parameter_type(parameter, types)
                 function_signature += parameter + ", "
             function_signature = function_signature[:-2]
 
         return function_signature + ")"
 
-    def get_signature(self):
+    def get_parameter_type(self, name, types):
+        """
+        Gets the C++ type of a parameter. Python shares containers with the
+        functions they are passed to, so they are passed by reference, which
+        is const unless the function changes them. A container the function
+        assigns a new value to is copied instead
+
+        Parameters
+        ----------
+        name : str
+            Name of the parameter
+        types : dict of {str: str}
+            Python type names mapped to C++ types
+
+        Returns
+        -------
+        str
+            The C++ type of the parameter
+        """
+        py_var_type = self.parameters[name].py_var_type
+        parameter_type = py_var_type.get_cpp_type(types)
+        if py_var_type.get_type() in tctx.TranslationContext.container_types \
+                and name not in self.copied_parameters:
+            if name in self.reference_parameters:
+                parameter_type += "&"
+            else:
+                parameter_type = "const " + parameter_type + "&"
+
+        return parameter_type
+
+    def get_signature(self, types=None):
         """
         Generates the string representation of this function's signature
 
+        Parameters
+        ----------
+        types : dict of {str: str}
+            Python type names mapped to C++ types. None uses the default types
+
         Returns
         -------
         str
             The function's signature
         """
-        function_signature = cvar.CPPVariable.types[self.return_type[0]]
+        if types is None:
+            types = tctx.TranslationContext.types
+
+        function_signature = self.return_type.get_cpp_type(types)
         # Convert internally named main function to proper name
         if self.name == "0":
             function_signature += "main("
@@ -88,9 +202,9 @@ class CPPFunction():
 
         # Check if there are any parameters before attempting to add them
         if len(self.parameters.values()) > 0:
-            for parameter in self.parameters.values():
+            for name, parameter in self.parameters.items():
                 # Prepend the param type in C++ style before the param name
-                function_signature += cvar.CPPVariable.types[parameter.py_var_type[0]]
+                function_signature += self.get_parameter_type(name, types)
                 function_signature += parameter.name + ", "
 
             # Remove the extra comma and space
@@ -98,21 +212,52 @@ class CPPFunction():
 
         return function_signature + ")"
 
-    def get_formatted_function_text(self):
+    def get_formatted_function_text(self, types=None):
         """
         Generates a string with all of this function's code within it
 
+        :param types: Python type names mapped to C++ types, None for the defaults
         :return: String containing all of the function's C++ code
         """
-        return_str = ""
+        return "".join(self.iter_formatted_function_text(types))
+
+    def iter_formatted_function_text(self, types=None, line_file=None,
+                                     preamble=None):
+        """
+        Generates this function's code piece by piece so it can be written out
+        without building the whole function in memory
 
+        Parameters
+        ----------
+        types : dict of {str: str}
+            Python type names mapped to C++ types. None uses the default types
+        line_file : str
+            Name of the python file to point #line directives at, so compiler
+            messages name the python line each C++ line came from. None leaves
+            the directives out
+        preamble : list of str
+            Lines of code to start the function with, which didn't come from
+            the python script
+
+        Yields
+        ------
+        str
+            The next piece of the function's C++ code
+        """
         # First line is the function signature
-        return_str += self.get_signature() + "\n{\n"
+        if line_file is not None and self.lineno > 0:
+            yield get_line_directive(self.lineno, line_file)
+        yield self.get_signature(types) + "\n{\n"
+
+        if preamble is not None:
+            for code_str in preamble:
+                yield cline.CPPCodeLine.tab_delimiter + code_str + "\n"
 
-        # Go through all lines and get their formatted string version and
-        # append to the string we will return
+        # Go through all lines and get their formatted string version
         for line in self.lines.values():
-            return_str += line.get_formatted_code_line() + "\n"
+            if line_file is not None:
+                yield get_line_directive(line.start_line_num, line_file)
+            yield line.get_formatted_code_line() + "\n"
 
         # Add a closing bracket for the end of the function
-        return return_str + "}"
+        yield "}"
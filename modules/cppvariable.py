@@ -1,18 +1,18 @@
+import sys
+from modules import typesolver as ts
+
+
 class CPPVariable():
     """
     This class represents a variable, holding information about it to be used
     while outputting to the C++ file
     """
 
-    # Using redundant mapping to allow for changes to mapped type
-    types = {
-             "int": "int ", "float": "double ", "str": "std::string ",
-             "bool": "bool ", "None": "NULL", "char **": "char **",
-             "void": "void ", "auto": "auto ", "NoneType": "void "
-             }
+    __slots__ = ("name", "line_num", "py_var_type")
 
-    # Python uses capital letters while C++ uses lowercase
-    bool_map = {"True": "true", "False": "false"}
+    # Shared literal types handed out by get_type_cell, one per type name.
+    # They never change, so they are the only thing every translation shares
+    type_cells = {}
 
     def __init__(self, name, line_num, py_var_type):
         """
@@ -24,13 +24,39 @@ class CPPVariable():
             The name of the variable
         line_num : int
             The line number this variable was declared on in python
-        py_var_type : list of str
+        py_var_type : TypeVariable
             The type of the variable in python
         """
-        self.name = name
+        # Names repeat across functions and calls, so they are interned to
+        # share one string between every variable with the same name
+        self.name = sys.intern(name)
 
         self.line_num = line_num
 
-        # We use a list here to get a mutable type so that a change to one
-        # linked variable will reflect the change across all objects
+        # Solved along with every other type once analysis finishes
         self.py_var_type = py_var_type
+
+    @staticmethod
+    def get_type_cell(py_type):
+        """
+        Gets the shared type of a literal value. Literals make up most of the
+        types created during analysis, so sharing one constant per type
+        avoids allocating a type variable for each of them
+
+        Parameters
+        ----------
+        py_type : str
+            Name of the python type
+
+        Returns
+        -------
+        TypeVariable
+            The shared constant holding the type
+        """
+        type_cell = CPPVariable.type_cells.get(py_type)
+        if type_cell is None:
+            # Threads racing to create the same cell all get the one stored
+            type_cell = CPPVariable.type_cells.setdefault(
+                py_type, ts.TypeVariable(sys.intern(py_type), constant=True))
+
+        return type_cell
@@ -0,0 +1,651 @@
+import ast
+import bisect
+import hashlib
+import pickle
+from modules import constantfolder as cfold
+
+
+class IncrementalState():
+    """
+    Remembers the analysis of a previous run of a script so the next run can
+    reuse the CPPFunction objects of functions that haven't changed
+    """
+
+    # Name of the file the state is saved to in the output directory
+    state_filename = ".pyplus_state"
+
+    def __init__(self, settings_key=""):
+        """
+        Constructs an empty IncrementalState object
+
+        Parameters
+        ----------
+        settings_key : str
+            Identifies the translator settings the state was made with, so a
+            state saved with different settings is never reused
+        """
+        self.settings_key = settings_key
+
+        # Stored as a dictionary of {Function Key: fingerprint}
+        self.fingerprints = {}
+
+        # Names called by each function, as {Function Key: set of str}, used
+        # to find the callers of a function that changed
+        self.calls = {}
+
+        # Parameters each function's own body gives types to, as
+        # {Function Key: set of str}
+        self.typed_parameters = {}
+
+        # Finished functions of the previous run as {Function Key: CPPFunction}
+        self.functions = {}
+
+        # Parameter and return types each function had when it was stored, as
+        # {Function Key: tuple of str}
+        self.signatures = {}
+
+        # Fingerprints and calls of the run in progress. They only replace the
+        # stored ones once the run finishes
+        self.pending_fingerprints = {}
+        self.pending_calls = {}
+        self.pending_typed_parameters = {}
+
+        # Tree and contents of the script as last parsed, so the next parse
+        # can reuse the statements that didn't change. These are only kept
+        # in memory and aren't saved with the rest of the state
+        self.tree = None
+        self.source_data = None
+        self.encoding = None
+
+    def __setstate__(self, state):
+        """
+        Restores saved attributes, leaving the last parse empty
+
+        Parameters
+        ----------
+        state : dict
+            The saved attributes
+        """
+        self.__dict__.update(state)
+        self.tree = None
+        self.source_data = None
+        self.encoding = None
+
+    def __getstate__(self):
+        """
+        Gets the attributes to save, leaving out the last parse
+
+        Returns
+        -------
+        dict
+            The attributes of the state
+        """
+        state = self.__dict__.copy()
+        state["tree"] = None
+        state["source_data"] = None
+        state["encoding"] = None
+
+        return state
+
+    @staticmethod
+    def load(path, settings_key):
+        """
+        Loads a saved state, falling back to an empty one if it is missing,
+        unreadable or was saved with different settings
+
+        Parameters
+        ----------
+        path : str
+            Path to the saved state
+        settings_key : str
+            Identifies the current translator settings
+
+        Returns
+        -------
+        IncrementalState
+            The loaded state or an empty one
+        """
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+                ImportError, TypeError):
+            return IncrementalState(settings_key)
+
+        if not isinstance(state, IncrementalState) \
+                or state.settings_key != settings_key:
+            return IncrementalState(settings_key)
+
+        return state
+
+    def save(self, path):
+        """
+        Saves the state so a later process can continue from it
+
+        Parameters
+        ----------
+        path : str
+            Path to save the state to
+        """
+        try:
+            with open(path, "wb") as f:
+                pickle.dump(self, f)
+        except IOError:
+            print("Error writing file: " + path)
+
+    @staticmethod
+    def get_statement_lines(node):
+        """
+        Gets the lines a top level statement covers, including any decorators
+
+        Parameters
+        ----------
+        node : ast node
+            The statement
+
+        Returns
+        -------
+        start : int
+            First line of the statement
+        end : int
+            Last line of the statement
+        """
+        start = node.lineno
+        for decorator in getattr(node, "decorator_list", ()):
+            start = min(start, decorator.lineno)
+
+        return start, node.end_lineno
+
+    @staticmethod
+    def shift_nodes(nodes, line_count):
+        """
+        Moves nodes and everything nested in them down a number of lines
+
+        Parameters
+        ----------
+        nodes : list of ast nodes
+            The nodes to move
+        line_count : int
+            Number of lines to move down by, negative to move up
+        """
+        for node in nodes:
+            for child in ast.walk(node):
+                if "lineno" in child._attributes:
+                    child.lineno += line_count
+                    if child.end_lineno is not None:
+                        child.end_lineno += line_count
+
+    def reparse(self, data, encoding):
+        """
+        Parses a new version of the last parsed script by only parsing the
+        top level statements around the lines that changed. The statements
+        before them are kept as they are and the ones after them are moved to
+        their new lines
+
+        Parameters
+        ----------
+        data : bytes
+            The new contents of the script
+        encoding : str
+            The encoding of the script
+
+        Returns
+        -------
+        ast.Module
+            The tree of the new script, or None if it has to be parsed whole
+        """
+        if data == self.source_data:
+            return self.tree
+
+        old_lines = self.source_data.split(b"\n")
+        new_lines = data.split(b"\n")
+        common_count = min(len(old_lines), len(new_lines))
+
+        prefix_count = 0
+        while prefix_count < common_count \
+                and old_lines[prefix_count] == new_lines[prefix_count]:
+            prefix_count += 1
+        suffix_count = 0
+        while suffix_count < common_count - prefix_count \
+                and old_lines[-1-suffix_count] == new_lines[-1-suffix_count]:
+            suffix_count += 1
+
+        # An encoding declaration on the first two lines affects every line
+        if prefix_count < 2:
+            return None
+
+        # The statement on the last unchanged line is parsed again too, since
+        # indented lines added after it would continue it
+        first_line = prefix_count
+        last_line = len(old_lines) - suffix_count
+
+        body = self.tree.body
+        first_index = len(body)
+        last_index = -1
+        for index, node in enumerate(body):
+            start, end = self.get_statement_lines(node)
+            if end >= first_line and start <= last_line:
+                first_index = min(first_index, index)
+                last_index = index
+                first_line = min(first_line, start)
+                last_line = max(last_line, end)
+
+        # Only blank lines and comments changed, so the chunk goes in between
+        # the statements around them
+        if last_index == -1:
+            first_index = bisect.bisect_left([node.lineno for node in body], first_line)
+            last_index = first_index - 1
+
+        line_change = len(new_lines) - len(old_lines)
+        chunk = b"\n".join(new_lines[first_line-1:last_line+line_change])
+
+        # Lines left open at either end of the chunk, like a new indented
+        # line or an unclosed bracket, depend on the code around them so the
+        # chunk fails to parse and the whole script is parsed instead
+        try:
+            chunk_tree = ast.parse(chunk.decode(encoding))
+        except (SyntaxError, ValueError):
+            return None
+
+        self.shift_nodes(chunk_tree.body, first_line - 1)
+        if line_change != 0:
+            self.shift_nodes(body[last_index+1:], line_change)
+
+        return ast.Module(body=body[:first_index] + chunk_tree.body + body[last_index+1:],
+                          type_ignores=[])
+
+    def parse(self, raw_lines):
+        """
+        Parses the script, reusing the tree of the previous parse for the
+        statements that haven't changed since. Memory mapped scripts are
+        always parsed whole and never kept
+
+        Parameters
+        ----------
+        raw_lines : PySource
+            The python script to parse
+
+        Returns
+        -------
+        ast.Module
+            The tree of the script
+        """
+        if raw_lines.source_file is not None:
+            self.tree = self.source_data = self.encoding = None
+            return ast.parse(raw_lines.data)
+
+        tree = None
+        if self.tree is not None and self.encoding == raw_lines.encoding:
+            tree = self.reparse(raw_lines.data, raw_lines.encoding)
+        if tree is None:
+            tree = ast.parse(raw_lines.data)
+
+        self.tree = tree
+        self.source_data = raw_lines.data
+        self.encoding = raw_lines.encoding
+
+        return tree
+
+    @staticmethod
+    def get_full_type(variable):
+        """
+        Gets the type of a variable along with the types of its items and
+        keys
+
+        Parameters
+        ----------
+        variable : TypeVariable
+            The variable to get the type of
+
+        Returns
+        -------
+        str
+            The type, with item and key types in brackets
+        """
+        root = variable.find()
+        full_type = root.get_type()
+        inner_types = [IncrementalState.get_full_type(inner) for inner
+                       in (root.key, root.element) if inner is not None]
+        if len(inner_types) > 0:
+            full_type += "[" + ", ".join(inner_types) + "]"
+
+        return full_type
+
+    @staticmethod
+    def get_signature(function):
+        """
+        Gets the types that calls to a function depend on
+
+        Parameters
+        ----------
+        function : CPPFunction
+            The function to get the signature of
+
+        Returns
+        -------
+        tuple of str
+            The parameter names and types followed by the return type, with
+            the types of container items and keys
+        """
+        signature = []
+        for parameter in function.parameters.values():
+            signature.append(parameter.name)
+            signature.append(IncrementalState.get_full_type(parameter.py_var_type))
+        signature.append(IncrementalState.get_full_type(function.return_type))
+
+        return tuple(signature)
+
+    @staticmethod
+    def get_called_names(nodes):
+        """
+        Finds the names of every function called within the given nodes
+
+        Parameters
+        ----------
+        nodes : list of ast nodes
+            The nodes to search
+
+        Returns
+        -------
+        set of str
+            Names of the called functions
+        """
+        names = set()
+        for node in nodes:
+            for child in ast.walk(node):
+                if child.__class__ is ast.Call and child.func.__class__ is ast.Name:
+                    names.add(child.func.id)
+
+        return names
+
+    @staticmethod
+    def get_typed_parameters(node):
+        """
+        Finds the parameters of a function that its own body can give a type
+        to, by assigning them, adding items to them or sharing them with
+        other variables that might
+
+        Parameters
+        ----------
+        node : ast.FunctionDef
+            The function to search
+
+        Returns
+        -------
+        set of str
+            Names of the parameters
+        """
+        args = node.args
+        parameters = {arg.arg for arg in args.posonlyargs + args.args + args.kwonlyargs}
+        for arg in (args.vararg, args.kwarg):
+            if arg is not None:
+                parameters.add(arg.arg)
+
+        typed = set()
+        for child in ast.walk(ast.Module(body=node.body, type_ignores=[])):
+            if child.__class__ is ast.Name and child.ctx.__class__ is not ast.Load:
+                typed.add(child.id)
+            elif child.__class__ is ast.Call and child.func.__class__ is ast.Attribute \
+                    and child.func.value.__class__ is ast.Name:
+                typed.add(child.func.value.id)
+            elif child.__class__ is ast.Subscript and child.ctx.__class__ is not ast.Load \
+                    and child.value.__class__ is ast.Name:
+                typed.add(child.value.id)
+            elif child.__class__ in (ast.Assign, ast.AnnAssign, ast.AugAssign) \
+                    and child.value.__class__ is ast.Name:
+                # Containers assigned to another name share their items
+                typed.add(child.value.id)
+            elif child.__class__ in (ast.List, ast.Set, ast.Tuple):
+                typed.update(element.id for element in child.elts
+                             if element.__class__ is ast.Name)
+            elif child.__class__ is ast.Dict:
+                typed.update(value.id for value in child.keys + child.values
+                             if value.__class__ is ast.Name)
+
+        return typed & parameters
+
+    def fingerprint_tree(self, tree, raw_lines):
+        """
+        Fingerprints every function in the script along with the module level
+        code that goes into the main function
+
+        Parameters
+        ----------
+        tree : list of ast nodes
+            The module body from ast.parse
+        raw_lines : PySource
+            The original python script
+
+        Returns
+        -------
+        fingerprints : dict of {str: str}
+            Fingerprint of each function, or None if the script can't be
+            translated incrementally
+        calls : dict of {str: set of str}
+            Names called by each function
+        typed_parameters : dict of {str: set of str}
+            Parameters each function's own body gives types to
+        """
+        fingerprints = {}
+        calls = {}
+        typed_parameters = {}
+        main_hash = hashlib.sha256()
+
+        # First line of the module level code since the last function
+        gap_start = 1
+
+        # Functions read the values of module constants, which are set
+        # outside of them, so changing a constant changes every function
+        constants = repr(sorted(cfold.ConstantFolder.find_module_constants(tree).items()))
+
+        for node in tree:
+            if node.__class__ is ast.FunctionDef:
+                # Redefined functions share a key, so they can't be told apart
+                if node.name in fingerprints:
+                    return None, None, None
+
+                # A function starts on a line of its own, so the same lines
+                # always parse to the same function and the same comments.
+                # Hashing them is much quicker than dumping the tree, and
+                # positions are left out so a function that only moved can
+                # still be reused. The encoding decides how the lines decode
+                function_hash = hashlib.sha256(raw_lines.encoding.encode())
+                function_hash.update(raw_lines.get_line_bytes(node.lineno, node.end_lineno))
+                function_hash.update(constants.encode())
+                fingerprints[node.name] = function_hash.hexdigest()
+
+                # Unchanged functions still call the same names and type the
+                # same parameters
+                if fingerprints[node.name] == self.fingerprints.get(node.name):
+                    calls[node.name] = self.calls[node.name]
+                    typed_parameters[node.name] = self.typed_parameters[node.name]
+                else:
+                    calls[node.name] = self.get_called_names(node.body)
+                    typed_parameters[node.name] = self.get_typed_parameters(node)
+
+                # Code and comments outside of functions go into the main
+                # function, so any change to them or their position changes
+                # main
+                main_hash.update((str(gap_start) + ":").encode())
+                main_hash.update(raw_lines.get_line_bytes(gap_start, node.lineno - 1))
+                gap_start = node.end_lineno + 1
+
+        main_hash.update((str(gap_start) + ":").encode())
+        main_hash.update(raw_lines.get_line_bytes(gap_start, len(raw_lines)))
+        main_hash.update(raw_lines.encoding.encode())
+
+        fingerprints["0"] = main_hash.hexdigest()
+        if fingerprints["0"] == self.fingerprints.get("0"):
+            calls["0"] = self.calls["0"]
+        else:
+            calls["0"] = self.get_called_names([node for node in tree
+                                                if node.__class__ is not ast.FunctionDef])
+        typed_parameters["0"] = set()
+
+        return fingerprints, calls, typed_parameters
+
+    def diff(self, tree, raw_lines):
+        """
+        Compares the script against the previous run and finds the functions
+        that can be reused. A function is reused when it is unchanged and
+        doesn't call anything that was changed, added or removed, or that is
+        analyzed again. A function whose parameters start over is only reused
+        if its own body doesn't give them types, since only the calls to it are
+        analyzed again
+
+        Parameters
+        ----------
+        tree : list of ast nodes
+            The module body from ast.parse
+        raw_lines : PySource
+            The original python script
+
+        Returns
+        -------
+        dict of {str: CPPFunction}
+            The reusable functions, already moved to their new lines
+        """
+        fingerprints, calls, typed_parameters = self.fingerprint_tree(tree, raw_lines)
+        if fingerprints is None:
+            self.pending_fingerprints = {}
+            self.pending_calls = {}
+            self.pending_typed_parameters = {}
+            return {}
+
+        self.pending_fingerprints = fingerprints
+        self.pending_calls = calls
+        self.pending_typed_parameters = typed_parameters
+
+        changed = set()
+        for key in fingerprints.keys() | self.fingerprints.keys():
+            if fingerprints.get(key) != self.fingerprints.get(key):
+                changed.add(key)
+
+        line_numbers = {node.name: node.lineno for node in tree
+                        if node.__class__ is ast.FunctionDef}
+
+        reuse = {}
+        for key in fingerprints:
+            if key in changed or key not in self.functions \
+                    or len(calls[key] & changed) > 0:
+                continue
+
+            reuse[key] = self.functions[key]
+        self.exclude_callers(reuse)
+
+        # Analyzing a function again can unsettle the functions it calls, so
+        # this repeats until every unsettled function left has untyped
+        # parameters
+        while True:
+            settled = self.get_settled_functions(reuse)
+            retyped = [key for key in reuse
+                       if key not in settled and len(typed_parameters[key]) > 0]
+            if len(retyped) == 0:
+                break
+            self.invalidate(reuse, retyped)
+
+        for key, function in reuse.items():
+            if key != "0":
+                function.shift_lines(line_numbers[key] - function.lineno)
+
+        return reuse
+
+    def exclude_callers(self, reuse):
+        """
+        Stops reusing the functions that call a function that is analyzed
+        again, repeating until there are none left. A function analyzed again
+        only gets its parameter types from the calls that are analyzed too
+
+        Parameters
+        ----------
+        reuse : dict of {str: CPPFunction}
+            The functions to reuse, updated in place
+        """
+        analyzed = self.pending_fingerprints.keys() - reuse.keys()
+        while len(analyzed) > 0:
+            callers = [key for key in reuse if len(self.pending_calls[key] & analyzed) > 0]
+            for key in callers:
+                del reuse[key]
+            analyzed = set(callers)
+
+    def get_settled_functions(self, reuse):
+        """
+        Finds the reused functions that are only called from other reused
+        functions, both in this run and the previous one. None of the calls
+        to them were changed, added or removed, so the types of their
+        parameters can't change
+
+        Parameters
+        ----------
+        reuse : dict of {str: CPPFunction}
+            The functions that are reused
+
+        Returns
+        -------
+        set of str
+            Keys of the settled functions
+        """
+        settled = set(reuse.keys())
+        for calls in (self.calls, self.pending_calls):
+            for key, called_names in calls.items():
+                if key not in reuse:
+                    settled -= called_names
+
+        return settled
+
+    def find_stale_functions(self, functions, reuse):
+        """
+        Finds reused functions whose parameter or return types were changed
+        by the call sites that were analyzed again. Their bodies were typed
+        with the old types, so they can't be reused after all
+
+        Parameters
+        ----------
+        functions : dict of {str: CPPFunction}
+            The functions of the run in progress
+        reuse : dict of {str: CPPFunction}
+            The functions that were reused
+
+        Returns
+        -------
+        set of str
+            Keys of the functions that are out of date
+        """
+        stale = set()
+        for key in reuse:
+            if self.get_signature(functions[key]) != self.signatures[key]:
+                stale.add(key)
+
+        return stale
+
+    def invalidate(self, reuse, stale):
+        """
+        Stops reusing the stale functions and the functions that call them,
+        directly or through other functions
+
+        Parameters
+        ----------
+        reuse : dict of {str: CPPFunction}
+            The functions to reuse, updated in place
+        stale : set of str
+            Keys of the functions that are out of date
+        """
+        for key in stale:
+            del reuse[key]
+        self.exclude_callers(reuse)
+
+    def update(self, functions):
+        """
+        Stores the finished functions of a run for the next one to reuse
+
+        Parameters
+        ----------
+        functions : dict of {str: CPPFunction}
+            The functions of the finished run
+        """
+        self.fingerprints = self.pending_fingerprints
+        self.calls = self.pending_calls
+        self.typed_parameters = self.pending_typed_parameters
+        self.functions = dict(functions)
+        self.signatures = {key: self.get_signature(function)
+                           for key, function in functions.items()}
@@ -0,0 +1,180 @@
+import os
+import shutil
+import uuid
+
+# Size of the blocks files are read in when comparing them
+compare_block_size = 64 * 1024
+
+
+def get_temp_path(file_path):
+    """
+    Gets a path next to a file to write its new contents to before they
+    replace it. Being in the same directory keeps the rename atomic, and the
+    random part keeps threads and processes writing the same file apart
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the file that will be replaced
+
+    Returns
+    -------
+    str
+        Path to a file that doesn't exist yet
+    """
+    directory, filename = os.path.split(file_path)
+    return os.path.join(directory, "." + filename + "." + uuid.uuid4().hex + ".tmp")
+
+
+def replace_file(file_path, write):
+    """
+    Writes a new version of a file next to it and renames it over the old
+    one, so readers such as a parallel build only ever see a whole file
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the file to replace
+    write : function
+        Called with the path to write the new version to
+    """
+    temp_path = get_temp_path(file_path)
+    try:
+        write(temp_path)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_text_if_changed(file_path, chunks, buffer_size=-1):
+    """
+    Writes text to a file unless it already holds exactly that text, so its
+    modification time only changes with its contents and builds don't redo
+    work for it. The text is compared with the file as it is generated, and
+    a changed file is replaced as a whole
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the file to write
+    chunks : str or iterable of str
+        The text to write, whole or in pieces
+    buffer_size : int
+        Size of the buffer used when writing. -1 uses the default
+
+    Returns
+    -------
+    bool
+        Whether the file was written
+    """
+    if isinstance(chunks, str):
+        chunks = [chunks]
+
+    # Files are read and written without newline translation, so newlines
+    # are turned into the ones of this platform here
+    if os.linesep != "\n":
+        chunks = (chunk.replace("\n", os.linesep) for chunk in chunks)
+    chunks = iter(chunks)
+
+    # Length of the text that matched the file before the first difference,
+    # and the piece the difference was found in
+    matched_length = 0
+    different_chunk = None
+    try:
+        # Bytes that can't be decoded just count as a difference
+        with open(file_path, "r", newline="", errors="surrogateescape") as f:
+            for chunk in chunks:
+                if f.read(len(chunk)) != chunk:
+                    different_chunk = chunk
+                    break
+                matched_length += len(chunk)
+            else:
+                if f.read(1) == "":
+                    return False
+    except FileNotFoundError:
+        pass
+
+    def write(temp_path):
+        with open(temp_path, "x", newline="", buffering=buffer_size) as f:
+            # The text that matched is copied back from the old file so the
+            # pieces never have to be held in memory
+            if matched_length > 0:
+                with open(file_path, "r", newline="",
+                          errors="surrogateescape") as old_file:
+                    remaining = matched_length
+                    while remaining > 0:
+                        block = old_file.read(min(remaining, compare_block_size))
+                        if block == "":
+                            raise OSError("File changed while being replaced: "
+                                          + file_path)
+                        f.write(block)
+                        remaining -= len(block)
+            if different_chunk is not None:
+                f.write(different_chunk)
+            f.writelines(chunks)
+
+    replace_file(file_path, write)
+
+    return True
+
+
+def files_match(first_path, second_path):
+    """
+    Checks whether two files have the same contents. Sizes are compared
+    first so most changed files are never read
+
+    Parameters
+    ----------
+    first_path : str
+        Path to one file
+    second_path : str
+        Path to the other file
+
+    Returns
+    -------
+    bool
+        Whether both files exist and are the same
+    """
+    try:
+        if os.stat(first_path).st_size != os.stat(second_path).st_size:
+            return False
+
+        with open(first_path, "rb") as first, open(second_path, "rb") as second:
+            while True:
+                block = first.read(compare_block_size)
+                if block != second.read(compare_block_size):
+                    return False
+                if len(block) == 0:
+                    return True
+
+    except OSError:
+        return False
+
+
+def copy_file_if_changed(source_path, file_path):
+    """
+    Copies a file unless the destination already holds the same contents,
+    replacing a changed destination as a whole
+
+    Parameters
+    ----------
+    source_path : str
+        Path to the file to copy
+    file_path : str
+        Path to copy it to
+
+    Returns
+    -------
+    bool
+        Whether the file was copied
+    """
+    if files_match(source_path, file_path):
+        return False
+
+    replace_file(file_path, lambda temp_path: shutil.copyfile(source_path, temp_path))
+
+    return True
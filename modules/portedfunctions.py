@@ -1,26 +1,153 @@
-def print_translation(args):
+from modules import pyplusexceptions as ppex
+
+
+# Escapes for characters that can't appear as they are in a C++ literal
+literal_escapes = {"\\": "\\\\", "\n": "\\n", "\t": "\\t", "\r": "\\r",
+                   "\0": "\\0"}
+
+# Streams python can print to mapped to their C++ streams
+print_streams = {"sys.stdout": "std::cout", "sys.stderr": "std::cerr"}
+
+
+def get_string_literal(value, allow_char=False):
+    """
+    Converts a python string to a C++ literal
+
+    Parameters
+    ----------
+    value : str
+        The python string
+    allow_char : bool
+        Whether a string of one character can become a char literal, which
+        streams insert without a length lookup
+
+    Returns
+    -------
+    str
+        The C++ literal
+    """
+    if allow_char and len(value) == 1:
+        quote = "'"
+    else:
+        quote = "\""
+
+    return quote + "".join(literal_escapes.get(char, "\\" + char if char == quote else char)
+                           for char in value) + quote
+
+
+def get_literal_value(arg):
+    """
+    Finds the python string a translated string literal stands for
+
+    Parameters
+    ----------
+    arg : str
+        A translated argument
+
+    Returns
+    -------
+    str
+        The value of the literal, or None if the argument isn't a plain
+        string literal
+    """
+    if len(arg) < 2 or arg[0] not in "'\"" or arg[-1] != arg[0]:
+        return None
+
+    value = []
+    index = 1
+    while index < len(arg) - 1:
+        char = arg[index]
+        if char == arg[0]:
+            # Adjacent literals or an expression using two of them
+            return None
+        if char == "\\":
+            index += 1
+            escaped = "\\" + arg[index]
+            char = next((key for key, escape in literal_escapes.items()
+                         if escape == escaped), arg[index])
+        value.append(char)
+        index += 1
+
+    return "".join(value)
+
+
+def print_translation(args, keywords=None):
     """
-    Parses calls to print to convert to the C++ equivalent
+    Parses calls to print to convert to the C++ equivalent. Arguments are
+    inserted into the stream one at a time, so they can have any mix of
+    types, and lines end with a newline rather than std::endl so the stream
+    is only flushed when flush=True asks for it
 
     Parameters
     ----------
     args : list of str
         List of arguments to add to the print statement
+    keywords : dict of {str: str}
+        The sep, end, file and flush keywords, if given
 
     Returns
     -------
     str
         The converted print statement
+
+    Raises
+    ------
+    TranslationNotSupported
+        If a keyword can't be translated
     """
-    return_str = "std::cout << "
+    if keywords is None:
+        keywords = {}
+
+    for keyword in keywords:
+        if keyword not in ("sep", "end", "file", "flush"):
+            raise ppex.TranslationNotSupported("TODO: Unknown keyword for print")
+
+    stream = print_streams.get(keywords.get("file", "sys.stdout"))
+    if stream is None:
+        raise ppex.TranslationNotSupported("TODO: Can only print to stdout or stderr")
+
+    flush = keywords.get("flush", "false")
+    if flush not in ("true", "false"):
+        raise ppex.TranslationNotSupported("TODO: flush must be True or False")
+
+    # Literal separators and endings are merged into the literals around
+    # them, so there are as few insertions as possible. Like in python, None
+    # means the default
+    sep = keywords.get("sep", "None")
+    if sep == "None":
+        sep = get_string_literal(" ", True)
+    end = keywords.get("end", "None")
+    if end == "None":
+        end = get_string_literal("\n", True)
 
-    for arg in args[:-1]:
-        return_str += arg + " + "
+    pieces = []
+    for index, arg in enumerate(args):
+        if index > 0:
+            pieces.append(sep)
+        pieces.append(arg)
+    pieces.append(end)
 
-    return return_str + args[-1] + " << std::endl"
+    merged = []
+    for piece in pieces:
+        value = get_literal_value(piece)
+        if value is not None and len(merged) > 0 \
+                and get_literal_value(merged[-1]) is not None:
+            value = get_literal_value(merged[-1]) + value
+            merged[-1] = get_string_literal(value, True)
+        elif value != "":
+            merged.append(piece)
 
+    if flush == "true":
+        merged.append("std::flush")
 
-def sqrt_translation(args):
+    if len(merged) == 0:
+        # Printing nothing still creates the stream
+        return stream + " << \"\""
+
+    return stream + " << " + " << ".join(merged)
+
+
+def sqrt_translation(args, keywords=None):
     """
     Parses calls to sqrt to convert to the C++ equivalent
 
@@ -28,10 +155,56 @@ def sqrt_translation(args):
     ----------
     args : list of str
         List of arguments to add to the print statement
+    keywords : dict of {str: str}
+        Keyword arguments, which sqrt doesn't take
 
     Returns
     -------
     str
         The converted sqrt statement
+
+    Raises
+    ------
+    TranslationNotSupported
+        If more than one argument or any keyword is given
     """
+    if keywords:
+        raise ppex.TranslationNotSupported("TODO: Unknown keyword for sqrt")
+
+    if len(args) > 1:
+        raise ppex.TranslationNotSupported("TODO: Can't square more than 1 item")
+
     return "sqrt(" + args[0] + ")"
+
+
+def len_translation(args, keywords=None):
+    """
+    Parses calls to len to convert to the C++ equivalent. Lists and strings
+    both know their size in C++. The size is unsigned, so it is cast to the
+    int len is typed as, which keeps len(v) - 1 and comparisons with negative
+    numbers working like they do in python
+
+    Parameters
+    ----------
+    args : list of str
+        List of arguments passed to len
+    keywords : dict of {str: str}
+        Keyword arguments, which len doesn't take
+
+    Returns
+    -------
+    str
+        The converted len call
+
+    Raises
+    ------
+    TranslationNotSupported
+        If anything but a single argument is given
+    """
+    if keywords:
+        raise ppex.TranslationNotSupported("TODO: Unknown keyword for len")
+
+    if len(args) != 1:
+        raise ppex.TranslationNotSupported("TODO: len takes exactly 1 item")
+
+    return "static_cast<int>(" + args[0] + ".size())"
@@ -1,10 +1,15 @@
 import ast
+import re
 from modules import cppfile as cfile
 from modules import cppfunction as cfun
 from modules import cppvariable as cvar
 from modules import cppcodeline as cline
-from modules import pyplusexceptions as ppex
 from modules import portedfunctions as pf
+from modules import pyplusexceptions as ppex
+from modules import typesolver as ts
+from modules import constantfolder as cfold
+from modules import translationprofiler as tprof
+from modules import translationcontext as tctx
 
 
 class PyAnalyzer():
@@ -13,31 +18,15 @@ class PyAnalyzer():
     translates python calls to C++ calls
     """
 
-    # Helps evaluate variable types when performing operations on different
-    # types
-    type_precedence_dict = {"str": 0, "float": 1, "int": 2, "bool": 3,
-                            "auto": 8, "None": 9, "void": 9}
-
-    # Python operators translated to C++ operators
-    operator_map = {"Add": "+", "Sub": "-", "Mult": " * ", "Div": "/",
-                    "Mod": " % ", "LShift": " << ", "RShift": " >> ",
-                    "BitOr": " | ", "BitAnd": " & ", "BitXor": " ^ ",
-                    "FloorDiv": "/", "Pow": "Pow", "Not": "!",
-                    "Invert": "~", "UAdd": "+", "USub": "-", "And": " && ",
-                    "Or": " || "
-                    }
-
-    # Tuple of all functions we have a special conversion from python to C++
-    ported_functions = ("print", "sqrt")
+    # Marks where code that waits for the types to be solved goes, see
+    # defer_str
+    deferred_pattern = re.compile("\x00([0-9]+)\x00")
 
-    # Python Comparison operators translated to C++ operators
-    # We aren't able to do in/is checks easily, so they are excluded from the
-    # mapping
-    comparison_map = {"Eq": " == ", "NotEq": " != ", "Lt": " < ",
-                      "LtE": " <= ", "Gt": " > ", "GtE": " >= "
-                      }
+    # Nodes whose handlers always return a new type variable or a literal
+    # type. Their results are only stored in one place, see add_type_flow
+    merged_result_nodes = (ast.BinOp, ast.BoolOp)
 
-    def __init__(self, output_files, raw_lines):
+    def __init__(self, output_files, raw_lines, profiler=None, context=None):
         """
         Initializes an object that will recurse through an AST to convert
         python code text to objects representing C++ code
@@ -47,14 +36,177 @@ class PyAnalyzer():
         output_files : list of CPPFile objects
             List to store CPPFiles that the analyzer will reference during
             analysis
-        raw_lines : list of str
-            List containing the original python script, line by line
+        raw_lines : PySource
+            The original python script, read line by line
+        profiler : TranslationProfiler
+            Records the time spent in each phase and node handler. None
+            turns profiling off
+        context : TranslationContext
+            Tables and working state of the translation. None uses a new
+            context with the default tables
         """
-        self.output_files = output_files
+        if context is None:
+            context = tctx.TranslationContext()
+        self.context = context
+
+        self.context.output_files = output_files
 
         self.raw_lines = raw_lines
 
-    def analyze(self, tree, file_index, function_key, indent):
+        # Works out the types of every variable, parameter and return value
+        # from the flows between them found during analysis
+        self.context.solver = ts.TypeSolver(self.type_precedence)
+
+        self.profiler = profiler
+
+        # Sets that become bitsets, stored as a set of
+        # (Function Key, Variable Name). Found when analysis starts
+        self.small_sets = set()
+
+        # Every name the script uses, so variables the translation adds
+        # don't clash with them. Found when analysis starts
+        self.used_names = set()
+
+        # Code that depends on types only known once they are solved, such as
+        # indexing a parameter, stored as
+        # {Placeholder Number: (ast node, Function to translate it, Arguments)}
+        self.deferred_strs = {}
+
+        # The completion flag each break sets when it leaves a for loop that
+        # has an else, stored as {ast.Break: Flag Name}
+        self.break_flags = {}
+
+        # Works out the values known at translation time. Replaced with one
+        # that knows the module constants when analysis starts
+        self.constant_folder = cfold.ConstantFolder()
+
+        # Looked up once here since the tables are used for every node
+        self.statement_handlers, self.expression_handlers = self.get_dispatch_tables()
+
+        # Profiling swaps in wrapped copies of the tables, so analysis costs
+        # nothing extra when it is off
+        if profiler is not None:
+            self.statement_handlers = {node_type: profiler.wrap_handler(node_type, handler)
+                                       for node_type, handler in self.statement_handlers.items()}
+            self.expression_handlers = {node_type: profiler.wrap_handler(node_type, handler)
+                                        for node_type, handler in self.expression_handlers.items()}
+
+    @property
+    def output_files(self):
+        """
+        list of CPPFile : The files being translated to, held by the context
+        """
+        return self.context.output_files
+
+    @property
+    def solver(self):
+        """
+        TypeSolver : The type solver of this analysis, held by the context
+        """
+        return self.context.solver
+
+    @classmethod
+    def get_dispatch_tables(cls):
+        """
+        Gets the tables mapping each ast node class to the function that
+        translates it. They are built the first time a class is used, from its
+        parse_ methods and the handlers registered for it and its bases
+
+        Returns
+        -------
+        statement_handlers : dict of {type: function}
+            Handlers for statement nodes, called as
+            handler(analyzer, node, file_index, function_key, indent)
+        expression_handlers : dict of {type: function}
+            Handlers for expression nodes, called as
+            handler(analyzer, node, file_index, function_key) and returning
+            the same tuple as recurse_operator
+        """
+        # Checking this class's own namespace keeps a subclass from using
+        # the tables built for its base class
+        tables = cls.__dict__.get("_dispatch_tables")
+        if tables is not None:
+            return tables
+
+        statement_handlers = {}
+        expression_handlers = {}
+
+        for name in dir(cls):
+            if not name.startswith("parse_"):
+                continue
+
+            # Only methods named after an ast node class handle that node
+            node_type = getattr(ast, name[len("parse_"):], None)
+            if not isinstance(node_type, type) or not issubclass(node_type, ast.AST):
+                continue
+
+            if issubclass(node_type, ast.stmt):
+                statement_handlers[node_type] = getattr(cls, name)
+            elif issubclass(node_type, ast.expr):
+                expression_handlers[node_type] = getattr(cls, name)
+
+        # Registered handlers of a subclass override those of its bases
+        for base in reversed(cls.__mro__):
+            statement_handlers.update(base.__dict__.get("registered_statement_handlers", {}))
+            expression_handlers.update(base.__dict__.get("registered_expression_handlers", {}))
+
+        tables = (statement_handlers, expression_handlers)
+        cls._dispatch_tables = tables
+        return tables
+
+    @classmethod
+    def clear_dispatch_tables(cls):
+        """
+        Throws away the dispatch tables of this class and its subclasses so
+        they are built again with the current handlers
+        """
+        if "_dispatch_tables" in cls.__dict__:
+            del cls._dispatch_tables
+
+        for subclass in cls.__subclasses__():
+            subclass.clear_dispatch_tables()
+
+    @classmethod
+    def register_statement_handler(cls, node_type, handler):
+        """
+        Registers a function to translate a statement node, without having
+        to subclass the analyzer. Analyzers created afterwards use it
+
+        Parameters
+        ----------
+        node_type : type
+            The ast statement class to handle, such as ast.For
+        handler : function
+            Called as handler(analyzer, node, file_index, function_key, indent)
+            and expected to add its lines to the current function
+        """
+        if "registered_statement_handlers" not in cls.__dict__:
+            cls.registered_statement_handlers = {}
+        cls.registered_statement_handlers[node_type] = handler
+        cls.clear_dispatch_tables()
+
+    @classmethod
+    def register_expression_handler(cls, node_type, handler):
+        """
+        Registers a function to translate an expression node, without having
+        to subclass the analyzer. Analyzers created afterwards use it
+
+        Parameters
+        ----------
+        node_type : type
+            The ast expression class to handle, such as ast.Subscript
+        handler : function
+            Called as handler(analyzer, node, file_index, function_key) and
+            expected to return a tuple of the C++ string and its
+            TypeVariable, or raise TranslationNotSupported
+        """
+        if "registered_expression_handlers" not in cls.__dict__:
+            cls.registered_expression_handlers = {}
+        cls.registered_expression_handlers[node_type] = handler
+        cls.clear_dispatch_tables()
+
+    def analyze(self, tree, file_index, function_key, indent, reuse=None,
+                settled=None):
         """
         This launches the analysis process, starting with pre-analysis before
         beginning the main analysis step
@@ -69,11 +221,42 @@ class PyAnalyzer():
             Key used to find the correct function in the function dictionary
         indent : int
             How much indentation a line should have
+        reuse : dict of {str: CPPFunction}
+            Already analyzed functions from a previous run that should be used
+            as is instead of analyzing them again
+        settled : set of str
+            Keys of the reused functions that are only called from other
+            reused functions, so their parameters keep their previous types
         """
-        self.pre_analysis(tree, file_index, indent)
-        self.analyze_tree(tree, file_index, function_key, indent)
+        if reuse is None:
+            reuse = {}
+
+        self.constant_folder = cfold.ConstantFolder(tree, function_key)
+
+        self.used_names = {internal_node.id if internal_node.__class__ is ast.Name
+                           else internal_node.arg
+                           for node in tree for internal_node in ast.walk(node)
+                           if internal_node.__class__ in (ast.Name, ast.arg)}
+        self.used_names.update(node.name for node in tree
+                               if node.__class__ is ast.FunctionDef)
+
+        if self.context.small_set_size is not None:
+            self.small_sets = self.find_small_sets(tree, function_key)
+
+        with tprof.profile_phase(self.profiler, "pre_analysis"):
+            self.pre_analysis(tree, file_index, indent, reuse, settled)
+
+        with tprof.profile_phase(self.profiler, "analyze_tree"):
+            if function_key in reuse:
+                self.reuse_function(reuse[function_key], file_index)
+            else:
+                self.analyze_tree(tree, file_index, function_key, indent)
 
-    def pre_analysis(self, tree, file_index, indent):
+        with tprof.profile_phase(self.profiler, "solve_types"):
+            self.solver.solve()
+            self.resolve_deferred_strs()
+
+    def pre_analysis(self, tree, file_index, indent, reuse=None, settled=None):
         """
         Performs pre-analysis on the script by going through and translating
         all functions that have been declared in this script
@@ -86,17 +269,148 @@ class PyAnalyzer():
             Index of the file to write to in the output_files list
         indent : int
             How much indentation a line should have
+        reuse : dict of {str: CPPFunction}
+            Already analyzed functions from a previous run that should be used
+            as is instead of analyzing them again
+        settled : set of str
+            Keys of the reused functions that are only called from other
+            reused functions, so their parameters keep their previous types
         """
+        if reuse is None:
+            reuse = {}
+        if settled is None:
+            settled = set()
+
         # First work through function declarations so we know what calls go to
         # self written functions
         for node in tree:
             if node.__class__ is ast.FunctionDef:
-                self.parse_function_header(node, file_index)
+                if node.name in reuse:
+                    # Calls analyzed in this run decide the parameter types,
+                    # so they start over unless none of the calls are
+                    if node.name not in settled:
+                        reuse[node.name].parameters = self.get_parameters(node)
+                    self.output_files[file_index].functions[node.name] = reuse[node.name]
+                else:
+                    self.parse_function_header(node, file_index)
+
+        self.find_parameter_passing(tree, file_index)
 
         # Now we'll parse the bodies of the functions
         for node in tree:
             if node.__class__ is ast.FunctionDef:
-                self.analyze_tree(node.body, file_index, node.name, indent)
+                if node.name in reuse:
+                    self.reuse_function(reuse[node.name], file_index)
+                else:
+                    self.analyze_tree(node.body, file_index, node.name, indent)
+
+    def find_parameter_passing(self, tree, file_index):
+        """
+        Works out which parameters of each function are changed, which
+        decides how containers are passed to it. Passing a parameter on to a
+        function that changes it counts as changing it
+
+        Parameters
+        ----------
+        tree : List of ast nodes
+            List containing ast nodes from ast.parse
+        file_index : int
+            Index of the file the functions are in
+        """
+        functions = self.output_files[file_index].functions
+        definitions = {node.name: node for node in tree
+                       if node.__class__ is ast.FunctionDef and node.name in functions}
+
+        # Parameters passed on to other functions, stored as a dictionary of
+        # {Function Name: [(Parameter Name, Called Function, Argument Index)]}
+        passed_on = {}
+        for name, node in definitions.items():
+            function = functions[name]
+            function.reference_parameters = set()
+            function.copied_parameters = set()
+            parameters = {arg.arg for arg in node.args.args}
+            passed_on[name] = []
+
+            for internal_node in ast.walk(node):
+                if internal_node.__class__ is ast.Name:
+                    if internal_node.ctx.__class__ is not ast.Load \
+                            and internal_node.id in parameters:
+                        function.copied_parameters.add(internal_node.id)
+
+                elif internal_node.__class__ is ast.Subscript:
+                    # Storing an item changes the container it is stored in
+                    base_name = self.get_base_name(internal_node)
+                    if internal_node.ctx.__class__ is not ast.Load and base_name in parameters:
+                        function.reference_parameters.add(base_name)
+
+                elif internal_node.__class__ is ast.Call:
+                    if internal_node.func.__class__ is ast.Attribute:
+                        base_name = self.get_base_name(internal_node.func.value)
+                        if base_name in parameters:
+                            function.reference_parameters.add(base_name)
+
+                    elif internal_node.func.__class__ is ast.Name \
+                            and internal_node.func.id in definitions:
+                        for index, arg in enumerate(internal_node.args):
+                            if arg.__class__ is ast.Name and arg.id in parameters:
+                                passed_on[name].append((arg.id, internal_node.func.id, index))
+
+        # Changes pass back up through every function a parameter was passed
+        # through
+        changed = True
+        while changed:
+            changed = False
+            for name, passes in passed_on.items():
+                for parameter, called_name, index in passes:
+                    called_parameters = list(functions[called_name].parameters)
+                    if index < len(called_parameters) \
+                            and called_parameters[index] in functions[called_name].reference_parameters \
+                            and parameter not in functions[name].reference_parameters:
+                        functions[name].reference_parameters.add(parameter)
+                        changed = True
+
+    def get_base_name(self, node):
+        """
+        Finds the variable an item or attribute belongs to, such as x in
+        x[1][2]
+
+        Parameters
+        ----------
+        node : ast node
+            The expression to search
+
+        Returns
+        -------
+        str
+            Name of the variable, or None if the expression doesn't start with
+            one
+        """
+        while node.__class__ in (ast.Subscript, ast.Attribute):
+            node = node.value
+
+        if node.__class__ is ast.Name:
+            return node.id
+
+        return None
+
+    def reuse_function(self, function, file_index):
+        """
+        Puts a function analyzed by a previous run into the output file in
+        place of analyzing its body again
+
+        Parameters
+        ----------
+        function : CPPFunction
+            The previously analyzed function
+        file_index : int
+            Index of the file to write to in the output_files list
+        """
+        self.output_files[file_index].functions[function.name] = function
+
+        # Adding the includes where the body would have been analyzed keeps
+        # their order the same as a full run
+        for file in function.includes:
+            self.output_files[file_index].add_include_file(file)
 
     def parse_function_header(self, node, file_index):
         """
@@ -111,7 +425,6 @@ class PyAnalyzer():
         file_index : int
             Index of the file to write to in the output_files list
         """
-        func_ref = self.output_files[file_index].functions
         args = node.args
 
         # Verify the function can actually be converted to C++
@@ -120,6 +433,28 @@ class PyAnalyzer():
                 or args.vararg is not None:
             return
 
+        func_ref = self.output_files[file_index].functions
+        func_ref[node.name] = cfun.CPPFunction(node.name, node.lineno,
+                                               node.end_lineno,
+                                               self.get_parameters(node))
+
+    def get_parameters(self, node):
+        """
+        Creates the parameters of a function. Parameters without a default
+        value start out as auto and take on the types passed in by calls
+
+        Parameters
+        ----------
+        node : ast.FunctionDef
+            Node containing the function to get the parameters of
+
+        Returns
+        -------
+        dict of {str: CPPVariable}
+            The parameters of the function
+        """
+        args = node.args
+
         # Default values not directly linked, but they are in order, so we
         # figure out the index offset of when we should begin applying default
         # values to parameters
@@ -133,11 +468,11 @@ class PyAnalyzer():
             # applying default values
             if index >= default_args_index:
                 default = args.defaults[index-default_args_index]
-                default_type = [type(default.value).__name__]
+                default_type = ts.TypeVariable(type(default.value).__name__)
 
                 # Special handler for strings since their value needs to be
                 # wrapped in quotes
-                if default_type[0] == "str":
+                if default_type.py_type == "str":
                     params[name] = cvar.CPPVariable(name + "=\"" + default.value + "\"",
                                                     -1, default_type)
                 else:
@@ -145,10 +480,9 @@ class PyAnalyzer():
                                                     -1, default_type)
 
             else:
-                params[name] = cvar.CPPVariable(name, -1, ["auto"])
+                params[name] = cvar.CPPVariable(name, -1, ts.TypeVariable("auto"))
 
-        func_ref[node.name] = cfun.CPPFunction(node.name, node.lineno,
-                                               node.end_lineno, params)
+        return params
 
     def analyze_tree(self, tree, file_index, function_key, indent):
         """
@@ -167,16 +501,14 @@ class PyAnalyzer():
         indent : int
             How much indentation a line should have
         """
+        statement_handlers = self.statement_handlers
         for node in tree:
-            # Skipping function definitions as we handled them during
-            # pre-analysis
-            if node.__class__ is not ast.FunctionDef:
-                # Using strategy found in ast.py built-in module
-                handler_name = "parse_" + node.__class__.__name__
-                # Will find if the function called handler_name exists,
-                # otherwise it returns parse_unhandled
-                handler = getattr(self, handler_name, self.parse_unhandled)
-                handler(node, file_index, function_key, indent)
+            # Nodes without a handler are brought over as comments
+            handler = statement_handlers.get(node.__class__)
+            if handler is None:
+                self.parse_unhandled(node, file_index, function_key, indent)
+            else:
+                handler(self, node, file_index, function_key, indent)
 
     def parse_unhandled(self, node, file_index, function_key, indent,
                         reason="TODO: Code not directly translatable, manual port required"):
@@ -220,6 +552,24 @@ class PyAnalyzer():
         # Add the closing comment symbol on the last line
         func_ref.lines[node.end_lineno].code_str += "*/"
 
+    def parse_FunctionDef(self, node, file_index, function_key, indent):
+        """
+        Handles parsing an ast.FunctionDef node. Functions are translated
+        during pre-analysis, so they are skipped here
+
+        Parameters
+        ----------
+        node : ast.FunctionDef
+            The ast.FunctionDef node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        pass
+
     # Imports
     def parse_Import(self, node, file_index, function_key, indent):
         """
@@ -297,6 +647,16 @@ class PyAnalyzer():
         """
         func_ref = self.output_files[file_index].functions[function_key]
 
+        # Only the branch that runs is kept when the condition is known
+        try:
+            test_value = self.constant_folder.get_value(node.test, function_key, True)
+        except ppex.NotConstant:
+            pass
+        else:
+            self.parse_static_If(node, bool(test_value), file_index, function_key,
+                                 indent, if_str)
+            return
+
         # Parse conditions and add in the code to the current function
         try:
             test_str = self.recurse_operator(node.test, file_index, function_key)[0]
@@ -316,9 +676,7 @@ class PyAnalyzer():
         self.analyze_tree(node.body, file_index, function_key, indent+1)
 
         # Get the last code line and add the closing bracket
-        func_ref.lines[node.body[-1].end_lineno].code_str += "\n" \
-                                                             + indent*cline.CPPCodeLine.tab_delimiter \
-                                                             + "}"
+        self.close_block(node.body, file_index, function_key, indent)
 
         # Looking for else if or else cases
         if len(node.orelse) == 1 and node.orelse[0].__class__ is ast.If:
@@ -340,9 +698,60 @@ class PyAnalyzer():
             self.analyze_tree(node.orelse, file_index, function_key, indent + 1)
 
             # Get the last code line and add the closing bracket
-            func_ref.lines[node.orelse[-1].end_lineno].code_str += "\n" \
-                                                                   + indent * cline.CPPCodeLine.tab_delimiter \
-                                                                   + "}"
+            self.close_block(node.orelse, file_index, function_key, indent)
+
+    def parse_static_If(self, node, test_value, file_index, function_key, indent,
+                        if_str):
+        """
+        Handles an ast.If node whose condition is known at translation time.
+        The branch that can't run is left out, and an if that always runs a
+        branch is replaced by the code in it
+
+        Parameters
+        ----------
+        node : ast.If
+            The ast.If node to be translated
+        test_value : bool
+            Whether the condition holds
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        if_str : str
+            Indicates whether to be an if or else if statement
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+
+        if test_value:
+            branch = node.body
+        elif len(node.orelse) == 1 and node.orelse[0].__class__ is ast.If:
+            # The next condition takes this one's place
+            self.parse_If(node.orelse[0], file_index, function_key, indent, if_str)
+            return
+        else:
+            branch = node.orelse
+
+        if if_str == "if":
+            self.analyze_tree(branch, file_index, function_key, indent)
+            return
+
+        # An else if that is known to run ends the chain as its else
+        if len(branch) == 0:
+            return
+
+        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
+                                                        node.end_lineno,
+                                                        node.end_col_offset,
+                                                        indent,
+                                                        "else\n"
+                                                        + indent * cline.CPPCodeLine.tab_delimiter
+                                                        + "{")
+
+        self.analyze_tree(branch, file_index, function_key, indent + 1)
+
+        self.close_block(branch, file_index, function_key, indent)
 
     def find_else_lineno(self, search_index):
         """
@@ -400,6 +809,15 @@ class PyAnalyzer():
         """
         func_ref = self.output_files[file_index].functions[function_key]
 
+        # A loop whose condition is known to fail never runs its body, and
+        # goes straight to its else
+        try:
+            if not self.constant_folder.get_value(node.test, function_key, True):
+                self.analyze_tree(node.orelse, file_index, function_key, indent)
+                return
+        except ppex.NotConstant:
+            pass
+
         try:
             test_str = self.recurse_operator(node.test, file_index, function_key)[0]
         except ppex.TranslationNotSupported as ex:
@@ -417,19 +835,20 @@ class PyAnalyzer():
         self.analyze_tree(node.body, file_index, function_key, indent + 1)
 
         # Closing the body of the while loop
-        func_ref.lines[node.body[-1].end_lineno].code_str += "\n" \
-                                                             + indent * cline.CPPCodeLine.tab_delimiter \
-                                                             + "}"
+        self.close_block(node.body, file_index, function_key, indent)
 
-    def parse_Pass(self, node, file_index, function_key, indent):
+    def parse_For(self, node, file_index, function_key, indent):
         """
-        Handles parsing an ast.Pass node. We don't translate this
-        so we just pass on calls to it
+        Handles parsing an ast.For node. Loops over a range of one, two or
+        three arguments become counted C++ for loops. The loop counts with a
+        hidden counter and hands its value to the python index at the start
+        of each iteration, so like in python the index keeps the last value
+        it was given once the loop is done, and isn't touched by an empty range
 
         Parameters
         ----------
-        node : ast.Pass
-            The ast.Pass node to be translated
+        node : ast.For
+            The ast.For node to be translated
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
@@ -437,68 +856,386 @@ class PyAnalyzer():
         indent : int
             How much indentation a line should have
         """
-        pass
+        func_ref = self.output_files[file_index].functions[function_key]
 
-    def parse_Break(self, node, file_index, function_key, indent):
+        try:
+            index_name, start_str, stop_str, step = self.parse_range_loop(node,
+                                                                          file_index,
+                                                                          function_key)
+        except ppex.TranslationNotSupported as ex:
+            self.parse_unhandled(node, file_index, function_key, indent, ex.reason)
+            return
+
+        # Range only ever gives back ints, so the index has to hold one
+        index_type = cvar.CPPVariable.get_type_cell("int")
+        try:
+            py_var_type = self.find_var_type(index_name, file_index, function_key)
+            if py_var_type.get_type() == "str":
+                self.parse_unhandled(node, file_index, function_key, indent,
+                                     "TODO: Refactor for C++. Variable types "
+                                     "cannot change or potential loss of "
+                                     "precision occurred")
+                return
+
+            self.solver.add_flow(index_type, py_var_type)
+            header_str = ""
+
+        except ppex.VariableNotFound:
+            # Declared on its own line so the type can be put in front of it
+            c_var = cvar.CPPVariable(index_name, node.lineno, ts.TypeVariable())
+            self.solver.add_flow(index_type, c_var.py_var_type)
+            func_ref.variables[index_name] = c_var
+            header_str = index_name + ";\n" + indent * cline.CPPCodeLine.tab_delimiter
+
+        counter_name = self.get_hidden_name(index_name + "_count")
+
+        # Counting by one reads better as an increment or decrement
+        if step > 0:
+            condition_str = counter_name + " < " + stop_str
+            increment_str = counter_name + "++" if step == 1 \
+                else counter_name + " += " + str(step)
+        else:
+            condition_str = counter_name + " > " + stop_str
+            increment_str = counter_name + "--" if step == -1 \
+                else counter_name + " -= " + str(-step)
+
+        # Lists appended to on every iteration get room for every item up front
+        for reserve_str in self.get_reserve_strs(node, start_str, stop_str, step,
+                                                 file_index, function_key):
+            header_str += reserve_str + "\n" + indent * cline.CPPCodeLine.tab_delimiter
+
+        # The else of a loop that can break only runs when no break left the
+        # loop, which the breaks record in a flag of their own
+        breaks = self.get_loop_breaks(node) if len(node.orelse) > 0 else []
+        if len(breaks) > 0:
+            finished_name = self.get_hidden_name(index_name + "_finished")
+            self.used_names.add(finished_name)
+            for break_node in breaks:
+                self.break_flags[break_node] = finished_name
+            header_str += "bool " + finished_name + " = true;\n" \
+                          + indent * cline.CPPCodeLine.tab_delimiter
+
+        header_str += "for (int " + counter_name + " = " + start_str + "; " \
+                      + condition_str + "; " + increment_str + ")\n" \
+                      + indent * cline.CPPCodeLine.tab_delimiter + "{\n" \
+                      + (indent + 1) * cline.CPPCodeLine.tab_delimiter \
+                      + index_name + " = " + counter_name + ";"
+        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
+                                                        node.end_lineno,
+                                                        node.end_col_offset,
+                                                        indent,
+                                                        header_str)
+
+        self.analyze_tree(node.body, file_index, function_key, indent + 1)
+
+        # Closing the body of the for loop
+        self.close_block(node.body, file_index, function_key, indent)
+
+        if len(node.orelse) == 0:
+            return
+
+        if len(breaks) == 0:
+            # Nothing can skip the else, so it always runs after the loop
+            self.analyze_tree(node.orelse, file_index, function_key, indent)
+            return
+
+        try:
+            else_lineno, else_end_col_offset = self.find_else_lineno(node.orelse[0].lineno - 2)
+        except ppex.TranslationNotSupported as ex:
+            self.parse_unhandled(node, file_index, function_key, indent, ex.reason)
+            return
+
+        func_ref.lines[else_lineno] = cline.CPPCodeLine(else_lineno,
+                                                        else_lineno,
+                                                        else_end_col_offset,
+                                                        indent,
+                                                        "if (" + finished_name + ")\n"
+                                                        + indent * cline.CPPCodeLine.tab_delimiter
+                                                        + "{")
+
+        self.analyze_tree(node.orelse, file_index, function_key, indent + 1)
+
+        self.close_block(node.orelse, file_index, function_key, indent)
+
+    def get_reserve_strs(self, node, start_str, stop_str, step, file_index,
+                         function_key):
         """
-        Handles parsing an ast.Break node.
+        Finds the lists a counted loop appends to on every iteration, and
+        reserves room for all of the items before the loop so the vector
+        never has to grow while it runs. Only appends directly in the body of
+        the loop are counted, to lists that already exist and aren't replaced
+        inside the loop
 
         Parameters
         ----------
-        node : ast.Break
-            The ast.Break node to be translated
+        node : ast.For
+            The ast.For node being translated
+        start_str : str
+            The first value of the index
+        stop_str : str
+            The value the index stops before
+        step : int
+            How much the index changes by each iteration
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
             Key used to find the correct function in the function dictionary
-        indent : int
-            How much indentation a line should have
+
+        Returns
+        -------
+        list of str
+            The reserve statements
         """
-        func_ref = self.output_files[file_index].functions[function_key]
-        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
-                                                        node.end_lineno,
-                                                        node.end_col_offset,
-                                                        indent,
-                                                        "break;")
+        append_counts = {}
+        for statement in node.body:
+            if statement.__class__ is ast.Expr and statement.value.__class__ is ast.Call:
+                method = statement.value.func
+                if method.__class__ is ast.Attribute and method.attr == "append" \
+                        and method.value.__class__ is ast.Name:
+                    append_counts[method.value.id] = append_counts.get(method.value.id, 0) + 1
+
+        if len(append_counts) == 0:
+            return []
+
+        # The bounds are worked out again, so they can't have side effects
+        args = node.iter.args
+        start_node = args[0] if len(args) > 1 else None
+        stop_node = args[0] if len(args) == 1 else args[1]
+        if start_node is not None and not self.is_loop_invariant(start_node, set()):
+            return []
 
-    def parse_Continue(self, node, file_index, function_key, indent):
+        try:
+            start = 0 if start_node is None \
+                else self.constant_folder.get_value(start_node, function_key, True)
+            stop = self.constant_folder.get_value(stop_node, function_key, True)
+            iterations = len(range(start, stop, step))
+            if iterations == 0:
+                return []
+            iteration_str = None
+        except (ppex.NotConstant, TypeError):
+            # Ranges that run backwards give no iterations rather than a
+            # negative count, which would wrap around as a size
+            low_str, high_str = (start_str, stop_str) if step > 0 else (stop_str, start_str)
+            distance_str = high_str if low_str == "0" else high_str + " - " + low_str
+            if abs(step) != 1:
+                distance_str = "(" + distance_str + " + " + str(abs(step) - 1) + ") / " \
+                               + str(abs(step))
+            iteration_str = "(" + high_str + " > " + low_str + " ? " + distance_str + " : 0)"
+
+        reserve_strs = []
+        assigned_names = {internal_node.id for statement in node.body
+                          for internal_node in ast.walk(statement)
+                          if internal_node.__class__ is ast.Name
+                          and internal_node.ctx.__class__ is not ast.Load}
+        for name, count in append_counts.items():
+            if name in assigned_names:
+                continue
+            try:
+                if self.find_var_type(name, file_index, function_key).get_type() != "list":
+                    continue
+            except ppex.VariableNotFound:
+                continue
+
+            if iteration_str is None:
+                count_str = str(count * iterations)
+            elif count == 1:
+                count_str = iteration_str
+            else:
+                count_str = str(count) + " * " + iteration_str
+            reserve_strs.append(name + ".reserve(" + name + ".size() + " + count_str + ");")
+
+        return reserve_strs
+
+    def close_block(self, tree, file_index, function_key, indent):
         """
-        Handles parsing an ast.Continue node.
+        Adds the closing bracket of a block after its last line of code. A
+        block that ends in a pass or a branch that was left out has no line
+        there, so the bracket is put on a line of its own
 
         Parameters
         ----------
-        node : ast.Continue
-            The ast.Continue node to be translated
+        tree : List of ast nodes
+            The statements in the block
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
             Key used to find the correct function in the function dictionary
         indent : int
-            How much indentation a line should have
+            How much indentation the line opening the block has
         """
         func_ref = self.output_files[file_index].functions[function_key]
-        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
-                                                        node.end_lineno,
-                                                        node.end_col_offset,
-                                                        indent,
-                                                        "continue;")
+        last_node = tree[-1]
+        if last_node.end_lineno in func_ref.lines:
+            func_ref.lines[last_node.end_lineno].code_str += "\n" \
+                                                             + indent * cline.CPPCodeLine.tab_delimiter \
+                                                             + "}"
+        else:
+            func_ref.lines[last_node.end_lineno] = cline.CPPCodeLine(last_node.end_lineno,
+                                                                     last_node.end_lineno,
+                                                                     last_node.end_col_offset,
+                                                                     indent,
+                                                                     "}")
 
-    def parse_Return(self, node, file_index, function_key, indent):
+    def parse_range_loop(self, node, file_index, function_key):
         """
-        Handles parsing an ast.Return node.
+        Translates the target and range of a for loop that counts over a
+        range. C++ checks the bounds every iteration while python works them
+        out once, so the stop value must not change inside the loop. The step
+        has to be known at translation time to know which way the loop counts
 
         Parameters
         ----------
-        node : ast.Return
-            The ast.Return node to be translated
+        node : ast.For
+            The ast.For node being translated
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
             Key used to find the correct function in the function dictionary
-        indent : int
-            How much indentation a line should have
-        """
-        func_ref = self.output_files[file_index].functions[function_key]
+
+        Returns
+        -------
+        index_name : str
+            Name of the loop index
+        start_str : str
+            The first value of the index
+        stop_str : str
+            The value the index stops before
+        step : int
+            How much the index changes by each iteration
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the loop isn't a counted loop over a range
+        """
+        iterator = node.iter
+        if iterator.__class__ is not ast.Call or iterator.func.__class__ is not ast.Name \
+                or iterator.func.id != "range" or len(iterator.keywords) > 0 \
+                or not 1 <= len(iterator.args) <= 3 \
+                or any(arg.__class__ is ast.Starred for arg in iterator.args):
+            raise ppex.TranslationNotSupported("TODO: Only loops over a range can be translated")
+
+        if node.target.__class__ is not ast.Name:
+            raise ppex.TranslationNotSupported("TODO: Loop index must be a single variable")
+        index_name = node.target.id
+
+        # Python hands out the next value no matter what the body did to the
+        # index, while C++ would count on from the changed value
+        changed_names = self.get_changed_names(node.body)
+        if index_name in changed_names:
+            raise ppex.TranslationNotSupported("TODO: Refactor for C++. Loop index "
+                                               "is changed inside the loop")
+
+        if len(iterator.args) == 1:
+            start_str = "0"
+            stop_node = iterator.args[0]
+        else:
+            start_str = self.recurse_operator(iterator.args[0], file_index, function_key)[0]
+            stop_node = iterator.args[1]
+
+        step = 1
+        if len(iterator.args) == 3:
+            try:
+                step = self.constant_folder.get_value(iterator.args[2], function_key, True)
+            except ppex.NotConstant:
+                step = None
+            if type(step) is not int:
+                raise ppex.TranslationNotSupported("TODO: Range step must be an integer constant")
+            if step == 0:
+                raise ppex.TranslationNotSupported("TODO: Range step cannot be zero")
+
+        if not self.is_loop_invariant(stop_node, changed_names):
+            raise ppex.TranslationNotSupported("TODO: Refactor for C++. Range stop "
+                                               "value changes inside the loop")
+        stop_str = self.recurse_operator(stop_node, file_index, function_key)[0]
+
+        return index_name, str(start_str), str(stop_str), step
+
+    def parse_Pass(self, node, file_index, function_key, indent):
+        """
+        Handles parsing an ast.Pass node. We don't translate this
+        so we just pass on calls to it
+
+        Parameters
+        ----------
+        node : ast.Pass
+            The ast.Pass node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        pass
+
+    def parse_Break(self, node, file_index, function_key, indent):
+        """
+        Handles parsing an ast.Break node.
+
+        Parameters
+        ----------
+        node : ast.Break
+            The ast.Break node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+
+        # Leaving a loop that has an else marks the loop as not finished
+        break_str = "break;"
+        if node in self.break_flags:
+            break_str = self.break_flags[node] + " = false;\n" \
+                        + indent * cline.CPPCodeLine.tab_delimiter + break_str
+
+        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
+                                                        node.end_lineno,
+                                                        node.end_col_offset,
+                                                        indent,
+                                                        break_str)
+
+    def parse_Continue(self, node, file_index, function_key, indent):
+        """
+        Handles parsing an ast.Continue node.
+
+        Parameters
+        ----------
+        node : ast.Continue
+            The ast.Continue node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
+        func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
+                                                        node.end_lineno,
+                                                        node.end_col_offset,
+                                                        indent,
+                                                        "continue;")
+
+    def parse_Return(self, node, file_index, function_key, indent):
+        """
+        Handles parsing an ast.Return node.
+
+        Parameters
+        ----------
+        node : ast.Return
+            The ast.Return node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        indent : int
+            How much indentation a line should have
+        """
+        func_ref = self.output_files[file_index].functions[function_key]
         if node.value is None:
             func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
                                                             node.end_lineno,
@@ -514,8 +1251,7 @@ class PyAnalyzer():
                                      ex.reason)
                 return
 
-            func_ref.return_type = self.type_precedence(return_type,
-                                                        func_ref.return_type)
+            self.add_type_flow(node.value, return_type, func_ref.return_type)
             func_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
                                                             node.end_lineno,
                                                             node.end_col_offset,
@@ -644,11 +1380,45 @@ class PyAnalyzer():
                                  "TODO: Unable to translate chained assignment")
             return
 
-        var_name = node.targets[0].id
+        target = node.targets[0]
+        if target.__class__ is ast.Subscript:
+            # Storing an item, which has to fit the type of the other items
+            try:
+                target_str, item_type = self.parse_Subscript(target,
+                                                             file_index,
+                                                             function_key)
+                assign_str, assign_type = self.recurse_operator(node.value,
+                                                                file_index,
+                                                                function_key)
+            except ppex.TranslationNotSupported as ex:
+                self.parse_unhandled(node, file_index, function_key, indent,
+                                     ex.reason)
+                return
+
+            self.add_type_flow(node.value, assign_type, item_type)
+            function_ref.lines[node.lineno] = cline.CPPCodeLine(node.lineno,
+                                                                node.end_lineno,
+                                                                node.end_col_offset,
+                                                                indent,
+                                                                target_str + " = "
+                                                                + str(assign_str) + ";")
+            return
+
+        if target.__class__ is not ast.Name:
+            self.parse_unhandled(node, file_index, function_key, indent,
+                                 "TODO: Can only assign to variables and list items")
+            return
+
+        var_name = target.id
         try:
-            assign_str, assign_type = self.recurse_operator(node.value,
-                                                            file_index,
-                                                            function_key)
+            if node.value.__class__ is ast.Set and (function_key, var_name) in self.small_sets:
+                assign_str, assign_type = self.parse_small_set(node.value,
+                                                               file_index,
+                                                               function_key)
+            else:
+                assign_str, assign_type = self.recurse_operator(node.value,
+                                                                file_index,
+                                                                function_key)
         except ppex.TranslationNotSupported as ex:
             self.parse_unhandled(node, file_index, function_key, indent,
                                  ex.reason)
@@ -660,9 +1430,14 @@ class PyAnalyzer():
                                              file_index,
                                              function_key)
 
-            # Verify types aren't changing or we aren't losing precision
-            if py_var_type[0] != assign_type[0] \
-                    and (py_var_type[0] != "float" and assign_type[0] != "int"):
+            # Verify types aren't changing between strings and numbers, or to
+            # and from containers. Numbers just widen the variable to the
+            # wider type
+            known_types = {py_var_type.get_type(), assign_type.get_type()}
+            if "str" in known_types \
+                    and len(known_types.intersection(self.context.numeric_types)) > 0 \
+                    or len(known_types.intersection(self.context.container_types)) > 0 \
+                    and len(known_types - {"auto"}) > 1:
                 # Can't do changing types in C++
                 self.parse_unhandled(node, file_index, function_key, indent,
                                      "TODO: Refactor for C++. Variable types "
@@ -671,6 +1446,7 @@ class PyAnalyzer():
                 return
 
             else:
+                self.add_type_flow(node.value, assign_type, py_var_type)
                 code_str = var_name + " = " + str(assign_str) + ";"
                 c_code_line = cline.CPPCodeLine(node.lineno, node.end_lineno,
                                                 node.end_col_offset, indent,
@@ -678,7 +1454,8 @@ class PyAnalyzer():
 
         except ppex.VariableNotFound:
             # Declaration
-            c_var = cvar.CPPVariable(var_name, node.lineno, assign_type)
+            c_var = cvar.CPPVariable(var_name, node.lineno, ts.TypeVariable())
+            self.add_type_flow(node.value, assign_type, c_var.py_var_type)
             function_ref.variables[var_name] = c_var
             code_str = var_name + " = " + str(assign_str) + ";"
             c_code_line = cline.CPPCodeLine(node.lineno, node.end_lineno,
@@ -704,7 +1481,7 @@ class PyAnalyzer():
         -------
         return_str : str
             The call represented as a string
-        return_type : list of str
+        return_type : TypeVariable
             The return type of the call
 
         Raises
@@ -712,6 +1489,9 @@ class PyAnalyzer():
         TranslationNotSupported
             If the python code cannot be directly translated
         """
+        if node.func.__class__ is ast.Attribute:
+            return self.parse_method_call(node, file_index, function_key)
+
         # Should be a name to have a function call we can parse
         if node.func.__class__ is not ast.Name:
             raise ppex.TranslationNotSupported("TODO: Not a valid call")
@@ -721,9 +1501,9 @@ class PyAnalyzer():
         func_name = node.func.id
 
         # Ensure this is a valid function call we can use
-        if func_name not in cvar.CPPVariable.types \
+        if func_name not in self.context.types \
             and func_name not in func_ref \
-                and func_name not in self.ported_functions:
+                and func_name not in self.context.ported_functions:
             raise ppex.TranslationNotSupported("TODO: Call to function not in scope")
 
         # We track the types passed in to help update parameter types when
@@ -738,31 +1518,41 @@ class PyAnalyzer():
             arg_types.append(arg_type)
 
         # Check if casting or normal function call
-        if func_name in cvar.CPPVariable.types:
+        if func_name in self.context.container_types:
+            if len(node.args) == 0 and len(node.keywords) == 0:
+                return self.parse_empty_container(func_name, file_index, function_key)
+            raise ppex.TranslationNotSupported("TODO: Can't convert to a container")
+
+        elif func_name in self.context.types:
             # Trim the extra space since we are performing a cast rather than
             # a variable declaration
             if (func_name == "str"):
                 return_str = "std::to_string("
-                self.output_files[file_index].add_include_file("string")
-                return_type = ["str"]
+                self.add_include_file("string", file_index, function_key)
+                return_type = cvar.CPPVariable.get_type_cell("str")
             else:
-                return_str = "(" + cvar.CPPVariable.types[func_name][:-1] + ")("
-                return_type = [func_name]
+                return_str = "(" + self.context.types[func_name][:-1] + ")("
+                return_type = cvar.CPPVariable.get_type_cell(func_name)
 
         elif func_name in func_ref:
             return_str = func_name + "("
 
-            # Now we try to update the parameter types if applicable
+            # Parameters have to be able to hold whatever is passed in
             function = func_ref[func_name]
-            for param, passed_type in zip(function.parameters.values(),
-                                          arg_types):
-                param.py_var_type[0] = self.type_precedence(param.py_var_type,
-                                                         passed_type)[0]
+            for arg, param, passed_type in zip(node.args,
+                                               function.parameters.values(),
+                                               arg_types):
+                self.add_type_flow(arg, passed_type, param.py_var_type)
             return_type = function.return_type
 
-        elif func_name in self.ported_functions:
+        elif func_name in self.context.ported_functions:
+            keywords = {}
+            for keyword in node.keywords:
+                keywords[keyword.arg] = self.parse_keyword(keyword, file_index,
+                                                           function_key)
             return self.parse_ported_function(file_index, function_key,
-                                              func_name, arg_list, arg_types)
+                                              func_name, arg_list, arg_types,
+                                              keywords)
 
         else:
             raise ppex.TranslationNotSupported("TODO: Call to function not in scope")
@@ -774,58 +1564,55 @@ class PyAnalyzer():
 
         return return_str, return_type
 
-    def parse_ported_function(self, file_index, function_key, function, args,
-                              arg_types):
+    def parse_empty_container(self, container, file_index, function_key):
         """
-        Converts a python version of a function to a C++ version
+        Translates a call to list, dict or set without arguments, which
+        makes an empty container. The types of its items are left for the
+        items added later to work out
 
         Parameters
         ----------
+        container : str
+            Name of the container type
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
             Key used to find the correct function in the function dictionary
-        function : str
-            Name of the function to convert
-        args : list of str
-            List containing the arguments represented as strings
-        arg_types : list of list of str
-            List containing the types of each argument in a list of str
 
         Returns
         -------
         return_str : str
-            The ported function represented as a string
-        return_type : list of str
-            The return type of the ported function
+            The empty container represented as a string
+        return_type : TypeVariable
+            The type of the container
 
         Raises
         ------
         TranslationNotSupported
-            If the python code cannot be directly translated
+            If the type isn't a python container
         """
-        if function == "print":
-            return_str = pf.print_translation(args)
-            return_type = ["None"]
-            self.output_files[file_index].add_include_file("iostream")
+        if container not in self.context.container_includes:
+            raise ppex.TranslationNotSupported("TODO: Can't convert to a container")
 
-        elif function == "sqrt":
-            if len(args) > 1:
-                raise ppex.TranslationNotSupported("TODO: Can't square more than 1 item")
-            return_str = pf.sqrt_translation(args)
-            return_type = ["float"]
-            self.output_files[file_index].add_include_file("math.h")
+        self.add_include_file(self.context.container_includes[container], file_index,
+                              function_key)
 
-        return return_str, return_type
+        return_type = ts.TypeVariable(container)
+        return_type.element = ts.TypeVariable()
+        if container == "dict":
+            return_type.key = ts.TypeVariable()
+        return "{}", return_type
 
-    def parse_Constant(self, node, file_index, function_key):
+    def parse_method_call(self, node, file_index, function_key):
         """
-        Handles parsing an ast.Constant node.
+        Handles parsing a call to a method of a container held in a variable.
+        The arguments are stored in the container, so they flow into the
+        type of its items
 
         Parameters
         ----------
-        node : ast.Constant
-            The ast.Constant node to be translated
+        node : ast.Call
+            The ast.Call node to be translated
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
@@ -834,36 +1621,56 @@ class PyAnalyzer():
         Returns
         -------
         return_str : str
-            The constant value represented as a string
-        return_type : list of str
-            The type of the constant
+            The call represented as a string
+        return_type : TypeVariable
+            The return type of the call
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the python code cannot be directly translated
         """
-        # Strings need to be wrapped in quotes
-        if type(node.value) is str:
-            return_str = ("\"" + node.value + "\"")
-            return_type = ["str"]
+        method = node.func
+        if method.value.__class__ is not ast.Name:
+            raise ppex.TranslationNotSupported("TODO: Not a valid call")
 
-        # Python booleans are capital while C++ is lowercase, so we need to
-        # translate it
-        elif type(node.value) is bool:
-            return_str = cvar.CPPVariable.bool_map[str(node.value)]
-            return_type = ["bool"]
+        value_str, value_type = self.parse_Name(method.value, file_index, function_key)
 
-        else:
-            return_str = str(node.value)
-            return_type = [type(node.value).__name__]
+        # A parameter used before any call passes a container in can only be
+        # the container that has the method. Bitsets are only ever made from
+        # sets known to hold small integers
+        container = value_type.get_type()
+        if container not in self.context.container_methods:
+            containers = [name for name, methods in self.context.container_methods.items()
+                          if method.attr in methods and name != "bitset"]
+            if container not in ("auto", "None") or len(containers) != 1:
+                raise ppex.TranslationNotSupported("TODO: Call to method not supported")
+            container = containers[0]
 
-        return return_str, return_type
+        methods = self.context.container_methods[container]
+        if method.attr not in methods:
+            raise ppex.TranslationNotSupported("TODO: Call to method not supported")
 
-    # Operators
-    def parse_BoolOp(self, node, file_index, function_key):
+        if len(node.keywords) > 0 or len(node.args) != 1 \
+                or node.args[0].__class__ is ast.Starred:
+            raise ppex.TranslationNotSupported("TODO: Method takes exactly 1 item")
+
+        arg_str, arg_type = self.recurse_operator(node.args[0], file_index, function_key)
+        self.add_type_flow(node.args[0], arg_type, self.get_item_type(value_type))
+
+        return_str = value_str + "." + methods[method.attr] + "(" + str(arg_str) + ")"
+        return return_str, cvar.CPPVariable.get_type_cell("None")
+
+    def parse_keyword(self, node, file_index, function_key):
         """
-        Handles parsing an ast.BoolOp node.
+        Translates the value of a keyword argument to a ported function.
+        Dotted names such as sys.stderr are kept as they are written so the
+        translation function can map them
 
         Parameters
         ----------
-        node : ast.BoolOp
-            The ast.BoolOp node to be translated
+        node : ast.keyword
+            The keyword argument
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
@@ -871,162 +1678,115 @@ class PyAnalyzer():
 
         Returns
         -------
-        return_str : str
-            The BoolOp represented as a string
-        return_type : list of str
-            The return type of the BoolOp
+        str
+            The value represented as a string
 
         Raises
         ------
         TranslationNotSupported
-            If the python code cannot be directly translated
+            If the keyword is a ** unpacking or its value can't be translated
         """
-        # List of tuples consisting of (string,[type_string])
-        compare_nodes = []
-        mixed_types = False
-        # Multiple nodes can be chained, so we need to go through all of them
-        for internal_node in node.values:
-            compare_nodes.append(self.recurse_operator(internal_node,
-                                                       file_index,
-                                                       function_key))
-
-        # This shouldn't be possible normally, but we check to be safe
-        if len(compare_nodes) < 2:
-            raise ppex.TranslationNotSupported("TODO: Less than 2 items being compared")
-
-        return_str = ""
-        ret_var_type = compare_nodes[0][1][0]
+        if node.arg is None:
+            raise ppex.TranslationNotSupported("TODO: Can't unpack keywords")
 
-        # Go through all but the last one and create a string separated by
-        # the C++ version of the python operator
-        for compare_node in compare_nodes[:-1]:
-            if compare_node[1][0] != ret_var_type:
-                mixed_types = True
-            return_str += (compare_node[0] +
-                           PyAnalyzer.operator_map[node.op.__class__.__name__])
-
-        if compare_nodes[-1][1][0] != ret_var_type:
-            mixed_types = True
-        return_str += compare_nodes[-1][0]
-
-        # Short circuit operators complicate type determination, so if they
-        # aren't all the same type, we'll use auto, otherwise these operators
-        # keep they type if all items being compared are the same type
-        if mixed_types:
-            return_type = ["auto"]
-        else:
-            return_type = compare_nodes[0][1]
+        names = []
+        value = node.value
+        while value.__class__ is ast.Attribute:
+            names.append(value.attr)
+            value = value.value
+        if len(names) > 0 and value.__class__ is ast.Name:
+            return ".".join([value.id] + names[::-1])
 
-        return_str = "(" + return_str + ")"
-        return return_str, return_type
+        return self.recurse_operator(node.value, file_index, function_key)[0]
 
-    def parse_BinOp(self, node, file_index, function_key):
+    def parse_ported_function(self, file_index, function_key, function, args,
+                              arg_types, keywords=None):
         """
-        Handles parsing an ast.BinOp node.
+        Converts a python version of a function to a C++ version
 
         Parameters
         ----------
-        node : ast.BinOp
-            The ast.BinOp node to be translated
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
             Key used to find the correct function in the function dictionary
+        function : str
+            Name of the function to convert
+        args : list of str
+            List containing the arguments represented as strings
+        arg_types : list of TypeVariable
+            List containing the types of each argument
+        keywords : dict of {str: str}
+            Keyword arguments represented as strings
 
         Returns
         -------
         return_str : str
-            The BinOp represented as a string
-        return_type : list of str
-            The return type of the BinOp
+            The ported function represented as a string
+        return_type : TypeVariable
+            The return type of the ported function
 
         Raises
         ------
         TranslationNotSupported
             If the python code cannot be directly translated
         """
-        left_str, left_type = self.recurse_operator(node.left,
-                                                    file_index,
-                                                    function_key)
-        right_str, right_type = self.recurse_operator(node.right,
-                                                      file_index,
-                                                      function_key)
-
-        left_str = str(left_str)
-        right_str = str(right_str)
-        operator = node.op.__class__.__name__
-        if operator in PyAnalyzer.operator_map:
-            if operator == "Pow":
-                self.output_files[file_index].add_include_file("math.h")
-                return_str = "pow(" + left_str + ", " + right_str + ")"
-                return_type = ["float"]
-
-            elif operator == "FloorDiv":
-                return_str = left_str + " / " + right_str
-                # If they aren't both ints, we need to cast to int to truncate
-                if left_type[0] != "int" or right_type[0] != "int":
-                    return_str = "(int)(" + return_str + ")"
-                return_type = ["int"]
-
-            elif operator == "Div":
-                return_str = left_str + " / " + right_str
-                # We need to cast one to a double or it will perform integer
-                # math
-                if left_type[0] != "float" or right_type[0] != "float":
-                    return_str = "(double)" + return_str
-                return_type = ["float"]
+        include_file, py_type, translation = self.context.ported_functions[function]
 
-            else:
-                return_str = left_str \
-                              + PyAnalyzer.operator_map[operator] \
-                              + right_str
+        if translation is pf.print_translation:
+            args = [self.get_print_str(arg, arg_type) for arg, arg_type in zip(args, arg_types)]
 
-                return_type = self.type_precedence(left_type, right_type)
+        # The include is only needed once the call translated
+        return_str = translation(args, keywords)
+        if include_file is not None:
+            self.add_include_file(include_file, file_index, function_key)
 
-        return_str = "(" + return_str + ")"
-        return return_str, return_type
+        return return_str, cvar.CPPVariable.get_type_cell(py_type)
 
-    def type_precedence(self, type_a, type_b):
+    def get_print_str(self, arg_str, arg_type, solved=False):
         """
-        We determine which type takes precedent based on loss of
-        precision. So a float will take precedence over an int
-        If we can't figure it out, we'll default to auto
+        Translates an argument to print. Python prints bools as True and
+        False where C++ streams print 1 and 0, so bools are printed as those
+        words, and None has no C++ value so it is printed as the word too.
+        Arguments whose type isn't known yet are translated once the types
+        are solved
 
         Parameters
         ----------
-        type_a : list of str
-            One of the types to compare
-        type_b : list of str
-            The other type to compare with
+        arg_str : str
+            The argument represented as a string
+        arg_type : TypeVariable
+            The type of the argument
+        solved : bool
+            Whether the types are already solved
 
         Returns
         -------
-        return_type : list of str
-            The list that holds the type that should take precedence
+        str
+            The argument to insert into the stream
         """
-        if type_a[0] in PyAnalyzer.type_precedence_dict and type_b[0] in PyAnalyzer.type_precedence_dict:
-
-            # Smaller value means higher precedence
-            if PyAnalyzer.type_precedence_dict[type_a[0]] < PyAnalyzer.type_precedence_dict[type_b[0]]:
-                return_type = type_a
-
-            else:
-                return_type = type_b
+        py_type = arg_type.get_type()
+        if py_type == "NoneType" and arg_str == "None":
+            return pf.get_string_literal("None")
+        if py_type == "auto" and not solved:
+            return self.defer_str(None, self.get_print_str, arg_str, arg_type, True)
+        if py_type != "bool":
+            return arg_str
 
-        else:
-            # Type doesn't exist in our precedence table
-            return_type = ["auto"]
+        for python_value, cpp_value in self.context.bool_map.items():
+            if arg_str == cpp_value:
+                return pf.get_string_literal(python_value)
 
-        return return_type
+        return "(" + arg_str + " ? \"True\" : \"False\")"
 
-    def parse_UnaryOp(self, node, file_index, function_key):
+    def parse_Constant(self, node, file_index, function_key):
         """
-        Handles parsing an ast.UnaryOp node.
+        Handles parsing an ast.Constant node.
 
         Parameters
         ----------
-        node : ast.UnaryOp
-            The ast.UnaryOp node to be translated
+        node : ast.Constant
+            The ast.Constant node to be translated
         file_index : int
             Index of the file to write to in the output_files list
         function_key : str
@@ -1035,30 +1795,556 @@ class PyAnalyzer():
         Returns
         -------
         return_str : str
-            The UnaryOp represented as a string
-        return_type : list of str
-            The return type of the UnaryOp
-
-        Raises
-        ------
-        TranslationNotSupported
-            If the python code cannot be directly translated
+            The constant value represented as a string
+        return_type : TypeVariable
+            The type of the constant
         """
-        operator = node.op.__class__
-        if operator.__name__ not in PyAnalyzer.operator_map:
-            raise ppex.TranslationNotSupported("TODO: UnaryOp not supported")
+        # Strings need to be wrapped in quotes, with characters C++ reads
+        # differently escaped
+        if type(node.value) is str:
+            return_str = pf.get_string_literal(node.value)
+            return_type = cvar.CPPVariable.get_type_cell("str")
+
+        # Python booleans are capital while C++ is lowercase, so we need to
+        # translate it
+        elif type(node.value) is bool:
+            return_str = self.context.bool_map[str(node.value)]
+            return_type = cvar.CPPVariable.get_type_cell("bool")
+
+        else:
+            return_str = str(node.value)
+            return_type = cvar.CPPVariable.get_type_cell(type(node.value).__name__)
+
+        return return_str, return_type
+
+    def parse_folded(self, node, file_index, function_key):
+        """
+        Translates an expression whose value is known at translation time
+        as the literal of its value
+
+        Parameters
+        ----------
+        node : ast node
+            The expression to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The value represented as a string
+        return_type : TypeVariable
+            The type of the value
+
+        Raises
+        ------
+        NotConstant
+            If the value isn't known until the code runs
+        """
+        value = self.constant_folder.get_value(node, function_key)
+        return_str, return_type = self.parse_Constant(ast.Constant(value),
+                                                      file_index,
+                                                      function_key)
+
+        # Keeps a negative number after a minus from reading as a decrement
+        if return_str[0] == "-":
+            return_str = "(" + return_str + ")"
+
+        return return_str, return_type
+
+    def parse_List(self, node, file_index, function_key):
+        """
+        Handles parsing an ast.List node. Lists become vectors initialized
+        with their items
+
+        Parameters
+        ----------
+        node : ast.List
+            The ast.List node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The list represented as a string
+        return_type : TypeVariable
+            The type of the list
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the python code cannot be directly translated
+        """
+        # Items added later can still widen the type of the items
+        item_type = ts.TypeVariable()
+        item_strs = []
+        for item in node.elts:
+            if item.__class__ is ast.Starred:
+                raise ppex.TranslationNotSupported("TODO: Can't unpack into a list")
+
+            item_str, value_type = self.recurse_operator(item, file_index, function_key)
+            self.add_type_flow(item, value_type, item_type)
+            item_strs.append(str(item_str))
+
+        self.add_include_file("vector", file_index, function_key)
+
+        return_type = ts.TypeVariable("list")
+        return_type.element = item_type
+        return "{" + ", ".join(item_strs) + "}", return_type
+
+    def parse_Dict(self, node, file_index, function_key):
+        """
+        Handles parsing an ast.Dict node. Dicts become unordered maps
+        initialized with their pairs
+
+        Parameters
+        ----------
+        node : ast.Dict
+            The ast.Dict node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The dict represented as a string
+        return_type : TypeVariable
+            The type of the dict
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the python code cannot be directly translated
+        """
+        key_type = ts.TypeVariable()
+        item_type = ts.TypeVariable()
+        pair_strs = []
+        for key, value in zip(node.keys, node.values):
+            # Unpacking another dict leaves the key empty
+            if key is None:
+                raise ppex.TranslationNotSupported("TODO: Can't unpack into a dict")
+
+            key_str, key_value_type = self.recurse_operator(key, file_index, function_key)
+            value_str, value_type = self.recurse_operator(value, file_index, function_key)
+            self.add_type_flow(key, key_value_type, key_type)
+            self.add_type_flow(value, value_type, item_type)
+            pair_strs.append("{" + str(key_str) + ", " + str(value_str) + "}")
+
+        self.add_include_file("unordered_map", file_index, function_key)
+
+        return_type = ts.TypeVariable("dict")
+        return_type.key = key_type
+        return_type.element = item_type
+        return "{" + ", ".join(pair_strs) + "}", return_type
+
+    def parse_Set(self, node, file_index, function_key):
+        """
+        Handles parsing an ast.Set node. Sets become unordered sets
+        initialized with their items
+
+        Parameters
+        ----------
+        node : ast.Set
+            The ast.Set node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The set represented as a string
+        return_type : TypeVariable
+            The type of the set
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the python code cannot be directly translated
+        """
+        item_type = ts.TypeVariable()
+        item_strs = []
+        for item in node.elts:
+            if item.__class__ is ast.Starred:
+                raise ppex.TranslationNotSupported("TODO: Can't unpack into a set")
+
+            item_str, value_type = self.recurse_operator(item, file_index, function_key)
+            self.add_type_flow(item, value_type, item_type)
+            item_strs.append(str(item_str))
+
+        self.add_include_file("unordered_set", file_index, function_key)
+
+        return_type = ts.TypeVariable("set")
+        return_type.element = item_type
+        return "{" + ", ".join(item_strs) + "}", return_type
+
+    def parse_small_set(self, node, file_index, function_key):
+        """
+        Translates a set literal assigned to a set of small integers. Its
+        items are constants, so they are given as the bits of a number
+
+        Parameters
+        ----------
+        node : ast.Set
+            The ast.Set node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The bits of the set represented as a string
+        return_type : TypeVariable
+            The type of the set
+        """
+        bits = 0
+        for item in node.elts:
+            bits |= 1 << ast.literal_eval(item)
+
+        self.add_include_file("bitset", file_index, function_key)
+
+        return hex(bits) + "ULL", ts.TypeVariable("bitset")
+
+    def parse_Subscript(self, node, file_index, function_key):
+        """
+        Handles parsing an ast.Subscript node. Indexing a list becomes
+        indexing its vector, with negative constant indexes counted from the
+        end like in python. Reading a missing key of a dict throws like it
+        does in python, rather than adding the key
+
+        Parameters
+        ----------
+        node : ast.Subscript
+            The ast.Subscript node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The item represented as a string
+        return_type : TypeVariable
+            The type of the item
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the python code cannot be directly translated
+        """
+        if node.slice.__class__ is ast.Slice:
+            raise ppex.TranslationNotSupported("TODO: Slices not supported")
+
+        value_str, value_type = self.recurse_operator(node.value, file_index, function_key)
+
+        if value_type.get_type() == "dict":
+            key_str, key_type = self.recurse_operator(node.slice, file_index, function_key)
+            self.add_type_flow(node.slice, key_type, self.get_key_type(value_type))
+            if node.ctx.__class__ is ast.Load:
+                return_str = str(value_str) + ".at(" + str(key_str) + ")"
+            else:
+                return_str = str(value_str) + "[" + str(key_str) + "]"
+            return return_str, self.get_item_type(value_type)
+
+        if value_type.get_type() not in ("list", "auto", "None"):
+            raise ppex.TranslationNotSupported("TODO: Only lists and dicts can be indexed")
+        item_type = self.get_item_type(value_type)
+
+        key_str = str(self.recurse_operator(node.slice, file_index, function_key)[0])
+        try:
+            index = ast.literal_eval(node.slice)
+        except ValueError:
+            index = None
+
+        if type(index) is int and index < 0:
+            # The list is named twice, so it has to be a variable
+            if node.value.__class__ is not ast.Name:
+                raise ppex.TranslationNotSupported("TODO: Negative index of a "
+                                                   "list not in a variable")
+            index_str = value_str + ".size() - " + str(-index)
+        else:
+            index_str = key_str
+
+        # A container that isn't known yet, such as a parameter, may still
+        # turn out to be a dict once the calls to the function are solved
+        if node.ctx.__class__ is ast.Load and value_type.get_type() == "auto":
+            return self.defer_str(node, self.get_subscript_str, str(value_str), key_str,
+                                  index_str, value_type), item_type
+
+        return str(value_str) + "[" + index_str + "]", item_type
+
+    def get_subscript_str(self, value_str, key_str, index_str, value_type):
+        """
+        Translates reading an item of a container whose type was only known
+        once the types were solved. Dicts look the key up with at, which
+        throws for a missing key, and anything else is indexed like a list
+
+        Parameters
+        ----------
+        value_str : str
+            The container represented as a string
+        key_str : str
+            The key or index represented as a string
+        index_str : str
+            The index represented as a string, counted from the end of the
+            list if it is a negative constant
+        value_type : TypeVariable
+            The type of the container
+
+        Returns
+        -------
+        str
+            The item represented as a string
+        """
+        if value_type.get_type() == "dict":
+            return value_str + ".at(" + key_str + ")"
+
+        return value_str + "[" + index_str + "]"
+
+    # Operators
+    def parse_BoolOp(self, node, file_index, function_key):
+        """
+        Handles parsing an ast.BoolOp node.
+
+        Parameters
+        ----------
+        node : ast.BoolOp
+            The ast.BoolOp node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The BoolOp represented as a string
+        return_type : TypeVariable
+            The return type of the BoolOp
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the python code cannot be directly translated
+        """
+        try:
+            return self.parse_folded(node, file_index, function_key)
+        except ppex.NotConstant:
+            pass
+
+        # Values known not to decide the result are skipped over, and the
+        # result is the last value if that leaves only one
+        value_nodes = self.constant_folder.get_remaining_values(node, function_key)
+        if len(value_nodes) == 1:
+            return self.recurse_operator(value_nodes[0], file_index, function_key)
+
+        # List of tuples consisting of (string, TypeVariable)
+        compare_nodes = []
+        # Multiple nodes can be chained, so we need to go through all of them
+        for internal_node in value_nodes:
+            compare_nodes.append(self.recurse_operator(internal_node,
+                                                       file_index,
+                                                       function_key))
+
+        # This shouldn't be possible normally, but we check to be safe
+        if len(compare_nodes) < 2:
+            raise ppex.TranslationNotSupported("TODO: Less than 2 items being compared")
+
+        return_str = ""
+
+        # Go through all but the last one and create a string separated by
+        # the C++ version of the python operator
+        for compare_node in compare_nodes[:-1]:
+            return_str += (compare_node[0] +
+                           self.context.operator_map[node.op.__class__.__name__])
+
+        return_str += compare_nodes[-1][0]
+
+        # Short circuit operators give back one of the items being compared,
+        # so the result has to be able to hold any of them
+        return_type = self.get_joined_type(value_nodes,
+                                           [compare_node[1] for compare_node in compare_nodes])
+
+        return_str = "(" + return_str + ")"
+        return return_str, return_type
+
+    def parse_BinOp(self, node, file_index, function_key):
+        """
+        Handles parsing an ast.BinOp node.
+
+        Parameters
+        ----------
+        node : ast.BinOp
+            The ast.BinOp node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The BinOp represented as a string
+        return_type : TypeVariable
+            The return type of the BinOp
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the python code cannot be directly translated
+        """
+        try:
+            return self.parse_folded(node, file_index, function_key)
+        except ppex.NotConstant:
+            pass
+
+        left_str, left_type = self.recurse_operator(node.left,
+                                                    file_index,
+                                                    function_key)
+        right_str, right_type = self.recurse_operator(node.right,
+                                                      file_index,
+                                                      function_key)
+
+        left_str = str(left_str)
+        right_str = str(right_str)
+        operator = node.op.__class__.__name__
+        if operator in self.context.operator_map:
+            if operator == "Pow":
+                self.add_include_file("math.h", file_index, function_key)
+                return_str = "pow(" + left_str + ", " + right_str + ")"
+                return_type = cvar.CPPVariable.get_type_cell("float")
+
+            elif operator == "FloorDiv":
+                return_str = left_str + " / " + right_str
+                # If they aren't both ints, we need to cast to int to truncate
+                if left_type.get_type() != "int" or right_type.get_type() != "int":
+                    return_str = "(int)(" + return_str + ")"
+                return_type = cvar.CPPVariable.get_type_cell("int")
+
+            elif operator == "Div":
+                return_str = left_str + " / " + right_str
+                # We need to cast one to a double or it will perform integer
+                # math
+                if left_type.get_type() != "float" or right_type.get_type() != "float":
+                    return_str = "(double)" + return_str
+                return_type = cvar.CPPVariable.get_type_cell("float")
+
+            else:
+                return_str = left_str \
+                              + self.context.operator_map[operator] \
+                              + right_str
+
+                # The result has to be able to hold either side
+                return_type = self.get_joined_type((node.left, node.right),
+                                                   (left_type, right_type))
+
+        return_str = "(" + return_str + ")"
+        return return_str, return_type
+
+    def type_precedence(self, type_a, type_b):
+        """
+        We determine which type takes precedent based on loss of
+        precision. So a float will take precedence over an int
+        If we can't figure it out, we'll default to auto
+
+        Parameters
+        ----------
+        type_a : str
+            One of the types to compare
+        type_b : str
+            The other type to compare with
+
+        Returns
+        -------
+        str
+            The type that should take precedence
+        """
+        precedence = self.context.type_precedence_dict
+
+        # Containers only hold on to their type when joined with a type
+        # nothing is known about yet
+        containers = self.context.container_types
+        if type_a in containers or type_b in containers:
+            if type_a == type_b or type_b in ("auto", "None", "void"):
+                return type_a
+            if type_a in ("auto", "None", "void"):
+                return type_b
+            return "auto"
+
+        if type_a in precedence and type_b in precedence \
+                and precedence[type_a] != precedence[type_b]:
+
+            # Smaller value means higher precedence
+            if precedence[type_a] < precedence[type_b]:
+                return_type = type_a
+
+            else:
+                return_type = type_b
+
+        elif type_a == type_b:
+            return_type = type_a
+
+        else:
+            # Type doesn't exist in our precedence table
+            return_type = "auto"
+
+        return return_type
+
+    def parse_UnaryOp(self, node, file_index, function_key):
+        """
+        Handles parsing an ast.UnaryOp node.
+
+        Parameters
+        ----------
+        node : ast.UnaryOp
+            The ast.UnaryOp node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        return_str : str
+            The UnaryOp represented as a string
+        return_type : TypeVariable
+            The return type of the UnaryOp
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the python code cannot be directly translated
+        """
+        operator = node.op.__class__
+        if operator.__name__ not in self.context.operator_map:
+            raise ppex.TranslationNotSupported("TODO: UnaryOp not supported")
+
+        try:
+            return self.parse_folded(node, file_index, function_key)
+        except ppex.NotConstant:
+            pass
 
         return_str, return_type = self.recurse_operator(node.operand,
                                                         file_index,
                                                         function_key)
 
-        # Not operation becomes a bool no matter what type it operated on
+        # Not operation becomes a bool no matter what type it operated on.
+        # The others keep the type of their operand
         if operator is ast.Not:
-            return_type = ["bool"]
-        else:
-            return_type = ["int"]
+            return_type = cvar.CPPVariable.get_type_cell("bool")
 
-        return_str = "(" + PyAnalyzer.operator_map[operator.__name__] + return_str + ")"
+        return_str = "(" + self.context.operator_map[operator.__name__] + return_str + ")"
         return return_str, return_type
 
     def parse_Compare(self, node, file_index, function_key):
@@ -1078,7 +2364,7 @@ class PyAnalyzer():
         -------
         return_str : str
             The Compare operation represented as a string
-        return_type : list of str
+        return_type : TypeVariable
             The return type of the Compare operation
 
         Raises
@@ -1088,40 +2374,187 @@ class PyAnalyzer():
         """
         # Ensure we can do all types of operations present in code line
         for op in node.ops:
-            if op.__class__.__name__ not in PyAnalyzer.comparison_map:
+            if op.__class__.__name__ not in self.context.comparison_map \
+                    and op.__class__ not in (ast.In, ast.NotIn):
                 raise ppex.TranslationNotSupported("TODO: Comparison operation not supported")
 
+        try:
+            return self.parse_folded(node, file_index, function_key)
+        except ppex.NotConstant:
+            pass
+
         # Comparisons can be chained, so we use the left item as the
         # "last" item to be compared to start the chain
+        last_node = node.left
         last_comparator = self.recurse_operator(node.left,
                                                 file_index,
                                                 function_key)[0]
 
-        return_str = ""
-
         # Chaining comparisons together with ands
-        for index in range(1, len(node.ops)-1):
-            comparator = self.recurse_operator(node.comparators[index],
-                                               file_index,
-                                               function_key)[0]
-            return_str += "(" + last_comparator \
-                          + PyAnalyzer.comparison_map[node.ops[index-1].__class__.__name__] \
-                          + comparator + ") && "
+        comparison_strs = []
+        for index, (op, comparator_node) in enumerate(zip(node.ops, node.comparators)):
+            if op.__class__ in (ast.In, ast.NotIn) \
+                    and comparator_node.__class__ in (ast.List, ast.Set, ast.Tuple):
+                if index < len(node.ops) - 1:
+                    raise ppex.TranslationNotSupported("TODO: Comparison operation not supported")
+                comparison_strs.append(self.get_literal_membership_str(last_node, last_comparator,
+                                                                       comparator_node,
+                                                                       op.__class__ is ast.NotIn,
+                                                                       file_index, function_key))
+                break
+
+            comparator, comparator_type = self.recurse_operator(comparator_node,
+                                                                file_index,
+                                                                function_key)
+            if op.__class__ in (ast.In, ast.NotIn):
+                membership_args = (last_node, last_comparator, comparator, comparator_type,
+                                   op.__class__ is ast.NotIn, file_index, function_key)
+                # Containers that aren't known yet, such as parameters, are
+                # looked in once the calls to the function are solved
+                if comparator_type.get_type() == "auto":
+                    comparison_strs.append(self.defer_str(node, self.get_membership_str,
+                                                          *membership_args))
+                else:
+                    comparison_strs.append(self.get_membership_str(*membership_args))
+            else:
+                comparison_strs.append("(" + last_comparator
+                                       + self.context.comparison_map[op.__class__.__name__]
+                                       + comparator + ")")
+            last_node = comparator_node
             last_comparator = comparator
 
-        # Add last comparison on the end
-        comparator = self.recurse_operator(node.comparators[-1],
-                                           file_index,
-                                           function_key)[0]
-
-        return_str += "(" + last_comparator + \
-                      PyAnalyzer.comparison_map[node.ops[-1].__class__.__name__] \
-                      + comparator + ")"
+        return_str = " && ".join(comparison_strs)
+        if len(comparison_strs) > 1:
+            return_str = "(" + return_str + ")"
 
         # All comparisons come back as a bool
-        return_type = ["bool"]
+        return_type = cvar.CPPVariable.get_type_cell("bool")
         return return_str, return_type
 
+    def get_membership_str(self, item_node, item_str, container_str, container_type,
+                           negate, file_index, function_key):
+        """
+        Translates a membership test. Sets and dicts count the item, which is
+        a hash lookup, bitsets check the item's bit, and lists are searched
+        from the start
+
+        Parameters
+        ----------
+        item_node : ast node
+            The item being looked for
+        item_str : str
+            The item represented as a string
+        container_str : str
+            The container represented as a string
+        container_type : TypeVariable
+            The type of the container
+        negate : bool
+            Whether this is a not in test
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        str
+            The membership test represented as a string
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the container isn't a list, set or dict
+        """
+        container = container_type.get_type()
+        if container in ("set", "dict"):
+            return "(" + container_str + ".count(" + item_str + ")" \
+                   + (" == 0)" if negate else " != 0)")
+
+        if container == "bitset":
+            # Items outside of the bitset are never in it, while indexing
+            # with them would read past its bits
+            try:
+                item = ast.literal_eval(item_node)
+            except ValueError:
+                item = None
+            size_str = str(self.context.small_set_size)
+            if type(item) is int:
+                if 0 <= item < self.context.small_set_size:
+                    test_str = container_str + "[" + item_str + "]"
+                else:
+                    return self.context.bool_map[str(negate)]
+            else:
+                test_str = item_str + " >= 0 && " + item_str + " < " + size_str \
+                           + " && " + container_str + "[" + item_str + "]"
+            return "(!(" + test_str + "))" if negate else "(" + test_str + ")"
+
+        # A container still unknown once the types are solved belongs to a
+        # function that is never called, so it is never compiled either
+        if container in ("list", "auto"):
+            # The list is named three times, so it has to be a variable
+            if not container_str.isidentifier():
+                raise ppex.TranslationNotSupported("TODO: Membership test of a list "
+                                                   "not in a variable")
+            self.add_include_file("algorithm", file_index, function_key)
+            return "(std::find(" + container_str + ".begin(), " + container_str + ".end(), " \
+                   + item_str + ")" + (" == " if negate else " != ") + container_str + ".end())"
+
+        raise ppex.TranslationNotSupported("TODO: Membership test needs a list, set or dict")
+
+    def get_literal_membership_str(self, item_node, item_str, container_node, negate,
+                                   file_index, function_key):
+        """
+        Translates a membership test in a list, set or tuple written out in
+        place. The item is compared with each of them, rather than building
+        a container every time the test runs
+
+        Parameters
+        ----------
+        item_node : ast node
+            The item being looked for
+        item_str : str
+            The item represented as a string
+        container_node : ast.List, ast.Set or ast.Tuple
+            The items to look in
+        negate : bool
+            Whether this is a not in test
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
+
+        Returns
+        -------
+        str
+            The membership test represented as a string
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the item would be worked out more than once, or an item is
+            unpacked
+        """
+        if item_node.__class__ not in (ast.Name, ast.Constant) and len(container_node.elts) > 1:
+            raise ppex.TranslationNotSupported("TODO: Membership test of an expression "
+                                               "in more than one item")
+
+        if len(container_node.elts) == 0:
+            return self.context.bool_map[str(negate)]
+
+        if negate:
+            operator, joiner = self.context.comparison_map["NotEq"], " && "
+        else:
+            operator, joiner = self.context.comparison_map["Eq"], " || "
+
+        test_strs = []
+        for item in container_node.elts:
+            if item.__class__ is ast.Starred:
+                raise ppex.TranslationNotSupported("TODO: Can't unpack in a membership test")
+            test_strs.append(item_str + operator
+                             + str(self.recurse_operator(item, file_index, function_key)[0]))
+
+        return "(" + joiner.join(test_strs) + ")"
+
     def recurse_operator(self, node, file_index, function_key):
         """
         Accepts a node and determines the appropriate handler function to use
@@ -1139,50 +2572,541 @@ class PyAnalyzer():
 
         Returns
         -------
-        tuple : (str, [str])
+        tuple : (str, TypeVariable)
             Tuple with the string representation of the operation and the
-            return type in a list of a string
+            type it returns
 
         Raises
         ------
         TranslationNotSupported
             If the python code cannot be directly translated
         """
-        node_type = node.__class__
-        if node_type is ast.BinOp:
-            return self.parse_BinOp(node, file_index, function_key)
+        handler = self.expression_handlers.get(node.__class__)
+        if handler is None:
+            # Anything we don't handle
+            raise ppex.TranslationNotSupported()
 
-        elif node_type is ast.BoolOp:
-            return self.parse_BoolOp(node, file_index, function_key)
+        return handler(self, node, file_index, function_key)
 
-        elif node_type is ast.UnaryOp:
-            return self.parse_UnaryOp(node, file_index, function_key)
+    def parse_Name(self, node, file_index, function_key):
+        """
+        Handles parsing an ast.Name node. Variables should already exist if
+        we're using them, so we just grab them from the current context
 
-        elif node_type is ast.Compare:
-            return self.parse_Compare(node, file_index, function_key)
+        Parameters
+        ----------
+        node : ast.Name
+            The ast.Name node to be translated
+        file_index : int
+            Index of the file to write to in the output_files list
+        function_key : str
+            Key used to find the correct function in the function dictionary
 
-        elif node_type is ast.Call:
-            return self.parse_Call(node, file_index, function_key)
+        Returns
+        -------
+        tuple : (str, TypeVariable)
+            Tuple with the name of the variable and its type
 
-        elif node_type is ast.Name:
-            # Variable should already exist if we're using it, so we just grab
-            # it from the current context
+        Raises
+        ------
+        TranslationNotSupported
+            If the variable hasn't been declared yet
+        """
+        # Module constants are read as their values
+        if node.id in self.constant_folder.constants:
             try:
-                return node.id, self.find_var_type(node.id,
-                                                   file_index,
-                                                   function_key)
-            except ppex.VariableNotFound:
-                # Can't handle non declared variables being used
-                raise ppex.TranslationNotSupported("TODO: Variable used before declaration")
+                return self.parse_folded(node, file_index, function_key)
+            except ppex.NotConstant:
+                pass
 
-        elif node_type is ast.Constant:
-            return self.parse_Constant(node, file_index, function_key)
+        try:
+            return node.id, self.find_var_type(node.id, file_index, function_key)
+        except ppex.VariableNotFound:
+            # Can't handle non declared variables being used
+            raise ppex.TranslationNotSupported("TODO: Variable used before declaration")
+
+    # Helper methods
+    def add_type_flow(self, value_node, value_type, target_type):
+        """
+        Requires a type to be able to hold the type of a value. The result of
+        an operator is only ever stored in one place, so instead of flowing
+        into it, the two are merged into one set. This keeps the number of
+        type variables and flows down, and makes a variable updated from
+        itself, like x = x + 1, a single set straight away
 
+        Parameters
+        ----------
+        value_node : ast node
+            The node the value came from
+        value_type : TypeVariable
+            The type of the value
+        target_type : TypeVariable
+            The type of where the value is stored
+        """
+        if value_node.__class__ in self.merged_result_nodes and not value_type.constant:
+            self.solver.unify(value_type, target_type)
         else:
-            # Anything we don't handle
-            raise ppex.TranslationNotSupported()
+            self.solver.add_flow(value_type, target_type)
+
+    def get_joined_type(self, value_nodes, value_types):
+        """
+        Gets a type that can hold every one of the given values
+
+        Parameters
+        ----------
+        value_nodes : list of ast nodes
+            The nodes the values came from
+        value_types : list of TypeVariable
+            The types of the values
+
+        Returns
+        -------
+        TypeVariable
+            The joined type
+        """
+        # Literals are joined right away
+        joined_type = None
+        for value_type in value_types:
+            if not value_type.constant:
+                break
+            joined_type = self.solver.join_types(joined_type, value_type.py_type)
+        else:
+            return cvar.CPPVariable.get_type_cell(joined_type)
+
+        # The result of an operator among the values is stored nowhere else,
+        # so it can hold the joined type instead of making a new one
+        return_type = None
+        for value_node, value_type in zip(value_nodes, value_types):
+            if value_node.__class__ in self.merged_result_nodes and not value_type.constant:
+                return_type = value_type
+                break
+
+        if return_type is None:
+            return_type = ts.TypeVariable()
+
+        for value_node, value_type in zip(value_nodes, value_types):
+            if value_type is not return_type:
+                self.add_type_flow(value_node, value_type, return_type)
+
+        return return_type
+
+    def find_small_sets(self, tree, function_key):
+        """
+        Finds the sets that can become bitsets. A set qualifies when it is a
+        local variable, every set assigned to it is written out with integer
+        constants from 0 up to the small set size, and it is otherwise only
+        used to add or discard items known to be in that range and to test
+        the membership of a constant or variable
+
+        Parameters
+        ----------
+        tree : List of ast nodes
+            List containing ast nodes from ast.parse
+        function_key : str
+            Key of the function the code outside of functions belongs to
+
+        Returns
+        -------
+        set of (str, str)
+            The function key and name of each set that qualifies
+        """
+        scopes = [(function_key, [node for node in tree if node.__class__ is not ast.FunctionDef],
+                   set())]
+        for node in tree:
+            if node.__class__ is ast.FunctionDef:
+                scopes.append((node.name, node.body,
+                               {arg.arg for arg in node.args.args}))
+
+        small_sets = set()
+        for key, body, parameters in scopes:
+            # Whether each name has only been used in ways a bitset can be,
+            # and the names a small set literal is assigned to
+            small_uses = {}
+            assigned_sets = set()
+            for node in body:
+                self.find_small_set_uses(node, {}, small_uses, assigned_sets)
+
+            small_sets.update((key, name) for name in assigned_sets
+                              if small_uses.get(name, True) and name not in parameters)
+
+        return small_sets
+
+    def find_small_set_uses(self, node, bounds, small_uses, assigned_sets):
+        """
+        Records how the names in a node are used, for find_small_sets
+
+        Parameters
+        ----------
+        node : ast node
+            The node to search
+        bounds : dict of {str: range}
+            Indexes of the enclosing counted loops whose every value is a
+            small integer, mapped to their ranges
+        small_uses : dict of {str: bool}
+            Whether each name has only been used in ways a bitset can be,
+            updated in place
+        assigned_sets : set of str
+            Names a small set literal is assigned to, updated in place
+        """
+        node_class = node.__class__
+        if node_class in (ast.FunctionDef, ast.ClassDef, ast.Lambda):
+            return
+
+        if node_class is ast.Assign and len(node.targets) == 1 \
+                and node.targets[0].__class__ is ast.Name and node.value.__class__ is ast.Set:
+            name = node.targets[0].id
+            if all(self.is_small_int(item, {}) for item in node.value.elts):
+                assigned_sets.add(name)
+            else:
+                small_uses[name] = False
+            return
+
+        if node_class is ast.Call and node.func.__class__ is ast.Attribute \
+                and node.func.value.__class__ is ast.Name \
+                and node.func.attr in self.context.container_methods["bitset"]:
+            name = node.func.value.id
+            if len(node.args) != 1 or len(node.keywords) > 0 \
+                    or not self.is_small_int(node.args[0], bounds):
+                small_uses[name] = False
+            for arg in node.args:
+                self.find_small_set_uses(arg, bounds, small_uses, assigned_sets)
+            return
+
+        if node_class is ast.Compare:
+            item = node.left
+            for op, comparator in zip(node.ops, node.comparators):
+                if op.__class__ in (ast.In, ast.NotIn) and comparator.__class__ is ast.Name:
+                    # Looking up anything else would work it out more than once
+                    if item.__class__ not in (ast.Name, ast.Constant):
+                        small_uses[comparator.id] = False
+                else:
+                    self.find_small_set_uses(comparator, bounds, small_uses, assigned_sets)
+                item = comparator
+            self.find_small_set_uses(node.left, bounds, small_uses, assigned_sets)
+            return
+
+        if node_class is ast.For and node.target.__class__ is ast.Name:
+            body_bounds = dict(bounds)
+            body_bounds.pop(node.target.id, None)
+            try:
+                iterator = node.iter
+                if iterator.__class__ is ast.Call and iterator.func.__class__ is ast.Name \
+                        and iterator.func.id == "range" and len(iterator.keywords) == 0:
+                    values = range(*[ast.literal_eval(arg) for arg in iterator.args])
+                    if len(values) == 0 or self.is_small_int(ast.Constant(min(values)), {}) \
+                            and self.is_small_int(ast.Constant(max(values)), {}):
+                        body_bounds[node.target.id] = values
+            except (ValueError, TypeError):
+                pass
+
+            self.find_small_set_uses(node.iter, bounds, small_uses, assigned_sets)
+            for statement in node.body:
+                self.find_small_set_uses(statement, body_bounds, small_uses, assigned_sets)
+            # The index is left at the end of the range after the loop
+            for statement in node.orelse:
+                self.find_small_set_uses(statement, bounds, small_uses, assigned_sets)
+            return
+
+        if node_class is ast.Name:
+            small_uses[node.id] = False
+            return
+
+        for child in ast.iter_child_nodes(node):
+            self.find_small_set_uses(child, bounds, small_uses, assigned_sets)
+
+    def is_small_int(self, node, bounds):
+        """
+        Checks whether an expression is always an integer that fits in a
+        bitset
+
+        Parameters
+        ----------
+        node : ast node
+            The expression to check
+        bounds : dict of {str: range}
+            Indexes of the enclosing counted loops whose every value is a
+            small integer
+
+        Returns
+        -------
+        bool
+            Whether the value is known to be a small integer
+        """
+        if node.__class__ is ast.Name:
+            return node.id in bounds
+
+        # Only int constants are checked, since evaluating other literals can
+        # fail, such as a set holding a list
+        return node.__class__ is ast.Constant and type(node.value) is int \
+            and 0 <= node.value < self.context.small_set_size
+
+    def get_changed_names(self, tree):
+        """
+        Finds every variable name stored to in a list of statements,
+        including inside nested blocks, along with the variables whose
+        methods are called since those can change a container
+
+        Parameters
+        ----------
+        tree : List of ast nodes
+            The statements to search
+
+        Returns
+        -------
+        set of str
+            Names of the variables that can change
+        """
+        changed_names = set()
+        for node in tree:
+            for internal_node in ast.walk(node):
+                if internal_node.__class__ is ast.Name \
+                        and internal_node.ctx.__class__ is not ast.Load:
+                    changed_names.add(internal_node.id)
+                elif internal_node.__class__ is ast.Call \
+                        and internal_node.func.__class__ is ast.Attribute \
+                        and internal_node.func.value.__class__ is ast.Name:
+                    changed_names.add(internal_node.func.value.id)
+
+        return changed_names
+
+    def is_loop_invariant(self, node, changed_names):
+        """
+        Checks whether an expression gives the same value every time it is
+        evaluated in a loop. Only constants, the lengths of variables, and
+        operators on these and variables the loop doesn't change are known
+        to do so
+
+        Parameters
+        ----------
+        node : ast node
+            The expression to check
+        changed_names : set of str
+            Names of the variables that can change in the loop
+
+        Returns
+        -------
+        bool
+            Whether the expression can be evaluated every iteration
+        """
+        for internal_node in ast.walk(node):
+            if internal_node.__class__ is ast.Name:
+                if internal_node.id in changed_names:
+                    return False
+            elif internal_node.__class__ is ast.Call:
+                if internal_node.func.__class__ is not ast.Name \
+                        or internal_node.func.id != "len" \
+                        or len(internal_node.args) != 1 \
+                        or internal_node.args[0].__class__ is not ast.Name \
+                        or len(internal_node.keywords) > 0:
+                    return False
+            elif not isinstance(internal_node, (ast.Constant, ast.BinOp, ast.UnaryOp,
+                                                ast.operator, ast.unaryop, ast.Load)):
+                return False
+
+        return True
+
+    def get_loop_breaks(self, node):
+        """
+        Finds the break statements that leave a loop. Breaks in nested loops
+        only leave those loops
+
+        Parameters
+        ----------
+        node : ast.For or ast.While
+            The loop to search
+
+        Returns
+        -------
+        list of ast.Break
+            The breaks that leave the loop
+        """
+        breaks = []
+        pending = list(node.body)
+        while len(pending) > 0:
+            internal_node = pending.pop()
+            if internal_node.__class__ is ast.Break:
+                breaks.append(internal_node)
+            elif isinstance(internal_node, (ast.For, ast.While)):
+                # The else of a nested loop still belongs to this one
+                pending += internal_node.orelse
+            elif not isinstance(internal_node, (ast.FunctionDef, ast.ClassDef)):
+                pending += ast.iter_child_nodes(internal_node)
+
+        return breaks
+
+    def get_hidden_name(self, name):
+        """
+        Gets a name for a variable the translation adds that the script
+        doesn't use anywhere, numbering it if the script already does. Names
+        of variables outside of a loop header have to be added to used_names
+        so the next one is numbered too
+
+        Parameters
+        ----------
+        name : str
+            The name to use if it is free
+
+        Returns
+        -------
+        str
+            A name no other variable has
+        """
+        hidden_name = name
+        number = 1
+        while hidden_name in self.used_names:
+            hidden_name = name + str(number)
+            number += 1
+
+        return hidden_name
+
+    def defer_str(self, node, translate, *args):
+        """
+        Puts off translating part of an expression until the types are
+        solved, for code that depends on a type that isn't known yet. A
+        placeholder stands in for the code until resolve_deferred_strs swaps
+        in what translate returns
+
+        Parameters
+        ----------
+        node : ast node
+            The expression being translated, which is commented out if it
+            can't be translated with the solved types. None if translate
+            never fails
+        translate : function
+            Translates the expression once the types are solved
+        *args
+            Arguments to call translate with
+
+        Returns
+        -------
+        str
+            The placeholder for the code
+        """
+        number = len(self.deferred_strs)
+        self.deferred_strs[number] = (node, translate, args)
+        return "\x00" + str(number) + "\x00"
+
+    def resolve_deferred_strs(self):
+        """
+        Replaces the placeholders left by defer_str with their translations
+        now that the types are solved. Code that can't be translated with the
+        solved types is commented out with the reason above its line
+        """
+        if len(self.deferred_strs) == 0:
+            return
+
+        for output_file in self.output_files:
+            for function in output_file.functions.values():
+                for line in function.lines.values():
+                    if "\x00" not in line.code_str:
+                        continue
+
+                    def resolve(match):
+                        node, translate, args = self.deferred_strs[int(match.group(1))]
+                        try:
+                            code_str = translate(*args)
+                        except ppex.TranslationNotSupported as ex:
+                            line.pre_comment_str = ex.reason
+                            return "/*" + self.get_source_text(node) + "*/"
+                        # Placeholders inside the code are resolved in turn
+                        return self.deferred_pattern.sub(resolve, code_str)
+
+                    line.code_str = self.deferred_pattern.sub(resolve, line.code_str)
+
+        self.deferred_strs = {}
+
+    def get_source_text(self, node):
+        """
+        Gets the python code of a node from the original script
+
+        Parameters
+        ----------
+        node : ast node
+            The node to get the code of
+
+        Returns
+        -------
+        str
+            The python code of the node
+        """
+        last_index = node.end_lineno - node.lineno
+        lines = self.raw_lines.get_line_bytes(node.lineno,
+                                              node.end_lineno).split(b"\n")[:last_index + 1]
+        lines[last_index] = lines[last_index][:node.end_col_offset]
+        lines[0] = lines[0][node.col_offset:]
+        return b"\n".join(lines).decode(self.raw_lines.encoding)
+
+    def get_item_type(self, container_type):
+        """
+        Gets the type of the items of a container. A variable whose type isn't
+        known yet, such as a parameter used before any call passes a list in,
+        is given an item type that the list passed in will share
+
+        Parameters
+        ----------
+        container_type : TypeVariable
+            The type of the container
+
+        Returns
+        -------
+        TypeVariable
+            The type of the items
+
+        Raises
+        ------
+        TranslationNotSupported
+            If the type isn't a container
+        """
+        root = container_type.find()
+        if root.get_type() not in self.context.container_types + ("auto", "None") \
+                or root.constant:
+            raise ppex.TranslationNotSupported("TODO: Not a container")
+
+        if root.element is None:
+            root.element = ts.TypeVariable()
+
+        return root.element
+
+    def get_key_type(self, mapping_type):
+        """
+        Gets the type of the keys of a dict
+
+        Parameters
+        ----------
+        mapping_type : TypeVariable
+            The type of the dict
+
+        Returns
+        -------
+        TypeVariable
+            The type of the keys
+        """
+        root = mapping_type.find()
+        if root.key is None:
+            root.key = ts.TypeVariable()
+
+        return root.key
+
+    def add_include_file(self, file, file_index, function_key):
+        """
+        Adds an include file to the output file and records that the function
+        being analyzed needs it
+
+        Parameters
+        ----------
+        file : str
+            Name of the include file to add
+        file_index : int
+            Index of the file to add the include to
+        function_key : str
+            Key used to find the correct function in the function dictionary
+        """
+        self.output_files[file_index].add_include_file(file)
+
+        function_ref = self.output_files[file_index].functions[function_key]
+        if file not in function_ref.includes:
+            function_ref.includes.append(file)
 
-    # Helper methods
     def find_var_type(self, name, file_index, function_key):
         """
         Finds the type of a variable in a given context
@@ -1198,8 +3122,8 @@ class PyAnalyzer():
 
         Returns
         -------
-        list : list of str
-            The list reference containing the variable type
+        TypeVariable
+            The type of the variable
 
         Raises
         ------
@@ -0,0 +1,257 @@
+import asyncio
+import concurrent.futures
+import copy
+import os
+from modules import outputwriter as ow
+from modules import pytranslator
+
+
+def translate_to_text(script_path, unit_size=None, build=None, context=None):
+    """
+    Translates a single python script without writing anything. This is a
+    module level function so it can be sent to worker processes
+
+    Parameters
+    ----------
+    script_path : str
+        Path to the python file to be converted
+    unit_size : int
+        Target number of code lines in each output .cpp file. None makes a
+        single file
+    build : BuildGenerator
+        Generates a build description along with the C++ files. None leaves
+        building to the caller
+    context : TranslationContext
+        Tables to translate with. None uses the defaults
+
+    Returns
+    -------
+    files : dict of {str: str}
+        The text of each output file, keyed by its file name
+    todo_count : int
+        Number of lines left for a manual port
+    """
+    translator = pytranslator.PyTranslator(script_path, "", verbose=False,
+                                           unit_size=unit_size, build=build,
+                                           context=context)
+    files = translator.translate()
+
+    return files, translator.get_todo_count()
+
+
+def write_output_files(output_path, files):
+    """
+    Writes translated files to an output directory, creating it if needed.
+    Files that already hold the same text are left untouched
+
+    Parameters
+    ----------
+    output_path : str
+        Path to the directory to write to
+    files : dict of {str: str}
+        The text of each file, keyed by its file name
+
+    Returns
+    -------
+    list of str
+        Names of the files that had to be written
+    """
+    os.makedirs(output_path, exist_ok=True)
+
+    return [filename for filename, text in files.items()
+            if ow.write_text_if_changed(os.path.join(output_path, filename), text)]
+
+
+class PyAsyncTranslator():
+    """
+    Translates scripts from asyncio code without blocking the event loop.
+    Parsing and analysis run in an executor, output files are written from a
+    thread, and a semaphore caps how many translations are handed to the
+    executor at once. Requests beyond that wait their turn in the event loop,
+    so a burst of requests or one huge script only ever holds its own slots
+    """
+
+    def __init__(self, executor=None, concurrency=None, unit_size=None,
+                 build=None, context=None):
+        """
+        Constructs a PyAsyncTranslator object
+
+        Parameters
+        ----------
+        executor : concurrent.futures.Executor
+            Runs the translations. None creates a process pool with one
+            worker per core, which is shut down by close
+        concurrency : int
+            Most translations handed to the executor at once. Defaults to
+            the core count
+        unit_size : int
+            Target number of code lines in each output .cpp file. None writes
+            a single file per script
+        build : BuildGenerator
+            Generates a build description for each script. None leaves
+            building to the caller
+        context : TranslationContext
+            Tables to translate every script with. A context belongs to one
+            translation at a time, so each translation gets its own copy.
+            None uses the defaults
+        """
+        self.owns_executor = executor is None
+        if executor is None:
+            executor = concurrent.futures.ProcessPoolExecutor()
+        self.executor = executor
+
+        if concurrency is None:
+            concurrency = os.cpu_count() or 1
+        self.concurrency = max(1, concurrency)
+
+        self.unit_size = unit_size
+
+        self.build = build
+
+        self.context = context
+
+        # Made on first use so it belongs to the loop that runs the requests
+        self.semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """
+        Shuts down the executor if this object created it, without blocking
+        the event loop while the workers exit
+        """
+        if self.owns_executor:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.executor.shutdown)
+
+    async def translate(self, script_path, output_path=None):
+        """
+        Translates one script. Cancelling a request that is still waiting
+        for a slot, or whose translation hasn't started in the executor,
+        means it never runs. A translation already running is left to finish
+        and its result is dropped
+
+        Parameters
+        ----------
+        script_path : str
+            Path to the python file to be converted
+        output_path : str
+            Path to the directory to write the output files to. None only
+            returns their text
+
+        Returns
+        -------
+        dict
+            Summary of the translation with the script path, output path,
+            whether it succeeded, the number of TODO lines and any error
+            message. Without an output path, the text of each file is stored
+            under "files"
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+
+        summary = {"script_path": script_path, "output_path": output_path,
+                   "success": False, "todo_count": 0, "error": ""}
+
+        context = None
+        if self.context is not None:
+            context = copy.deepcopy(self.context)
+
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            try:
+                files, summary["todo_count"] = await loop.run_in_executor(
+                    self.executor, translate_to_text, script_path, self.unit_size,
+                    self.build, context)
+
+                if output_path is None:
+                    summary["files"] = files
+                else:
+                    await loop.run_in_executor(None, write_output_files,
+                                               output_path, files)
+                summary["success"] = True
+
+            except Exception as ex:
+                # Like a batch run, one bad script shouldn't fail the rest
+                summary["error"] = ex.__class__.__name__ + ": " + str(ex)
+
+        return summary
+
+    async def translate_many(self, script_paths, output_paths=None):
+        """
+        Translates many scripts at once, within the concurrency limit.
+        Cancelling this cancels every translation that hasn't finished
+
+        Parameters
+        ----------
+        script_paths : list of str
+            Paths to the python files to be converted
+        output_paths : list of str
+            Directory to write each script's output to, in the same order.
+            None only returns the text of every script
+
+        Returns
+        -------
+        list of dict
+            One summary per script, in the order they were given
+
+        Raises
+        ------
+        ValueError
+            If there isn't one output path for each script
+        """
+        if output_paths is None:
+            output_paths = [None] * len(script_paths)
+        if len(output_paths) != len(script_paths):
+            raise ValueError("Expected one output path per script, got "
+                             + str(len(output_paths)) + " for "
+                             + str(len(script_paths)) + " scripts")
+
+        return await asyncio.gather(*[self.translate(script_path, output_path)
+                                      for script_path, output_path
+                                      in zip(script_paths, output_paths)])
+
+
+async def translate_many(script_paths, output_paths=None, concurrency=None,
+                         executor=None, unit_size=None, build=None, context=None):
+    """
+    Translates many scripts from asyncio code without blocking the event
+    loop, using a PyAsyncTranslator for just these scripts
+
+    Parameters
+    ----------
+    script_paths : list of str
+        Paths to the python files to be converted
+    output_paths : list of str
+        Directory to write each script's output to, in the same order. None
+        only returns the text of every script
+    concurrency : int
+        Most translations running at once. Defaults to the core count
+    executor : concurrent.futures.Executor
+        Runs the translations. None uses a process pool for this call
+    unit_size : int
+        Target number of code lines in each output .cpp file. None writes a
+        single file per script
+    build : BuildGenerator
+        Generates a build description for each script. None leaves building
+        to the caller
+    context : TranslationContext
+        Tables to translate every script with. None uses the defaults
+
+    Returns
+    -------
+    list of dict
+        One summary per script, in the order they were given
+
+    Raises
+    ------
+    ValueError
+        If there isn't one output path for each script
+    """
+    async with PyAsyncTranslator(executor, concurrency, unit_size, build,
+                                 context) as translator:
+        return await translator.translate_many(script_paths, output_paths)
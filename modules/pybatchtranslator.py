@@ -0,0 +1,289 @@
+import concurrent.futures
+import glob
+import itertools
+import os
+from modules import incrementalstate
+from modules import pytranslator
+from modules import translationcache
+from modules import translationprofiler
+
+
+def translate_script(script_path, output_path, cache_path=None,
+                     incremental=False, profile=False, unit_size=None,
+                     build=None, context=None, line_directives=False):
+    """
+    Translates a single python script and reports how the translation went.
+    This is a module level function so it can be sent to worker processes
+
+    Parameters
+    ----------
+    script_path : str
+        Path to the python file to be converted
+    output_path : str
+        Path to the directory where the output file should be written
+    cache_path : str
+        Path to the translation cache directory. None disables caching
+    incremental : bool
+        Whether to reuse the functions that haven't changed since the last
+        run, using the state saved in the output directory
+    profile : bool
+        Whether to add a profiling report of the translation to the summary
+    unit_size : int
+        Target number of code lines in each output .cpp file. None writes a
+        single file
+    build : BuildGenerator
+        Generates a build description next to the output files. None leaves
+        building to the caller
+    context : TranslationContext
+        Tables to translate with. None uses the defaults
+    line_directives : bool
+        Whether to put #line directives in the output so compiler messages
+        name the python lines the C++ came from
+
+    Returns
+    -------
+    dict
+        Summary of the translation with the script path, output path, whether
+        it succeeded, the number of TODO lines, any error message, the files
+        that were written and which of them are .cpp units of translated
+        code. When profiling, the report is stored under "profile"
+    """
+    summary = {"script_path": script_path, "output_path": output_path,
+               "success": False, "todo_count": 0, "error": "", "files": [],
+               "units": []}
+
+    profiler = None
+    reports = []
+    if profile:
+        profiler = translationprofiler.TranslationProfiler(reports.append)
+
+    try:
+        os.makedirs(output_path, exist_ok=True)
+        cache = None
+        if cache_path is not None:
+            cache = translationcache.TranslationCache(cache_path)
+        translator = pytranslator.PyTranslator(script_path,
+                                               os.path.join(output_path, ""),
+                                               verbose=False, cache=cache,
+                                               profiler=profiler,
+                                               unit_size=unit_size, build=build,
+                                               context=context,
+                                               line_directives=line_directives)
+        if incremental:
+            state_path = os.path.join(output_path,
+                                      incrementalstate.IncrementalState.state_filename)
+            translator.incremental_state = incrementalstate.IncrementalState.load(
+                state_path, translator.get_cache_key(b""))
+
+        translator.run()
+
+        if incremental:
+            translator.incremental_state.save(state_path)
+        summary["todo_count"] = translator.get_todo_count()
+        summary["files"] = translator.written_files
+        summary["units"] = translator.unit_files
+        summary["success"] = True
+
+    except Exception as ex:
+        # Invalid python, unreadable files or constructs the analyzer doesn't
+        # guard against shouldn't stop the rest of the batch
+        summary["error"] = ex.__class__.__name__ + ": " + str(ex)
+
+    # Failed translations never finish, so they are reported with the phases
+    # they got through
+    if profiler is not None:
+        if len(reports) > 0:
+            summary["profile"] = reports[-1]
+        else:
+            summary["profile"] = profiler.get_report(script_path)
+
+    return summary
+
+
+class PyBatchTranslator():
+    """
+    This class translates whole source trees by spreading PyTranslator runs
+    across a pool of worker processes
+    """
+
+    def __init__(self, sources, output_path, jobs=None, cache=None,
+                 incremental=False, profile_callback=None, unit_size=None,
+                 build=None, context=None, line_directives=False):
+        """
+        Constructs a batch translator
+
+        Parameters
+        ----------
+        sources : list of str
+            Directories, python files or glob patterns to translate
+        output_path : str
+            Path to the directory the source layout will be mirrored under
+        jobs : int
+            Number of worker processes to use. Defaults to the core count
+        cache : TranslationCache
+            Cache shared by the workers. None disables caching
+        incremental : bool
+            Whether each script should only analyze the functions that
+            changed since its last run
+        profile_callback : function
+            Called with the profiling report of each script, in this process,
+            once the batch finishes. None turns profiling off
+        unit_size : int
+            Target number of code lines in each output .cpp file. None writes
+            a single file per script
+        build : BuildGenerator
+            Generates a build description for each script. None leaves
+            building to the caller
+        context : TranslationContext
+            Tables to translate every script with. Each worker gets its own
+            copy. None uses the defaults
+        line_directives : bool
+            Whether to put #line directives in the output so compiler
+            messages name the python lines the C++ came from
+        """
+        self.sources = sources
+
+        self.output_path = output_path
+
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        self.jobs = max(1, jobs)
+
+        self.cache = cache
+
+        self.incremental = incremental
+
+        self.profile_callback = profile_callback
+
+        self.unit_size = unit_size
+
+        self.build = build
+
+        self.context = context
+
+        self.line_directives = line_directives
+
+    def find_scripts(self):
+        """
+        Expands the sources into the python scripts to translate along with
+        the directory each one should be written to
+
+        Returns
+        -------
+        list of (str, str)
+            Tuples of (script path, output directory) in a stable order
+        """
+        tasks = []
+        seen = set()
+
+        for source in self.sources:
+            if os.path.isdir(source):
+                base = source
+                scripts = []
+                for root, dirs, files in os.walk(source):
+                    # Walk in a fixed order so output is reproducible
+                    dirs.sort()
+                    scripts += [os.path.join(root, name)
+                                for name in sorted(files)
+                                if name.endswith(".py")]
+            else:
+                base = self.get_glob_base(source)
+                scripts = sorted(glob.glob(source, recursive=True))
+
+            for script in scripts:
+                if script in seen or not os.path.isfile(script):
+                    continue
+                seen.add(script)
+
+                # Each script gets its own directory so the layout of the
+                # source tree is mirrored under the output path
+                relative_path = os.path.relpath(script, base)
+                tasks.append((script,
+                              os.path.join(self.output_path,
+                                           os.path.splitext(relative_path)[0])))
+
+        return tasks
+
+    @staticmethod
+    def get_glob_base(pattern):
+        """
+        Finds the directory a glob pattern is rooted at, which is the part of
+        the path before the first component containing a wildcard
+
+        Parameters
+        ----------
+        pattern : str
+            Glob pattern or plain path to a script
+
+        Returns
+        -------
+        str
+            Directory that relative output paths are computed from
+        """
+        if not glob.has_magic(pattern):
+            return os.path.dirname(pattern)
+
+        base_parts = []
+        for part in pattern.split(os.sep):
+            if glob.has_magic(part):
+                break
+            base_parts.append(part)
+
+        return os.sep.join(base_parts) or os.curdir
+
+    def run(self):
+        """
+        Translates every script found in the sources
+
+        Returns
+        -------
+        list of dict
+            One summary per script, in the order the scripts were found
+        """
+        tasks = self.find_scripts()
+        if len(tasks) == 0:
+            return []
+
+        script_paths = [task[0] for task in tasks]
+        output_paths = [task[1] for task in tasks]
+
+        # Workers rebuild the cache object from its path rather than having
+        # it pickled across for every script
+        cache_path = None
+        if self.cache is not None:
+            cache_path = self.cache.cache_path
+        cache_paths = itertools.repeat(cache_path, len(tasks))
+        incremental = itertools.repeat(self.incremental, len(tasks))
+        profile = itertools.repeat(self.profile_callback is not None, len(tasks))
+        unit_sizes = itertools.repeat(self.unit_size, len(tasks))
+        builds = itertools.repeat(self.build, len(tasks))
+        contexts = itertools.repeat(self.context, len(tasks))
+        line_directives = itertools.repeat(self.line_directives, len(tasks))
+
+        # No need to pay for process start up when there's one worker
+        if self.jobs == 1 or len(tasks) == 1:
+            summaries = list(map(translate_script, script_paths, output_paths,
+                                 cache_paths, incremental, profile, unit_sizes,
+                                 builds, contexts, line_directives))
+        else:
+            # Sending work in chunks keeps scheduling overhead low on trees
+            # with thousands of small scripts
+            chunk_size = max(1, len(tasks) // (self.jobs * 4))
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                summaries = list(executor.map(translate_script, script_paths,
+                                              output_paths, cache_paths,
+                                              incremental, profile, unit_sizes,
+                                              builds, contexts, line_directives,
+                                              chunksize=chunk_size))
+
+        # Evicting once at the end avoids every worker rescanning the cache
+        if self.cache is not None:
+            self.cache.evict()
+
+        # Reports come back with the summaries since callbacks can't be sent
+        # to the workers
+        if self.profile_callback is not None:
+            for summary in summaries:
+                self.profile_callback(summary["profile"])
+
+        return summaries
@@ -18,3 +18,22 @@ class VariableNotFound(PyPlusException):
     Exception to indicate variable was not found in the current context
     """
     pass
+
+
+class NotConstant(PyPlusException):
+    """
+    Exception to indicate the value of an expression isn't known until the
+    code runs
+    """
+    pass
+
+
+class InvalidDaemonRequest(PyPlusException):
+    """
+    Exception to indicate a request sent to the translation daemon can't be
+    handled, carrying the JSON-RPC error code to answer with
+    """
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
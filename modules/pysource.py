@@ -0,0 +1,181 @@
+import array
+import io
+import mmap
+import os
+import tokenize
+
+
+class PySource():
+    """
+    Class to hold the contents of a python script. The script is read once
+    and every phase of a translation reads its lines from here, sliced out on
+    demand using a table of line offsets
+    """
+
+    # Scripts at least this many bytes are memory mapped unless told otherwise
+    mmap_threshold = 16 * 1024 * 1024
+
+    def __init__(self, data, source_file=None):
+        """
+        Constructs a PySource object
+
+        Parameters
+        ----------
+        data : bytes or mmap.mmap
+            The raw contents of the script
+        source_file : file object
+            The open file backing a memory mapped script, closed along with it
+        """
+        self.data = data
+
+        self.source_file = source_file
+
+        # Python scripts are utf-8 unless they declare otherwise
+        self.encoding = tokenize.detect_encoding(io.BytesIO(data[:1024]).readline)[0]
+
+        # Offset of the first character of every line. One extra offset marks
+        # where the line after the last one would start, so the end of line
+        # n is always the offset of line n + 1 less its newline
+        self.line_offsets = array.array("q", [0])
+        position = data.find(b"\n")
+        while position > -1:
+            self.line_offsets.append(position + 1)
+            position = data.find(b"\n", position + 1)
+
+        # A final line without a newline still counts as a line
+        if len(data) > self.line_offsets[-1]:
+            self.line_offsets.append(len(data) + 1)
+
+    @classmethod
+    def from_file(cls, path, use_mmap=None):
+        """
+        Reads a script from disk
+
+        Parameters
+        ----------
+        path : str
+            Path to the python script
+        use_mmap : bool
+            Whether to memory map the file instead of reading it, which avoids
+            holding a copy of very large scripts in memory. None decides based
+            on the size of the file
+
+        Returns
+        -------
+        PySource
+            The loaded script
+        """
+        source_file = open(path, "rb")
+        try:
+            if use_mmap is None:
+                use_mmap = os.fstat(source_file.fileno()).st_size >= cls.mmap_threshold
+
+            if use_mmap:
+                try:
+                    data = mmap.mmap(source_file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+                    return cls(data, source_file)
+                except ValueError:
+                    # Empty files can't be mapped, so they're just read
+                    pass
+
+            data = source_file.read()
+        except BaseException:
+            source_file.close()
+            raise
+
+        source_file.close()
+        return cls(data)
+
+    @classmethod
+    def from_text(cls, text):
+        """
+        Holds a script that is already in memory, so nothing is read from disk
+
+        Parameters
+        ----------
+        text : str or bytes
+            The script, either as text or as the raw contents of a file
+
+        Returns
+        -------
+        PySource
+            The loaded script
+        """
+        if isinstance(text, bytes):
+            return cls(text)
+
+        # The bytes have to decode back to the same text, so a script that
+        # declares another encoding is stored in that encoding
+        data = text.encode("utf-8")
+        encoding = tokenize.detect_encoding(io.BytesIO(data[:1024]).readline)[0]
+        if encoding not in ("utf-8", "utf-8-sig"):
+            data = text.encode(encoding)
+
+        return cls(data)
+
+    def __len__(self):
+        """
+        Gets the number of lines in the script
+
+        Returns
+        -------
+        int
+            The number of lines
+        """
+        return len(self.line_offsets) - 1
+
+    def __getitem__(self, index):
+        """
+        Gets a line, or a list of lines for a slice, without its line ending
+
+        Parameters
+        ----------
+        index : int or slice
+            Index of the line, counting from 0
+
+        Returns
+        -------
+        str or list of str
+            The requested lines
+        """
+        if index.__class__ is slice:
+            return [self[line_index] for line_index in range(*index.indices(len(self)))]
+
+        line_count = len(self.line_offsets) - 1
+        if index < 0:
+            index += line_count
+        if index < 0 or index >= line_count:
+            raise IndexError("line index out of range")
+
+        line = self.data[self.line_offsets[index]:self.line_offsets[index+1] - 1]
+        return line.decode(self.encoding).rstrip("\r")
+
+    def get_line_bytes(self, start_line, end_line):
+        """
+        Gets the raw bytes of a range of lines in a single slice
+
+        Parameters
+        ----------
+        start_line : int
+            First line number of the range, counting from 1
+        end_line : int
+            Last line number of the range, counting from 1
+
+        Returns
+        -------
+        bytes
+            The lines including their line endings
+        """
+        start_line = min(max(start_line, 1), len(self) + 1)
+        end_line = min(max(end_line, start_line - 1), len(self))
+        return self.data[self.line_offsets[start_line-1]:self.line_offsets[end_line]]
+
+    def close(self):
+        """
+        Releases the memory map and file backing the script, if any
+        """
+        if self.source_file is not None:
+            self.data.close()
+            self.source_file.close()
+            self.source_file = None
@@ -1,9 +1,15 @@
 import ast
+import hashlib
 from modules import cppfile as cfile
 from modules import cppfunction as cfun
 from modules import cppvariable as cvar
 from modules import cppcodeline as cline
 from modules import pyanalyzer
+from modules import outputwriter as ow
+from modules import pysource
+from modules import typesolver as ts
+from modules import translationprofiler as tprof
+from modules import translationcontext as tctx
 
 
 class PyTranslator():
@@ -12,7 +18,17 @@ class PyTranslator():
     to a usable C++ file
     """
 
-    def __init__(self, script_path, output_path):
+    # Part of the translation cache key. Bump this whenever a change to the
+    # translator alters its output so stale cache entries aren't reused
+    translator_version = "1.9"
+
+    # Size of the buffer used when streaming output files to disk
+    write_buffer_size = 1024 * 1024
+
+    def __init__(self, script_path, output_path, verbose=True, cache=None,
+                 incremental_state=None, use_mmap=None, profiler=None,
+                 source=None, context=None, unit_size=None, build=None,
+                 line_directives=False):
         """
         Constructor of a python to C++ translator. This will automatically
         create a main.cpp and main function for code
@@ -23,24 +39,132 @@ class PyTranslator():
             Path to the python file to be converted
         output_path : str
             Path to the directory where the output file should be written
+        verbose : bool
+            Whether to print where the output was written. Batch runs turn
+            this off so thousands of files don't flood the console
+        cache : TranslationCache
+            Cache to reuse previous translations from. None disables caching
+        incremental_state : IncrementalState
+            State of the previous run of this script, used to only analyze
+            the functions that changed. None analyzes the whole script
+        use_mmap : bool
+            Whether to memory map the script instead of reading it into
+            memory. None memory maps only very large scripts
+        profiler : TranslationProfiler
+            Records the time and allocations of each phase of the run and of
+            each node handler. None turns profiling off
+        source : PySource
+            The script, already loaded in memory. The script path is then only
+            used to name the script in reports. None reads the script path
+        context : TranslationContext
+            Tables and working state of this translation, such as the C++
+            type each python type is declared with. A context belongs to one
+            translation at a time. None uses a new context with the defaults
+        unit_size : int
+            Target number of code lines in each output .cpp file. The
+            functions are then split across several files sharing a .hpp
+            header so they compile in parallel. None writes one file
+        build : BuildGenerator
+            Generates a build description for the output files, such as a
+            CMakeLists.txt. None leaves building to the caller
+        line_directives : bool
+            Whether to put #line directives in the output so compiler
+            messages name the python lines the C++ came from
         """
 
         self.script_path = script_path
 
         self.output_path = output_path
 
+        self.verbose = verbose
+
+        self.cache = cache
+
+        # Names of the files written to the output path, relative to it.
+        # Files that already held the same text count too
+        self.written_files = []
+
+        # Names of the written files that already held the same text, so
+        # they were left untouched
+        self.unchanged_files = []
+
+        # Names of the files that couldn't be written
+        self.failed_files = []
+
+        # Names of the .cpp files holding the translated code, relative to
+        # the output path, leaving out any the build description added
+        self.unit_files = []
+
+        # Set when the output was copied from the cache, since there is no
+        # analysis to count TODO lines from in that case
+        self.cached_todo_count = None
+
+        self.incremental_state = incremental_state
+
+        self.use_mmap = use_mmap
+
+        self.profiler = profiler
+
+        self.source = source
+
+        self.unit_size = unit_size
+
+        self.build = build
+
+        self.line_directives = line_directives
+
+        # Keys of the functions reused from the previous run. Their types and
+        # comments were already applied when they were first translated
+        self.reused_functions = set()
+
+        if context is None:
+            context = tctx.TranslationContext()
+        self.context = context
+
+        self.context.output_files = self.create_output_files(self.context.types,
+                                                             self.context.fast_io)
+
+    @property
+    def output_files(self):
+        """
+        list of CPPFile : The files being translated to, held by the context
+        """
+        return self.context.output_files
+
+    @staticmethod
+    def create_output_files(types=None, fast_io=False):
+        """
+        Creates the list of output files with the default main.cpp and its
+        main function
+
+        Parameters
+        ----------
+        types : dict of {str: str}
+            Python type names mapped to the C++ types the files are written
+            with. None uses the default types
+        fast_io : bool
+            Whether main should turn off the syncing of the C++ streams with
+            C's stdio when the output uses iostream
+
+        Returns
+        -------
+        list of CPPFile
+            The output files, ready for analysis
+        """
         # Configuring Default Main Function code
-        self.output_files = [cfile.CPPFile("main")]
-        main_params = {"argc": cvar.CPPVariable("argc", -1, ["int"]),
-                       "argv": cvar.CPPVariable("argv", -1, ["char **"])}
+        output_files = [cfile.CPPFile("main", types, fast_io)]
+        main_params = {"argc": cvar.CPPVariable("argc", -1, ts.TypeVariable("int")),
+                       "argv": cvar.CPPVariable("argv", -1, ts.TypeVariable("char **"))}
 
         # We name the function 0 because that is an invalid name in python
         # Otherwise theres a chance theres a function named main already
         # At file output, this will be changed to main
         main_function = cfun.CPPFunction("0", -1, -1, main_params)
-        main_function.return_type[0] = "int"
+        main_function.return_type = ts.TypeVariable("int")
+
+        output_files[0].functions["0"] = main_function
 
-        self.output_files[0].functions["0"] = main_function
+        return output_files
 
     def write_cpp_files(self):
         """
@@ -48,17 +172,72 @@ class PyTranslator():
         of the code into usable strings and writes them to the appropriate
         output file
         """
+        for filename, pieces in self.iter_output_files():
+            try:
+                # The text is streamed and compared with the file as it is
+                # formatted, so the whole text never has to be held in memory
+                # and a file that comes out the same keeps its modification
+                # time, so builds don't compile it again
+                if not ow.write_text_if_changed(self.output_path + filename,
+                                                pieces, self.write_buffer_size):
+                    self.unchanged_files.append(filename)
+                self.written_files.append(filename)
+            except IOError:
+                self.failed_files.append(filename)
+                print("Error writing file: " + self.output_path + filename)
+        if self.verbose:
+            print("Output written to " + self.output_path)
+
+    def iter_output_files(self):
+        """
+        Generates every file to write, splitting each C++ file into several
+        translation units when a unit size is set. The build description
+        comes last so it can list every other file
+
+        Yields
+        ------
+        str
+            Name of the next file, relative to the output path
+        iterable of str
+            The pieces of its text
+        """
         # Currently only one file, but this forms a basis to allow for multi-
         # file outputs from classes in C++
+        line_file = self.script_path if self.line_directives else None
+        self.unit_files = []
         for file in self.output_files:
-            try:
-                f = open(self.output_path + file.filename + ".cpp", "w")
-                f.write(file.get_formatted_file_text())
-                f.close()
-            except IOError:
-                print("Error writing file: " + self.output_path
-                      + file.filename + ".cpp")
-        print("Output written to " + self.output_path)
+            for filename, pieces in file.iter_output_files(self.unit_size, line_file):
+                if filename.endswith(".cpp"):
+                    self.unit_files.append(filename)
+                yield filename, pieces
+
+        if self.build is not None:
+            includes = [include for file in self.output_files
+                        for include in file.includes]
+            yield from self.build.iter_build_files(self.build.get_target_name(self.script_path),
+                                                   list(self.unit_files), includes)
+
+    def get_todo_count(self):
+        """
+        Counts the lines of code that couldn't be translated and were left
+        for a manual port
+
+        Returns
+        -------
+        int
+            Number of code lines that were marked with a TODO reason
+        """
+        if self.cached_todo_count is not None:
+            return self.cached_todo_count
+
+        todo_count = 0
+        for file in self.output_files:
+            for cfunction in file.functions.values():
+                for line in cfunction.lines.values():
+                    if line.pre_comment_str != "":
+                        todo_count += 1
+
+        return todo_count
 
     def ingest_comments(self, raw_lines):
         """
@@ -68,67 +247,74 @@ class PyTranslator():
 
         Parameters
         ----------
-        raw_lines : list of str
-            List of strings containing the original python script line by line
+        raw_lines : PySource
+            The original python script, read line by line
         """
-        # First get a dictionary with every existing line of code. That way
-        # we know whether to look for an inline comment or a full line comment
+        line_count = len(raw_lines)
+
         for file in self.output_files:
-            all_lines_dict = {}
+            main_function = file.functions["0"]
+
+            # Index every line of the script by the code line on it and the
+            # function it belongs to. Functions don't overlap, so filling
+            # these takes one step per line and lets the pass below look up
+            # each line directly instead of searching every function
+            code_lines = [None] * (line_count + 1)
+            line_owners = [main_function] * (line_count + 1)
             for cfunction in file.functions.values():
-                # Source: https://stackoverflow.com/questions/38987/how-do-i
-                # -merge-two-dictionaries-in-a-single-expression-in-python
-                # -taking-union-o
-                all_lines_dict = {**all_lines_dict, **cfunction.lines}
-
-            # Going through all lines in the script we are parsing
-            for index in range(len(raw_lines)):
-                # Line numbers count from 1 while list starts from 0, so we need to offset by 1
-                if (index+1) in all_lines_dict:
+                for line_num, code_line in cfunction.lines.items():
+                    code_lines[line_num] = code_line
+                    line_owners[line_num] = cfunction
+
+                # Comments belong to a function when they are between its
+                # declaration and its last line
+                if cfunction is not main_function:
+                    for line_num in range(cfunction.lineno + 1,
+                                          min(cfunction.end_lineno, line_count + 1)):
+                        line_owners[line_num] = cfunction
+
+            # Rebuilding each function's lines while walking the script in
+            # order keeps them in line order without sorting afterwards
+            ordered_lines = {id(cfunction): {} for cfunction in file.functions.values()}
+
+            # Line numbers count from 1 while list starts from 0
+            for line_num in range(1, line_count + 1):
+                line = raw_lines[line_num - 1]
+                code_line = code_lines[line_num]
+                owner = line_owners[line_num]
+
+                if code_line is not None:
                     # Looking for inline comment
-                    code_line = all_lines_dict[index+1]
-                    comment = raw_lines[index][code_line.end_char_index:].lstrip()
+                    comment = line[code_line.end_char_index:].lstrip()
 
                     # Verify there is a comment present
                     if len(comment) > 0 and comment[0] == "#":
                         # Trim off the comment symbol as it will be changed
                         # to the C++ style comment
-                        all_lines_dict[index+1].comment_str = comment[1:].lstrip()
-
-                else:
-                    # Determine which function the line belongs to
-                    for function in file.functions.values():
-                        if function.lineno < index + 1 < function.end_lineno:
-                            line = raw_lines[index]
-                            comment = line.lstrip()
-                            if len(comment) > 0 and comment[0] == "#":
-                                # C++ uses '//' to indicate comments instead of '#'
-                                comment = line.replace("#", "//", 1)
-                                function.lines[index + 1] = cline.CPPCodeLine(index + 1,
-                                                                              index + 1,
-                                                                              len(line),
-                                                                              0,
-                                                                              comment)
-                                break
-                    else:
-                        line = raw_lines[index]
-                        comment = line.lstrip()
-                        if len(comment) > 0 and comment[0] == "#":
-                            # We add an extra indent on code not in a function
-                            # since it will go into a function in C++
-                            comment = cline.CPPCodeLine.tab_delimiter + line.replace("#", "//", 1)
-                            file.functions["0"].lines[index + 1] = cline.CPPCodeLine(index + 1,
-                                                                                     index + 1,
-                                                                                     len(line),
-                                                                                     0,
-                                                                                     comment)
-
-        # Sort function line dictionaries so output is in proper order
-        for function in file.functions.values():
-            sorted_lines = {}
-            for line in sorted(function.lines.keys()):
-                sorted_lines[line] = function.lines[line]
-            function.lines = sorted_lines
+                        code_line.comment_str = comment[1:].lstrip()
+
+                    ordered_lines[id(owner)][line_num] = code_line
+                    continue
+
+                comment = line.lstrip()
+                if len(comment) == 0 or comment[0] != "#":
+                    continue
+
+                # C++ uses '//' to indicate comments instead of '#'
+                comment = line.replace("#", "//", 1)
+                if owner is main_function:
+                    # We add an extra indent on code not in a function
+                    # since it will go into a function in C++
+                    comment = cline.CPPCodeLine.tab_delimiter + comment
+
+                ordered_lines[id(owner)][line_num] = cline.CPPCodeLine(line_num,
+                                                                       line_num,
+                                                                       len(line),
+                                                                       0,
+                                                                       comment)
+
+            for cfunction in file.functions.values():
+                cfunction.lines = ordered_lines[id(cfunction)]
 
     def apply_variable_types(self):
         """
@@ -136,22 +322,101 @@ class PyTranslator():
         on declaration
         """
         for file in self.output_files:
-            for cfunction in file.functions.values():
+            for function_key, cfunction in file.functions.items():
+                # Need to include string library for strings in C++,
+                # including ones held in containers
+                signature_types = [parameter.py_var_type
+                                   for parameter in cfunction.parameters.values()]
+                signature_types.append(cfunction.return_type)
+                if any(py_var_type.holds_type("str") for py_var_type in signature_types):
+                    file.add_include_file("string")
+
                 for variable in cfunction.variables.values():
-                    # Need to include string library for strings in C++
-                    if variable.py_var_type[0] == "str":
+                    if variable.py_var_type.holds_type("str"):
                         file.add_include_file("string")
 
+                    # Reused functions already have their types applied
+                    if function_key in self.reused_functions:
+                        continue
+
                     # Prepend line with variable type to apply type
                     cfunction.lines[variable.line_num].code_str \
-                        = cvar.CPPVariable.types[variable.py_var_type[0]] \
+                        = variable.py_var_type.get_cpp_type(self.context.types) \
                         + cfunction.lines[variable.line_num].code_str
 
-    def run(self):
+    def get_cache_key(self, source):
         """
-        Entry point for parsing a python script. This will read the script
-        line by line until it reaches the end, then it will call
-        write_cpp_files to export the code into a cpp file
+        Generates the key identifying a translation in the cache. Anything
+        that can change the output for the same script is part of the key
+
+        Parameters
+        ----------
+        source : bytes
+            The contents of the python script
+
+        Returns
+        -------
+        str
+            Hex digest identifying the translation
+        """
+        key_hash = hashlib.sha256(source)
+        # The build description names its target after the script, and the
+        # #line directives name the script itself, so scripts with the same
+        # text only share an entry when neither is written
+        settings = (self.translator_version,
+                    self.context.get_settings(),
+                    cline.CPPCodeLine.tab_delimiter,
+                    self.unit_size,
+                    None if self.build is None else (self.build.get_settings(),
+                                                     self.build.get_target_name(self.script_path)),
+                    self.script_path if self.line_directives else None)
+        key_hash.update(repr(settings).encode())
+
+        return key_hash.hexdigest()
+
+    def analyze_incremental(self, tree, raw_lines):
+        """
+        Analyzes the script, reusing the functions the incremental state found
+        to be unchanged since the previous run. If the call sites that were
+        analyzed again change the types of a reused function, that function
+        and its callers are analyzed again as well
+
+        Parameters
+        ----------
+        tree : list of ast nodes
+            The module body from ast.parse
+        raw_lines : PySource
+            The original python script, read line by line
+        """
+        state = self.incremental_state
+        with tprof.profile_phase(self.profiler, "incremental_diff"):
+            reuse = state.diff(tree, raw_lines)
+
+        while True:
+            output_files = self.create_output_files(self.context.types,
+                                                    self.context.fast_io)
+            analyzer = pyanalyzer.PyAnalyzer(output_files, raw_lines,
+                                             self.profiler, self.context)
+            analyzer.analyze(tree, 0, "0", 1, reuse,
+                             state.get_settled_functions(reuse))
+
+            stale = state.find_stale_functions(self.output_files[0].functions,
+                                               reuse)
+            if len(stale) == 0:
+                break
+            state.invalidate(reuse, stale)
+
+        self.reused_functions = set(reuse.keys())
+
+    def analyze_source(self, source):
+        """
+        Parses and analyzes a script, leaving the finished translation in the
+        output files
+
+        Parameters
+        ----------
+        source : PySource
+            The python script to translate
         """
 
         # Index for main file and key for main function
@@ -162,14 +427,123 @@ class PyTranslator():
         indent = 1
 
         # Source: https://www.mattlayman.com/blog/2018/decipher-python-ast/
-        with open(self.script_path, "r") as py_source:
-            tree = ast.parse(py_source.read())
-            py_source.seek(0)
-            all_lines = py_source.read().splitlines()
+        with tprof.profile_phase(self.profiler, "parse"):
+            if self.incremental_state is None:
+                tree = ast.parse(source.data)
+            else:
+                tree = self.incremental_state.parse(source)
+
+        if self.incremental_state is None:
+            analyzer = pyanalyzer.PyAnalyzer(self.output_files, source,
+                                             self.profiler, self.context)
+            analyzer.analyze(tree.body, file_index, function_key, indent)
+        else:
+            self.analyze_incremental(tree.body, source)
+
+        with tprof.profile_phase(self.profiler, "apply_variable_types"):
+            self.apply_variable_types()
+        with tprof.profile_phase(self.profiler, "ingest_comments"):
+            self.ingest_comments(source)
+
+    def get_output_text(self):
+        """
+        Formats every output file of a finished translation
+
+        Returns
+        -------
+        dict of {str: str}
+            The text of each file, keyed by its file name
+        """
+        return {filename: "".join(pieces)
+                for filename, pieces in self.iter_output_files()}
+
+    def load_source(self):
+        """
+        Gets the script to translate, reading it from the script path unless
+        it was already given
+
+        Returns
+        -------
+        PySource
+            The python script
+        """
+        with tprof.profile_phase(self.profiler, "read"):
+            if self.source is not None:
+                return self.source
+
+            return pysource.PySource.from_file(self.script_path, self.use_mmap)
+
+    def translate(self):
+        """
+        Translates the script without writing anything to the output path,
+        for callers that want the C++ text itself. The translation cache isn't
+        used since it stores files rather than text
+
+        Returns
+        -------
+        dict of {str: str}
+            The text of each output file, keyed by its file name
+        """
+        source = self.load_source()
+        try:
+            self.analyze_source(source)
+        finally:
+            source.close()
+
+        with tprof.profile_phase(self.profiler, "format"):
+            output_text = self.get_output_text()
+
+        if self.incremental_state is not None:
+            self.incremental_state.update(self.output_files[0].functions)
+
+        if self.profiler is not None:
+            self.profiler.finish(self.script_path)
+
+        return output_text
+
+    def run(self):
+        """
+        Entry point for parsing a python script. This will read the script
+        line by line until it reaches the end, then it will call
+        write_cpp_files to export the code into a cpp file
+        """
+
+        # The script is read once and shared by every phase below
+        source = self.load_source()
+        try:
+            if self.cache is not None:
+                with tprof.profile_phase(self.profiler, "cache_load"):
+                    cache_key = self.get_cache_key(source.data)
+                    summary = self.cache.load(cache_key, self.output_path)
+                if summary is not None:
+                    self.written_files = summary["files"]
+                    self.unit_files = summary["units"]
+                    self.cached_todo_count = summary["todo_count"]
+                    if self.verbose:
+                        print("Output copied from cache to " + self.output_path)
+                    if self.profiler is not None:
+                        self.profiler.finish(self.script_path)
+                    return
+
+            self.analyze_source(source)
+
+        finally:
+            source.close()
+
+        with tprof.profile_phase(self.profiler, "write_cpp_files"):
+            self.write_cpp_files()
+
+        if self.incremental_state is not None:
+            self.incremental_state.update(self.output_files[0].functions)
 
-        analyzer = pyanalyzer.PyAnalyzer(self.output_files, all_lines)
-        analyzer.analyze(tree.body, file_index, function_key, indent)
+        # Only complete outputs are cached
+        if self.cache is not None \
+                and len(self.failed_files) == 0:
+            with tprof.profile_phase(self.profiler, "cache_store"):
+                self.cache.store(cache_key, self.output_path,
+                                 {"files": self.written_files,
+                                  "units": self.unit_files,
+                                  "todo_count": self.get_todo_count()})
 
-        self.apply_variable_types()
-        self.ingest_comments(all_lines)
-        self.write_cpp_files()
+        if self.profiler is not None:
+            self.profiler.finish(self.script_path)
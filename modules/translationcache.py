@@ -0,0 +1,137 @@
+import json
+import os
+import shutil
+import tempfile
+from modules import outputwriter as ow
+
+
+class TranslationCache():
+    """
+    On disk cache of translated output. Each entry is a directory named after
+    a hash of the script and the translator settings, holding copies of the
+    files that were written for it
+    """
+
+    # Name of the file in each entry that stores information about the run
+    summary_filename = "summary.json"
+
+    def __init__(self, cache_path, max_size=512 * 1024 * 1024):
+        """
+        Constructs a TranslationCache object
+
+        Parameters
+        ----------
+        cache_path : str
+            Path to the directory that holds the cache entries
+        max_size : int
+            Number of bytes the cache may hold before the least recently used
+            entries are evicted
+        """
+        self.cache_path = cache_path
+
+        self.max_size = max_size
+
+    def load(self, key, output_path):
+        """
+        Copies the files of a cached translation into the output directory
+
+        Parameters
+        ----------
+        key : str
+            Hash identifying the translation
+        output_path : str
+            Path to the directory the files should be copied to
+
+        Returns
+        -------
+        dict or None
+            The summary stored with the entry, containing the names of the
+            files that were copied and the TODO count, or None on a miss
+        """
+        entry_path = os.path.join(self.cache_path, key)
+        try:
+            with open(os.path.join(entry_path, self.summary_filename), "r") as f:
+                summary = json.load(f)
+
+            # Files that already hold the cached text are left untouched
+            for filename in summary["files"]:
+                ow.copy_file_if_changed(os.path.join(entry_path, filename),
+                                        os.path.join(output_path, filename))
+
+            # The modification time of an entry tracks when it was last used
+            # so eviction can drop the least recently used entries first
+            os.utime(entry_path)
+
+        except (OSError, ValueError, KeyError):
+            # Missing entries, or ones removed by an eviction in another
+            # process, are treated as a miss
+            return None
+
+        return summary
+
+    def store(self, key, output_path, summary):
+        """
+        Copies freshly written files into a new cache entry
+
+        Parameters
+        ----------
+        key : str
+            Hash identifying the translation
+        output_path : str
+            Path to the directory the files were written to
+        summary : dict
+            Information about the run. The "files" key must list the names
+            of the files to cache
+        """
+        entry_path = os.path.join(self.cache_path, key)
+        if os.path.isdir(entry_path):
+            return
+
+        temp_path = None
+        try:
+            os.makedirs(self.cache_path, exist_ok=True)
+
+            # Entries are built in a temporary directory and renamed into
+            # place so other processes never see a partial entry
+            temp_path = tempfile.mkdtemp(dir=self.cache_path, prefix=".tmp")
+            for filename in summary["files"]:
+                shutil.copyfile(os.path.join(output_path, filename),
+                                os.path.join(temp_path, filename))
+            with open(os.path.join(temp_path, self.summary_filename), "w") as f:
+                json.dump(summary, f)
+
+            os.rename(temp_path, entry_path)
+
+        except OSError:
+            # Another process stored the same entry first, or the cache isn't
+            # writable. Either way the translation itself already succeeded
+            if temp_path is not None:
+                shutil.rmtree(temp_path, ignore_errors=True)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits within
+        its size limit
+        """
+        entries = []
+        total_size = 0
+        try:
+            for entry in os.scandir(self.cache_path):
+                if not entry.is_dir() or entry.name.startswith(".tmp"):
+                    continue
+                size = 0
+                for cached_file in os.scandir(entry.path):
+                    size += cached_file.stat().st_size
+                entries.append((entry.stat().st_mtime, size, entry.path))
+                total_size += size
+
+        except OSError:
+            return
+
+        # Oldest entries first
+        entries.sort()
+        for mtime, size, entry_path in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_size -= size
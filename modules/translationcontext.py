@@ -0,0 +1,215 @@
+from modules import portedfunctions as pf
+
+
+class TranslationContext():
+    """
+    Holds the settings and working state of a single translation. The type,
+    operator and ported function tables start as copies of the defaults
+    below, so a translation can change its own tables and any number of
+    translations can run at once in one process without sharing anything
+    they change
+    """
+
+    # Python types translated to C++ types. Using redundant mapping to allow
+    # for changes to mapped type. The {item} and {key} in a container are
+    # replaced by the types of its items and keys
+    types = {
+             "int": "int ", "float": "double ", "str": "std::string ",
+             "bool": "bool ", "None": "NULL", "char **": "char **",
+             "void": "void ", "auto": "auto ", "NoneType": "void ",
+             "list": "std::vector<{item}> ",
+             "dict": "std::unordered_map<{key}, {item}> ",
+             "set": "std::unordered_set<{item}> "
+             }
+
+    # Types holding items, which are passed to functions by reference since
+    # python shares them rather than copying them. A bitset is a set of small
+    # integers, see small_set_size
+    container_types = ("list", "dict", "set", "bitset")
+
+    # Include files holding the C++ containers python containers become
+    container_includes = {"list": "vector", "dict": "unordered_map",
+                          "set": "unordered_set"}
+
+    # Methods of containers translated to C++ methods, stored as
+    # {Container Type: {Python Method: C++ Method}}
+    container_methods = {"list": {"append": "push_back"},
+                         "set": {"add": "insert", "discard": "erase"},
+                         "bitset": {"add": "set", "discard": "reset"}}
+
+    # Largest size a set of small integers can be turned into a bitset with,
+    # so its bits fit in one unsigned long long
+    max_small_set_size = 64
+
+    # Python uses capital letters while C++ uses lowercase
+    bool_map = {"True": "true", "False": "false"}
+
+    # Helps evaluate variable types when performing operations on different
+    # types. Types with a smaller value can hold the ones with larger values
+    type_precedence_dict = {"str": 0, "float": 1, "int": 2, "bool": 3,
+                            "auto": 8, "None": 9, "void": 9}
+
+    # Python operators translated to C++ operators
+    operator_map = {"Add": "+", "Sub": "-", "Mult": " * ", "Div": "/",
+                    "Mod": " % ", "LShift": " << ", "RShift": " >> ",
+                    "BitOr": " | ", "BitAnd": " & ", "BitXor": " ^ ",
+                    "FloorDiv": "/", "Pow": "Pow", "Not": "!",
+                    "Invert": "~", "UAdd": "+", "USub": "-", "And": " && ",
+                    "Or": " || "
+                    }
+
+    # Python Comparison operators translated to C++ operators
+    # We aren't able to do in/is checks easily, so they are excluded from the
+    # mapping
+    comparison_map = {"Eq": " == ", "NotEq": " != ", "Lt": " < ",
+                      "LtE": " <= ", "Gt": " > ", "GtE": " >= "
+                      }
+
+    # Types C++ converts between implicitly, so a variable can be assigned any
+    # of them and just takes the widest
+    numeric_types = ("bool", "int", "float")
+
+    # Functions we have a special conversion from python to C++ for, stored
+    # as {Function Name: (include file, return type, translation function)}.
+    # The translation function is called with the arguments as strings and a
+    # dictionary of the keyword arguments as strings. None means no include
+    # file is needed
+    ported_functions = {"print": ("iostream", "None", pf.print_translation),
+                        "sqrt": ("math.h", "float", pf.sqrt_translation),
+                        "len": (None, "int", pf.len_translation)}
+
+    def __init__(self, types=None, bool_map=None, type_precedence_dict=None,
+                 operator_map=None, comparison_map=None, numeric_types=None,
+                 ported_functions=None, fast_io=False, container_methods=None,
+                 small_set_size=None):
+        """
+        Constructs a TranslationContext object. Each table is a copy of its
+        default with the given entries added or replaced
+
+        Parameters
+        ----------
+        types : dict of {str: str}
+            Python type names mapped to the C++ type to declare them with
+        bool_map : dict of {str: str}
+            Python boolean literals mapped to C++ ones
+        type_precedence_dict : dict of {str: int}
+            Type names mapped to their precedence
+        operator_map : dict of {str: str}
+            ast operator class names mapped to C++ operators
+        comparison_map : dict of {str: str}
+            ast comparison class names mapped to C++ operators
+        numeric_types : tuple of str
+            Replaces the types C++ converts between implicitly
+        ported_functions : dict of {str: tuple}
+            Python function names mapped to the include file, return type
+            and translation function of their C++ version
+        fast_io : bool
+            Whether main should turn off the syncing of the C++ streams with
+            C's stdio when the output uses iostream, which makes printing
+            much faster as long as the program doesn't also use stdio
+        container_methods : dict of {str: dict of {str: str}}
+            Container types mapped to the python methods to translate and
+            the C++ methods they become
+        small_set_size : int
+            Sets that only ever hold integers from 0 up to but not including
+            this size become a std::bitset of this size, which looks items up
+            by indexing its bits instead of hashing them. None keeps every
+            set a std::unordered_set
+
+        Raises
+        ------
+        ValueError
+            If the small set size is outside of 1 to 64
+        """
+        self.types = self.merge_table(TranslationContext.types, types)
+
+        self.bool_map = self.merge_table(TranslationContext.bool_map, bool_map)
+
+        self.type_precedence_dict = self.merge_table(TranslationContext.type_precedence_dict,
+                                                     type_precedence_dict)
+
+        self.operator_map = self.merge_table(TranslationContext.operator_map,
+                                             operator_map)
+
+        self.comparison_map = self.merge_table(TranslationContext.comparison_map,
+                                               comparison_map)
+
+        if numeric_types is None:
+            numeric_types = TranslationContext.numeric_types
+        self.numeric_types = tuple(numeric_types)
+
+        self.ported_functions = self.merge_table(TranslationContext.ported_functions,
+                                                 ported_functions)
+
+        self.fast_io = fast_io
+
+        self.container_methods = {container: dict(methods) for container, methods
+                                  in self.merge_table(TranslationContext.container_methods,
+                                                      container_methods).items()}
+
+        if small_set_size is not None:
+            if not 1 <= small_set_size <= self.max_small_set_size:
+                raise ValueError("Small set size must be from 1 to "
+                                 + str(self.max_small_set_size))
+            self.types["bitset"] = "std::bitset<" + str(small_set_size) + "> "
+        self.small_set_size = small_set_size
+
+        # The files being translated to, set up by the translator
+        self.output_files = []
+
+        # Type solver of the analysis in progress, set up by the analyzer
+        self.solver = None
+
+    @staticmethod
+    def merge_table(default, changes):
+        """
+        Copies a default table and applies changes to the copy
+
+        Parameters
+        ----------
+        default : dict
+            The default table, which is left as it is
+        changes : dict
+            Entries to add or replace, or None for no changes
+
+        Returns
+        -------
+        dict
+            The new table
+        """
+        table = dict(default)
+        if changes is not None:
+            table.update(changes)
+
+        return table
+
+    def get_settings(self):
+        """
+        Gets every setting that can change the output of a translation, for
+        use in cache keys. Ported functions are named by where their
+        translation function is defined, so the settings are the same in
+        every process
+
+        Returns
+        -------
+        tuple
+            The settings, with every table in a fixed order
+        """
+        ported_functions = sorted((name, include, return_type,
+                                   translation.__module__ + "." + translation.__qualname__)
+                                  for name, (include, return_type, translation)
+                                  in self.ported_functions.items())
+
+        container_methods = sorted((container, sorted(methods.items()))
+                                   for container, methods in self.container_methods.items())
+
+        return (sorted(self.types.items()),
+                sorted(self.bool_map.items()),
+                sorted(self.operator_map.items()),
+                sorted(self.comparison_map.items()),
+                sorted(self.type_precedence_dict.items()),
+                self.numeric_types,
+                ported_functions,
+                self.fast_io,
+                container_methods,
+                self.small_set_size)
@@ -0,0 +1,447 @@
+import hashlib
+import json
+import os
+import socketserver
+import stat
+import time
+from modules import incrementalstate
+from modules import pyplusexceptions as ppex
+from modules import pysource
+from modules import pytranslator
+
+
+class TranslationDaemon():
+    """
+    Keeps the translator loaded between requests so editors and build tools
+    can translate a script without starting a new process each time. Requests
+    are JSON-RPC 2.0 objects, one per line, read from a stream or a Unix
+    socket. The analysis of every script is kept warm in memory, so a request
+    after a small edit only analyzes the functions that changed
+    """
+
+    # JSON-RPC 2.0 error codes
+    parse_error = -32700
+    invalid_request = -32600
+    method_not_found = -32601
+    invalid_params = -32602
+    translation_failed = -32000
+
+    def __init__(self, unit_size=None, build=None, context=None):
+        """
+        Constructs a TranslationDaemon object
+
+        Parameters
+        ----------
+        unit_size : int
+            Target number of code lines in each output .cpp file. None writes
+            a single file per script
+        build : BuildGenerator
+            Generates a build description for each script. None leaves
+            building to the caller
+        context : TranslationContext
+            Tables to translate every script with. A request is translated
+            at a time, so they take turns with it. None uses the defaults
+        """
+        self.unit_size = unit_size
+
+        self.build = build
+
+        self.context = context
+
+        # Analysis of the last run of each script, stored as a dictionary of
+        # {Script Path: IncrementalState}
+        self.states = {}
+
+        # Last result of each request, stored as a dictionary of
+        # {(Script Path, Output Path, Return Text): (source digest, result,
+        # output digests)} so a script that hasn't changed isn't even parsed
+        # again. The output digests are the hashes of the files written, so
+        # files that were deleted or edited since are written again
+        self.results = {}
+
+        # Settings key of the incremental states, the same for every script
+        self.settings_key = None
+
+        # Cleared by the shutdown method to stop serving
+        self.running = True
+
+        self.methods = {"translate": self.translate,
+                        "forget": self.forget,
+                        "shutdown": self.shutdown}
+
+    @staticmethod
+    def get_param(params, name, param_type, default=None, required=False):
+        """
+        Gets a parameter of a request, checking its type
+
+        Parameters
+        ----------
+        params : dict
+            The parameters of the request
+        name : str
+            Name of the parameter
+        param_type : type
+            Type the parameter must have if it is given
+        default : object
+            Value to use if the parameter isn't given
+        required : bool
+            Whether the parameter must be given
+
+        Returns
+        -------
+        object
+            The value of the parameter
+        """
+        if name not in params or params[name] is None:
+            if required:
+                raise ppex.InvalidDaemonRequest(TranslationDaemon.invalid_params,
+                                                "Missing parameter: " + name)
+            return default
+
+        if not isinstance(params[name], param_type):
+            raise ppex.InvalidDaemonRequest(TranslationDaemon.invalid_params,
+                                            "Invalid parameter: " + name)
+
+        return params[name]
+
+    def get_state(self, script_path, translator):
+        """
+        Gets the warm incremental state of a script, creating it on the first
+        request for that script
+
+        Parameters
+        ----------
+        script_path : str
+            Absolute path to the script
+        translator : PyTranslator
+            The translator the state will be used with
+
+        Returns
+        -------
+        IncrementalState
+            The state of the script
+        """
+        if self.settings_key is None:
+            self.settings_key = translator.get_cache_key(b"")
+
+        state = self.states.get(script_path)
+        if state is None:
+            state = self.states[script_path] \
+                = incrementalstate.IncrementalState(self.settings_key)
+
+        return state
+
+    @staticmethod
+    def get_output_digests(output_path, files):
+        """
+        Hashes the files written for a script
+
+        Parameters
+        ----------
+        output_path : str
+            Directory the files were written to, or None if nothing was
+            written
+        files : list of str
+            Names of the written files, relative to the output path
+
+        Returns
+        -------
+        dict of {str: str}
+            Hash of each file, or None if one of them can't be read
+        """
+        if output_path is None:
+            return {}
+
+        digests = {}
+        for filename in files:
+            try:
+                with open(os.path.join(output_path, filename), "rb") as f:
+                    digests[filename] = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                return None
+
+        return digests
+
+    def translate(self, params):
+        """
+        Translates a script, either returning the C++ text or writing it to
+        an output directory
+
+        Parameters
+        ----------
+        params : dict
+            script_path is the python file to translate. source is the text
+            of the script, such as an unsaved editor buffer, or None to read
+            the script path. output_path is the directory to write to, or None
+            to only return the text. return_text is whether to return the text
+            of the files, which defaults to true when nothing is written
+
+        Returns
+        -------
+        dict
+            The files as {file name: text} when returning text, or the list
+            of written file names otherwise, along with the number of TODO
+            lines, the functions reused from the previous request and the
+            seconds the translation took
+        """
+        start = time.perf_counter()
+        script_path = os.path.abspath(self.get_param(params, "script_path", str,
+                                                     required=True))
+        text = self.get_param(params, "source", str)
+        output_path = self.get_param(params, "output_path", str)
+        return_text = self.get_param(params, "return_text", bool,
+                                     default=output_path is None)
+
+        # The script is read once and the translator is given what was read,
+        # so an edit made while translating can't be cached under the digest
+        # of the text before it. It is read into memory since the warm state
+        # reparses only the statements that changed
+        if text is None:
+            source = pysource.PySource.from_file(script_path, use_mmap=False)
+        else:
+            source = pysource.PySource.from_text(text)
+        digest = hashlib.sha256(source.data).hexdigest()
+
+        result_key = (script_path, output_path, return_text)
+        previous = self.results.get(result_key)
+        if previous is not None and previous[0] == digest \
+                and self.get_output_digests(output_path, previous[2]) == previous[2]:
+            result = dict(previous[1])
+            result["seconds"] = time.perf_counter() - start
+            return result
+
+        if output_path is not None:
+            os.makedirs(output_path, exist_ok=True)
+            translator = pytranslator.PyTranslator(script_path,
+                                                   os.path.join(output_path, ""),
+                                                   verbose=False, source=source,
+                                                   context=self.context,
+                                                   unit_size=self.unit_size,
+                                                   build=self.build)
+        else:
+            translator = pytranslator.PyTranslator(script_path, "", verbose=False,
+                                                   source=source, context=self.context,
+                                                   unit_size=self.unit_size,
+                                                   build=self.build)
+        translator.incremental_state = self.get_state(script_path, translator)
+
+        output_digests = {}
+        try:
+            if output_path is None:
+                files = translator.translate()
+                if not return_text:
+                    files = list(files.keys())
+            else:
+                translator.run()
+                files = list(translator.written_files)
+                output_digests = self.get_output_digests(output_path, files)
+                if return_text:
+                    files = translator.get_output_text()
+        except BaseException:
+            # A failed run can leave the reused functions half updated
+            self.forget({"script_path": script_path})
+            raise
+
+        result = {"files": files,
+                  "todo_count": translator.get_todo_count(),
+                  "reused_functions": sorted(translator.reused_functions)}
+        # Files that failed to write are never cached
+        if output_digests is not None and len(translator.failed_files) == 0:
+            self.results[result_key] = (digest, result, output_digests)
+
+        result = dict(result)
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def forget(self, params):
+        """
+        Drops the warm state of a script, or of every script, so the next
+        request translates it from scratch
+
+        Parameters
+        ----------
+        params : dict
+            script_path is the script to forget, or None for all of them
+
+        Returns
+        -------
+        int
+            Number of scripts forgotten
+        """
+        script_path = self.get_param(params, "script_path", str)
+        if script_path is None:
+            forgotten = len(self.states)
+            self.states = {}
+            self.results = {}
+            return forgotten
+
+        script_path = os.path.abspath(script_path)
+        self.results = {key: value for key, value in self.results.items()
+                        if key[0] != script_path}
+        return 0 if self.states.pop(script_path, None) is None else 1
+
+    def shutdown(self, params):
+        """
+        Stops the daemon once the current request has been answered
+
+        Parameters
+        ----------
+        params : dict
+            Not used
+
+        Returns
+        -------
+        bool
+            Always True
+        """
+        self.running = False
+        return True
+
+    def handle_request(self, request):
+        """
+        Runs one JSON-RPC request
+
+        Parameters
+        ----------
+        request : object
+            The decoded request
+
+        Returns
+        -------
+        dict
+            The response, or None if the request was a notification
+        """
+        request_id = None
+        notification = False
+        try:
+            if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" \
+                    or not isinstance(request.get("method"), str):
+                raise ppex.InvalidDaemonRequest(self.invalid_request,
+                                                "Invalid request")
+            request_id = request.get("id")
+            notification = "id" not in request
+
+            method = self.methods.get(request["method"])
+            if method is None:
+                raise ppex.InvalidDaemonRequest(self.method_not_found,
+                                                "Method not found: " + request["method"])
+
+            params = request.get("params", {})
+            if not isinstance(params, dict):
+                raise ppex.InvalidDaemonRequest(self.invalid_params,
+                                                "Parameters must be an object")
+
+            response = {"jsonrpc": "2.0", "id": request_id,
+                        "result": method(params)}
+
+        except ppex.InvalidDaemonRequest as ex:
+            response = {"jsonrpc": "2.0", "id": request_id,
+                        "error": {"code": ex.code, "message": ex.message}}
+        except Exception as ex:
+            # Like a batch run, one bad script shouldn't take the daemon down
+            response = {"jsonrpc": "2.0", "id": request_id,
+                        "error": {"code": self.translation_failed,
+                                  "message": ex.__class__.__name__ + ": " + str(ex)}}
+
+        # Notifications have no id and never get a response
+        if notification:
+            return None
+
+        return response
+
+    def handle_line(self, line):
+        """
+        Decodes one line of JSON and runs it as a request
+
+        Parameters
+        ----------
+        line : str
+            The encoded request
+
+        Returns
+        -------
+        str
+            The encoded response, or None if there is nothing to send back
+        """
+        if len(line.strip()) == 0:
+            return None
+
+        try:
+            request = json.loads(line)
+        except ValueError as ex:
+            return json.dumps({"jsonrpc": "2.0", "id": None,
+                               "error": {"code": self.parse_error,
+                                         "message": "Parse error: " + str(ex)}})
+
+        response = self.handle_request(request)
+        if response is None:
+            return None
+
+        return json.dumps(response)
+
+    def serve_stream(self, input_stream, output_stream):
+        """
+        Answers requests read line by line from a stream, such as stdin,
+        until the stream ends or the daemon is shut down
+
+        Parameters
+        ----------
+        input_stream : file object
+            Text stream to read requests from
+        output_stream : file object
+            Text stream to write responses to
+        """
+        for line in input_stream:
+            response = self.handle_line(line)
+            if response is not None:
+                output_stream.write(response + "\n")
+                output_stream.flush()
+            if not self.running:
+                break
+
+    def serve_socket(self, socket_path):
+        """
+        Answers requests sent over a Unix socket until the daemon is shut
+        down. Connections are handled one at a time, each sending any number
+        of requests
+
+        Parameters
+        ----------
+        socket_path : str
+            Path to create the socket at. A socket left behind by a previous
+            daemon is replaced
+        """
+        try:
+            if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                os.remove(socket_path)
+        except FileNotFoundError:
+            pass
+
+        server = socketserver.UnixStreamServer(socket_path, DaemonRequestHandler)
+        server.translation_daemon = self
+        try:
+            while self.running:
+                server.handle_request()
+        finally:
+            server.server_close()
+            os.remove(socket_path)
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Answers the requests sent over one connection to the daemon socket
+    """
+
+    def handle(self):
+        """
+        Reads requests line by line until the client disconnects or the
+        daemon is shut down
+        """
+        daemon = self.server.translation_daemon
+        for line in self.rfile:
+            response = daemon.handle_line(line.decode())
+            if response is not None:
+                self.wfile.write((response + "\n").encode())
+                self.wfile.flush()
+            if not daemon.running:
+                break
@@ -0,0 +1,173 @@
+import contextlib
+import json
+import sys
+import time
+
+
+class TranslationProfiler():
+    """
+    Records where the time of a translation goes. Each phase of the
+    translation is timed along with the net change in allocated memory
+    blocks over it, and every AST node handler the analyzer dispatches to is
+    counted and timed. Each report covers one translation, so a profiler can
+    be shared by translations run one after another
+    """
+
+    def __init__(self, callback=None):
+        """
+        Constructs a TranslationProfiler object
+
+        Parameters
+        ----------
+        callback : function
+            Called with the report of each finished translation, for example
+            to send it on to a metrics pipeline
+        """
+        self.callback = callback
+
+        # Stored as a dictionary of {Phase Name: dict of measurements}
+        self.phases = {}
+
+        # Stored as a dictionary of {Node Type Name: dict of measurements}
+        self.nodes = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Measures the code run inside a with block as one phase. Phases that
+        run more than once, like analysis during an incremental run, add up.
+        The net allocated blocks are the blocks allocated by the phase less
+        the ones it freed, so a phase that frees more than it keeps has a
+        negative count
+
+        Parameters
+        ----------
+        name : str
+            Name of the phase
+        """
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            record = self.phases.get(name)
+            if record is None:
+                record = self.phases[name] = {"calls": 0, "seconds": 0.0,
+                                              "net_allocated_blocks": 0}
+            record["calls"] += 1
+            record["seconds"] += seconds
+            record["net_allocated_blocks"] += sys.getallocatedblocks() - blocks
+
+    def wrap_handler(self, node_type, handler):
+        """
+        Wraps an analyzer handler so every call to it is counted and timed.
+        The time includes the handlers of any nodes nested inside
+
+        Parameters
+        ----------
+        node_type : type
+            The ast node class the handler translates
+        handler : function
+            The handler to wrap
+
+        Returns
+        -------
+        function
+            The wrapped handler, called the same way as the original
+        """
+        record = self.nodes.get(node_type.__name__)
+        if record is None:
+            record = self.nodes[node_type.__name__] = {"count": 0, "seconds": 0.0}
+
+        def profiled_handler(*args):
+            start = time.perf_counter()
+            try:
+                return handler(*args)
+            finally:
+                record["count"] += 1
+                record["seconds"] += time.perf_counter() - start
+
+        return profiled_handler
+
+    def get_report(self, script_path=None):
+        """
+        Gets everything recorded so far
+
+        Parameters
+        ----------
+        script_path : str
+            Path to the script that was translated
+
+        Returns
+        -------
+        dict
+            The script path, the total time, and the measurements of each
+            phase and node type
+        """
+        return {"script_path": script_path,
+                "seconds": sum(record["seconds"] for record in self.phases.values()),
+                "phases": {name: dict(record) for name, record in self.phases.items()},
+                "nodes": {name: dict(record) for name, record in self.nodes.items()
+                          if record["count"] > 0}}
+
+    def get_json_report(self, script_path=None):
+        """
+        Gets everything recorded so far as JSON
+
+        Parameters
+        ----------
+        script_path : str
+            Path to the script that was translated
+
+        Returns
+        -------
+        str
+            The report on a single line
+        """
+        return json.dumps(self.get_report(script_path))
+
+    def finish(self, script_path=None):
+        """
+        Hands the report of a finished translation to the callback and
+        starts over for the next translation
+
+        Parameters
+        ----------
+        script_path : str
+            Path to the script that was translated
+
+        Returns
+        -------
+        dict
+            The report
+        """
+        report = self.get_report(script_path)
+        self.phases = {}
+        self.nodes = {}
+        if self.callback is not None:
+            self.callback(report)
+
+        return report
+
+
+def profile_phase(profiler, name):
+    """
+    Measures a phase if profiling is enabled
+
+    Parameters
+    ----------
+    profiler : TranslationProfiler
+        The profiler to record the phase in, or None to not profile
+    name : str
+        Name of the phase
+
+    Returns
+    -------
+    context manager
+        Used in a with block around the phase
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+
+    return profiler.phase(name)
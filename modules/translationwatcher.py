@@ -0,0 +1,221 @@
+import os
+import time
+from modules import incrementalstate
+from modules import pybatchtranslator
+from modules import pytranslator
+
+
+class TranslationWatcher():
+    """
+    Watches source trees and translates each script again whenever it is
+    saved. The tree is polled for changed modification times and sizes, and a
+    burst of saves is only translated once it has settled. The analysis of
+    every script is kept warm in memory, so a save only costs the functions
+    that changed, and output files whose text is the same are left untouched
+    """
+
+    def __init__(self, sources, output_path, poll_interval=0.5, debounce=0.2,
+                 callback=None, unit_size=None, build=None, context=None):
+        """
+        Constructs a TranslationWatcher object
+
+        Parameters
+        ----------
+        sources : list of str
+            Directories, python files or glob patterns to watch
+        output_path : str
+            Path to the directory the source layout will be mirrored under
+        poll_interval : float
+            Seconds between checks of the sources
+        debounce : float
+            Seconds the sources must go without changing before the changed
+            scripts are translated
+        callback : function
+            Called with the summaries of the scripts translated after each
+            change. None ignores them
+        unit_size : int
+            Target number of code lines in each output .cpp file. None writes
+            a single file per script
+        build : BuildGenerator
+            Generates a build description for each script. None leaves
+            building to the caller
+        context : TranslationContext
+            Tables to translate every script with. None uses the defaults
+        """
+        self.batch = pybatchtranslator.PyBatchTranslator(sources, output_path,
+                                                         unit_size=unit_size, build=build,
+                                                         context=context)
+
+        self.poll_interval = poll_interval
+
+        self.debounce = debounce
+
+        self.callback = callback
+
+        # Modification time and size of each script when it was last
+        # translated, stored as a dictionary of {Script Path: (mtime, size)}
+        self.snapshot = {}
+
+        # Analysis of the last run of each script, stored as a dictionary of
+        # {Script Path: IncrementalState}
+        self.states = {}
+
+        # Settings key of the incremental states, the same for every script
+        self.settings_key = None
+
+        # Cleared by the stop method to stop watching
+        self.running = True
+
+    def scan(self):
+        """
+        Checks the sources for scripts that were added or changed since they
+        were last translated. Scripts that were removed are forgotten
+
+        Returns
+        -------
+        dict of {str: (str, (int, int))}
+            The output directory and current modification time and size of
+            each changed script, keyed by its path
+        """
+        changed = {}
+        found = set()
+        for script_path, output_path in self.batch.find_scripts():
+            try:
+                stat_result = os.stat(script_path)
+            except FileNotFoundError:
+                continue
+            found.add(script_path)
+
+            signature = (stat_result.st_mtime_ns, stat_result.st_size)
+            if self.snapshot.get(script_path) != signature:
+                changed[script_path] = (output_path, signature)
+
+        for script_path in set(self.snapshot) - found:
+            del self.snapshot[script_path]
+            self.states.pop(script_path, None)
+
+        return changed
+
+    def wait_for_changes(self):
+        """
+        Polls the sources until scripts change and then stop changing for the
+        debounce time, so a burst of saves is translated once
+
+        Returns
+        -------
+        dict of {str: (str, (int, int))}
+            The output directory and settled modification time and size of
+            each changed script, keyed by its path. Empty if the watcher was
+            stopped first
+        """
+        changed = self.scan()
+        while self.running and len(changed) == 0:
+            time.sleep(self.poll_interval)
+            changed = self.scan()
+
+        while self.running:
+            time.sleep(self.debounce)
+            settled = self.scan()
+            if settled == changed:
+                break
+            changed = settled
+
+        return changed
+
+    def translate_script(self, script_path, output_path):
+        """
+        Translates one script with its warm state, writing only the output
+        files that changed
+
+        Parameters
+        ----------
+        script_path : str
+            Path to the python file to be converted
+        output_path : str
+            Path to the directory the output files belong in
+
+        Returns
+        -------
+        dict
+            Summary of the translation with the script path, output path,
+            whether it succeeded, the number of TODO lines, any error message,
+            the output files that were written and the functions that were
+            reused from the previous run
+        """
+        summary = {"script_path": script_path, "output_path": output_path,
+                   "success": False, "todo_count": 0, "error": "",
+                   "written_files": [], "reused_functions": []}
+
+        try:
+            translator = pytranslator.PyTranslator(script_path,
+                                                   os.path.join(output_path, ""),
+                                                   verbose=False,
+                                                   context=self.batch.context,
+                                                   unit_size=self.batch.unit_size,
+                                                   build=self.batch.build)
+            if self.settings_key is None:
+                self.settings_key = translator.get_cache_key(b"")
+            state = self.states.get(script_path)
+            if state is None:
+                state = self.states[script_path] \
+                    = incrementalstate.IncrementalState(self.settings_key)
+            translator.incremental_state = state
+
+            os.makedirs(output_path, exist_ok=True)
+            translator.run()
+
+            summary["written_files"] = [filename for filename in translator.written_files
+                                        if filename not in translator.unchanged_files]
+
+            summary["todo_count"] = translator.get_todo_count()
+            summary["reused_functions"] = sorted(translator.reused_functions)
+            summary["success"] = True
+
+        except Exception as ex:
+            # A failed run can leave the reused functions half updated, and
+            # one bad save shouldn't stop the watcher
+            self.states.pop(script_path, None)
+            summary["error"] = ex.__class__.__name__ + ": " + str(ex)
+
+        return summary
+
+    def translate_changed(self, changed):
+        """
+        Translates the changed scripts and records them as up to date
+
+        Parameters
+        ----------
+        changed : dict of {str: (str, (int, int))}
+            The changed scripts, as returned by scan
+
+        Returns
+        -------
+        list of dict
+            One summary per script, in the order the scripts were found
+        """
+        summaries = []
+        for script_path, (output_path, signature) in changed.items():
+            summaries.append(self.translate_script(script_path, output_path))
+            self.snapshot[script_path] = signature
+
+        return summaries
+
+    def run(self):
+        """
+        Translates every script, then keeps translating the scripts that
+        change until the watcher is stopped
+        """
+        while self.running:
+            changed = self.wait_for_changes()
+            if len(changed) == 0:
+                continue
+
+            summaries = self.translate_changed(changed)
+            if self.callback is not None:
+                self.callback(summaries)
+
+    def stop(self):
+        """
+        Stops the watcher once the current translations finish
+        """
+        self.running = False
@@ -0,0 +1,349 @@
+class TypeVariable():
+    """
+    This class represents the unknown type of a variable, parameter, return
+    value or expression. Type variables that must share a type are merged
+    into one set, and the root of each set holds the type of the whole set
+    along with the sets its type flows into
+    """
+
+    __slots__ = ("parent", "rank", "py_type", "successors", "constant",
+                 "element", "key")
+
+    def __init__(self, py_type=None, constant=False):
+        """
+        Constructs a TypeVariable object
+
+        Parameters
+        ----------
+        py_type : str
+            The python type known so far. None means nothing is known yet
+        constant : bool
+            Whether this is the type of a literal value, which never changes
+            and can be shared between any number of translations
+        """
+        # The set this variable was merged into, or None for the root
+        self.parent = None
+
+        # Upper bound on the depth of the set, used to keep the sets shallow
+        self.rank = 0
+
+        self.py_type = py_type
+
+        # Type variables whose type must be at least this one, stored as a
+        # list only while the solver has flows leaving this variable
+        self.successors = None
+
+        self.constant = constant
+
+        # Type of the items of a container, kept on the root of the set. None
+        # for anything that isn't a container
+        self.element = None
+
+        # Type of the keys of a mapping, kept on the root of the set like the
+        # item type
+        self.key = None
+
+    def find(self):
+        """
+        Finds the root of the set this variable belongs to, pointing every
+        variable passed on the way directly at the root so later lookups are
+        quicker
+
+        Returns
+        -------
+        TypeVariable
+            The root of the set
+        """
+        root = self
+        while root.parent is not None:
+            root = root.parent
+
+        node = self
+        while node.parent is not None and node.parent is not root:
+            node.parent, node = root, node.parent
+
+        return root
+
+    def get_type(self, default="auto"):
+        """
+        Gets the python type of this variable
+
+        Parameters
+        ----------
+        default : str
+            The type to use if nothing is known about this variable
+
+        Returns
+        -------
+        str
+            Name of the python type
+        """
+        py_type = self.find().py_type
+        if py_type is None:
+            return default
+
+        return py_type
+
+    def holds_type(self, py_type):
+        """
+        Checks whether this is a type, or a container with items or keys of
+        that type at any depth
+
+        Parameters
+        ----------
+        py_type : str
+            Name of the python type
+
+        Returns
+        -------
+        bool
+            Whether the type is used
+        """
+        root = self.find()
+        if root.get_type() == py_type:
+            return True
+
+        return any(inner_type is not None and inner_type.holds_type(py_type)
+                   for inner_type in (root.element, root.key))
+
+    def get_cpp_type(self, types):
+        """
+        Gets the C++ type to declare this variable with. Containers are
+        mapped to a template that the types of their items and keys are
+        filled in to
+
+        Parameters
+        ----------
+        types : dict of {str: str}
+            Python type names mapped to C++ types
+
+        Returns
+        -------
+        str
+            The C++ type, ending with a space
+        """
+        cpp_type = types[self.get_type()]
+
+        root = self.find()
+        if root.element is not None and "{item}" in cpp_type:
+            cpp_type = cpp_type.replace("{item}", root.element.get_cpp_type(types).rstrip())
+        if root.key is not None and "{key}" in cpp_type:
+            cpp_type = cpp_type.replace("{key}", root.key.get_cpp_type(types).rstrip())
+
+        return cpp_type
+
+
+class TypeSolver():
+    """
+    Constraint solver that works out the types of a translation. The analyzer
+    adds a flow from each value to wherever it is stored, meaning the type of
+    the target must be able to hold the type of the value, and unifies type
+    variables that must be equal. The types of the targets are raised as
+    flows are added, so they always hold the narrowest types satisfying
+    every constraint added so far
+    """
+
+    def __init__(self, join):
+        """
+        Constructs a TypeSolver object
+
+        Parameters
+        ----------
+        join : function
+            Called with the names of two types and returns the name of the
+            narrowest type that can hold both
+        """
+        self.join = join
+
+        # Roots that have had flows added from them, so their edges can be
+        # released once the types are solved
+        self.sources = []
+
+    def join_types(self, type_a, type_b):
+        """
+        Joins two types, either of which may be unknown
+
+        Parameters
+        ----------
+        type_a : str
+            One of the types to join, or None
+        type_b : str
+            The other type to join, or None
+
+        Returns
+        -------
+        str
+            The joined type, or None if both are unknown
+        """
+        if type_a is None or type_a == type_b:
+            return type_b
+        if type_b is None:
+            return type_a
+
+        return self.join(type_a, type_b)
+
+    def add_flow(self, source, target):
+        """
+        Requires the type of the target to be able to hold the type of the
+        source, raising the type of the target and everything it flows into
+        if needed
+
+        Parameters
+        ----------
+        source : TypeVariable
+            The type of the value
+        target : TypeVariable
+            The type of where the value is stored
+        """
+        if target.constant:
+            raise ValueError("The type of a literal can't be changed")
+
+        source = source.find()
+        target = target.find()
+        if source is target:
+            return
+
+        # C++ containers can't be converted to ones holding other types, so a
+        # container shares its item type with wherever it is stored
+        if source.element is not None or source.key is not None:
+            self.unify_elements(source, target)
+
+        # Literal types never change, so there's nothing to propagate later
+        if not source.constant:
+            if source.successors is None:
+                source.successors = []
+                self.sources.append(source)
+            source.successors.append(target)
+
+        self.raise_type(target, source.py_type)
+
+    def raise_type(self, variable, py_type):
+        """
+        Joins a type into a variable and passes any change on to the
+        variables it flows into. Each type can only rise a few times, so the
+        total work stays proportional to the number of flows
+
+        Parameters
+        ----------
+        variable : TypeVariable
+            Root of the set to raise the type of
+        py_type : str
+            The type to join in
+        """
+        joined_type = self.join_types(variable.py_type, py_type)
+        if joined_type == variable.py_type:
+            return
+        variable.py_type = joined_type
+
+        worklist = [variable]
+        while len(worklist) > 0:
+            node = worklist.pop()
+            if node.successors is None:
+                continue
+
+            for successor in node.successors:
+                successor = successor.find()
+                joined_type = self.join_types(successor.py_type, node.py_type)
+                if joined_type != successor.py_type:
+                    successor.py_type = joined_type
+                    worklist.append(successor)
+
+    def unify(self, type_a, type_b):
+        """
+        Merges two type variables into one set so they always share a type
+
+        Parameters
+        ----------
+        type_a : TypeVariable
+            One of the variables to merge
+        type_b : TypeVariable
+            The other variable to merge
+
+        Returns
+        -------
+        TypeVariable
+            The root of the merged set
+        """
+        if type_a.constant or type_b.constant:
+            raise ValueError("The type of a literal can't be changed")
+
+        root_a = type_a.find()
+        root_b = type_b.find()
+        if root_a is root_b:
+            return root_a
+
+        # The shallower set goes under the deeper one
+        if root_a.rank < root_b.rank:
+            root_a, root_b = root_b, root_a
+        root_b.parent = root_a
+        if root_a.rank == root_b.rank:
+            root_a.rank += 1
+
+        if root_b.successors is not None:
+            if root_a.successors is None:
+                root_a.successors = []
+                self.sources.append(root_a)
+            root_a.successors += root_b.successors
+            root_b.successors = None
+
+        joined_type = self.join_types(root_a.py_type, root_b.py_type)
+        changed = joined_type != root_a.py_type or joined_type != root_b.py_type
+        root_a.py_type = joined_type
+
+        # Whichever half gained a type passes it on to the merged successors
+        if changed:
+            self.propagate(root_a)
+
+        if root_b.element is not None or root_b.key is not None:
+            self.unify_elements(root_b, root_a)
+
+        return root_a
+
+    def unify_elements(self, source, target):
+        """
+        Makes the items and keys of two containers share their types, giving
+        the target the types of the source where it has none yet
+
+        Parameters
+        ----------
+        source : TypeVariable
+            Root of the set with the item type to share
+        target : TypeVariable
+            Root of the set to share it with
+        """
+        if target.element is None:
+            target.element = source.element
+        elif source.element is not None:
+            self.unify(source.element, target.element)
+
+        if target.key is None:
+            target.key = source.key
+        elif source.key is not None:
+            self.unify(source.key, target.key)
+
+    def propagate(self, variable):
+        """
+        Passes the type of a variable on to everything it flows into
+
+        Parameters
+        ----------
+        variable : TypeVariable
+            Root of the set to propagate from
+        """
+        if variable.successors is None:
+            return
+
+        for successor in variable.successors:
+            self.raise_type(successor.find(), variable.py_type)
+
+    def solve(self):
+        """
+        Finishes solving once every flow has been added. Types are raised as
+        flows are added, so they are already at their fixed point and all
+        that's left is to release the flows. This leaves each type variable
+        holding only its solved type, so finished functions can be kept for
+        a later run without the rest of the graph
+        """
+        for source in self.sources:
+            source.successors = None
+        self.sources = []
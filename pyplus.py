@@ -1,8 +1,24 @@
+import argparse
+import json
 import os
+import sys
+from modules import buildgenerator
+from modules import compilechecker
+from modules import incrementalstate
 from modules import pytranslator
+from modules import pybatchtranslator
+from modules import pysource
+from modules import translationcache
+from modules import translationcontext
+from modules import translationdaemon
+from modules import translationprofiler
+from modules import translationwatcher
 
 
-def convert(script_path, output_path):
+def convert(script_path, output_path, cache_path=None,
+            cache_size=512 * 1024 * 1024, incremental=False,
+            profile_callback=None, unit_size=None, build=None, context=None,
+            line_directives=False):
     """
     The entry point of the translator. Call this function to translate a
     python script to C++
@@ -13,6 +29,37 @@ def convert(script_path, output_path):
         The relative path to the script to convert
     output_path : str
         The relative path to the directory to output to
+    cache_path : str
+        The relative path to a translation cache directory. None disables
+        caching
+    cache_size : int
+        Number of bytes the cache may hold before old entries are evicted
+    incremental : bool
+        Whether to only analyze the functions that changed since the last
+        run, using the state saved in the output directory
+    profile_callback : function
+        Called with a report of where the time of the translation went. None
+        turns profiling off
+    unit_size : int
+        Target number of code lines in each output .cpp file. The functions
+        are then split across several files sharing a .hpp header. None
+        writes a single main.cpp
+    build : BuildGenerator
+        Generates a build description next to the output, such as a
+        CMakeLists.txt. None leaves building to the caller
+    context : TranslationContext
+        Tables to translate with, such as the C++ type each python type is
+        declared with. None uses the defaults
+    line_directives : bool
+        Whether to put #line directives in the output so compiler messages
+        name the python lines the C++ came from
+
+    Returns
+    -------
+    dict
+        Summary of the translation with the script path, output path, the
+        number of TODO lines, the files that were written and which of them
+        are .cpp units of translated code
     """
 
     # Reference for getting absolute path of relative path file
@@ -20,10 +67,410 @@ def convert(script_path, output_path):
     # https://stackoverflow.com/questions/7165749/
     #         open-file-in-a-relative-location-in-python
     full_path = os.path.dirname(__file__)
+    cache = None
+    if cache_path is not None:
+        cache = translationcache.TranslationCache(os.path.join(full_path, cache_path),
+                                                  cache_size)
+    profiler = None
+    if profile_callback is not None:
+        profiler = translationprofiler.TranslationProfiler(profile_callback)
     translator = pytranslator.PyTranslator(os.path.join(full_path, script_path),
-                                           os.path.join(full_path, output_path))
+                                           os.path.join(full_path, output_path, ""),
+                                           cache=cache, profiler=profiler,
+                                           unit_size=unit_size, build=build,
+                                           context=context,
+                                           line_directives=line_directives)
+    if incremental:
+        state_path = os.path.join(full_path, output_path,
+                                  incrementalstate.IncrementalState.state_filename)
+        translator.incremental_state = incrementalstate.IncrementalState.load(
+            state_path, translator.get_cache_key(b""))
+
     translator.run()
 
+    if incremental:
+        translator.incremental_state.save(state_path)
+
+    if cache is not None:
+        cache.evict()
+
+    return {"script_path": translator.script_path, "output_path": translator.output_path,
+            "success": True, "todo_count": translator.get_todo_count(), "error": "",
+            "files": translator.written_files, "units": translator.unit_files}
+
+
+def translate_source(text, script_name="<string>", incremental_state=None,
+                     profile_callback=None, context=None):
+    """
+    Translates a python script held in memory to C++ without touching the
+    disk. Every call works on its own objects, so it can be called any number
+    of times in one process, including from many threads at once
+
+    Parameters
+    ----------
+    text : str or bytes
+        The python script to convert
+    script_name : str
+        Name of the script, used in profiling reports
+    incremental_state : IncrementalState
+        State of the previous translation of this script, so only the
+        functions that changed are analyzed. None analyzes the whole script
+    profile_callback : function
+        Called with a report of where the time of the translation went. None
+        turns profiling off
+    context : TranslationContext
+        Tables to translate with, such as the C++ type each python type is
+        declared with. None uses the defaults
+
+    Returns
+    -------
+    dict of {str: str}
+        The C++ text of each output file, keyed by its file name
+    """
+    profiler = None
+    if profile_callback is not None:
+        profiler = translationprofiler.TranslationProfiler(profile_callback)
+    translator = pytranslator.PyTranslator(script_name, "", verbose=False,
+                                           incremental_state=incremental_state,
+                                           profiler=profiler,
+                                           source=pysource.PySource.from_text(text),
+                                           context=context)
+
+    return translator.translate()
+
+
+def convert_batch(sources, output_path, jobs=None, cache_path=None,
+                  cache_size=512 * 1024 * 1024, incremental=False,
+                  profile_callback=None, unit_size=None, build=None,
+                  context=None, line_directives=False):
+    """
+    Translates whole source trees to C++ using a pool of worker processes.
+    The layout of the sources is mirrored under the output directory, with
+    one directory per script
+
+    Parameters
+    ----------
+    sources : list of str
+        Relative paths to directories, scripts or glob patterns to convert
+    output_path : str
+        The relative path to the directory to output to
+    jobs : int
+        Number of worker processes to use. Defaults to the core count
+    cache_path : str
+        The relative path to a translation cache directory. None disables
+        caching
+    cache_size : int
+        Number of bytes the cache may hold before old entries are evicted
+    incremental : bool
+        Whether each script should only analyze the functions that changed
+        since its last run
+    profile_callback : function
+        Called with a report of where the time went for each script. None
+        turns profiling off
+    unit_size : int
+        Target number of code lines in each output .cpp file. None writes a
+        single main.cpp per script
+    build : BuildGenerator
+        Generates a build description for each script. None leaves building
+        to the caller
+    context : TranslationContext
+        Tables to translate every script with. None uses the defaults
+    line_directives : bool
+        Whether to put #line directives in the output so compiler messages
+        name the python lines the C++ came from
+
+    Returns
+    -------
+    list of dict
+        One summary per script with its paths, whether it succeeded, the
+        number of TODO lines, any error message and the files it wrote
+    """
+    full_path = os.path.dirname(__file__)
+    cache = None
+    if cache_path is not None:
+        cache = translationcache.TranslationCache(os.path.join(full_path, cache_path),
+                                                  cache_size)
+    batch = pybatchtranslator.PyBatchTranslator([os.path.join(full_path, source)
+                                                 for source in sources],
+                                                os.path.join(full_path, output_path),
+                                                jobs, cache, incremental,
+                                                profile_callback, unit_size, build,
+                                                context, line_directives)
+    return batch.run()
+
+
+def check(translations, jobs=None, cache_path=None, compiler="g++", full=False):
+    """
+    Checks that the files written by a translation compile, running the
+    compiler on every script across a pool of worker processes. Scripts
+    translated with #line directives have their compiler messages reported at
+    the python lines the C++ came from
+
+    Parameters
+    ----------
+    translations : list of dict
+        The summaries returned by convert or convert_batch. Scripts that
+        failed to translate are left out
+    jobs : int
+        Number of worker processes to use. Defaults to the core count
+    cache_path : str
+        The relative path to a directory to cache results in, so only
+        translations that changed are compiled again. None disables caching
+    compiler : str
+        The C++ compiler to run
+    full : bool
+        Whether to compile the code instead of only checking its syntax
+
+    Returns
+    -------
+    list of dict
+        One summary per script with its path, whether it compiled, the
+        compiler messages and any error that stopped the check
+    """
+    full_path = os.path.dirname(__file__)
+    if cache_path is not None:
+        cache_path = os.path.join(full_path, cache_path)
+    checker = compilechecker.CompileChecker([translation for translation in translations
+                                             if translation["success"]],
+                                            jobs, cache_path, compiler, full)
+    return checker.run()
+
+
+def serve(socket_path=None, unit_size=None, build=None, context=None):
+    """
+    Runs a translation daemon that keeps the translator loaded and answers
+    JSON-RPC translate requests, one per line, until it is shut down
+
+    Parameters
+    ----------
+    socket_path : str
+        Path of a Unix socket to listen on. None reads requests from stdin and
+        writes the responses to stdout
+    unit_size : int
+        Target number of code lines in each output .cpp file. None writes a
+        single main.cpp per script
+    build : BuildGenerator
+        Generates a build description for each script. None leaves building
+        to the caller
+    context : TranslationContext
+        Tables to translate every script with. None uses the defaults
+    """
+    daemon = translationdaemon.TranslationDaemon(unit_size, build, context)
+    if socket_path is None:
+        daemon.serve_stream(sys.stdin, sys.stdout)
+    else:
+        daemon.serve_socket(socket_path)
+
+
+def watch(sources, output_path, poll_interval=0.5, callback=None,
+          unit_size=None, build=None, context=None):
+    """
+    Translates whole source trees to C++ and then keeps translating each
+    script that changes until interrupted. Only the functions that changed
+    are analyzed again and output files that come out the same aren't
+    rewritten
+
+    Parameters
+    ----------
+    sources : list of str
+        Relative paths to directories, scripts or glob patterns to watch
+    output_path : str
+        The relative path to the directory to output to
+    poll_interval : float
+        Seconds between checks of the sources
+    callback : function
+        Called with the summaries of the scripts translated after each change
+    unit_size : int
+        Target number of code lines in each output .cpp file. None writes a
+        single main.cpp per script
+    build : BuildGenerator
+        Generates a build description for each script. None leaves building
+        to the caller
+    context : TranslationContext
+        Tables to translate every script with. None uses the defaults
+    """
+    full_path = os.path.dirname(__file__)
+    watcher = translationwatcher.TranslationWatcher([os.path.join(full_path, source)
+                                                     for source in sources],
+                                                    os.path.join(full_path, output_path),
+                                                    poll_interval, callback=callback,
+                                                    unit_size=unit_size, build=build,
+                                                    context=context)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+def print_batch_summary(summaries):
+    """
+    Prints a per script report of a batch translation followed by totals
+
+    Parameters
+    ----------
+    summaries : list of dict
+        The summaries returned by convert_batch
+    """
+    todo_total = 0
+    failed = 0
+    for summary in summaries:
+        if summary["success"]:
+            todo_total += summary["todo_count"]
+            print("OK     " + summary["script_path"] + " ("
+                  + str(summary["todo_count"]) + " TODO)")
+        else:
+            failed += 1
+            print("FAILED " + summary["script_path"] + ": " + summary["error"])
+
+    print(str(len(summaries) - failed) + " of " + str(len(summaries))
+          + " scripts translated, " + str(todo_total) + " TODO lines")
+
+
+def print_check_summary(summaries):
+    """
+    Prints the compiler messages of a compile check at their python lines,
+    followed by totals
+
+    Parameters
+    ----------
+    summaries : list of dict
+        The summaries returned by check
+    """
+    failed = 0
+    for summary in summaries:
+        if summary["error"] != "":
+            failed += 1
+            print("FAILED " + summary["script_path"] + ": " + summary["error"])
+            continue
+        if not summary["success"]:
+            failed += 1
+        for diagnostic in summary["diagnostics"]:
+            location = summary["script_path"]
+            if diagnostic["line"] is not None:
+                location += ":" + str(diagnostic["line"])
+            print(location + ": " + diagnostic["severity"] + ": " + diagnostic["message"])
+
+    print(str(len(summaries) - failed) + " of " + str(len(summaries))
+          + " translations compiled")
+
 
 if __name__ == "__main__":
-    convert("examples/example_assignment.py", "output/")
+    parser = argparse.ArgumentParser(description="Translate python scripts to C++")
+    parser.add_argument("sources", nargs="*",
+                        help="directories, scripts or glob patterns to translate")
+    parser.add_argument("-o", "--output", default="output/",
+                        help="directory to write the translated files to")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes, defaults to the core count")
+    parser.add_argument("--cache-dir", default=None,
+                        help="translation cache directory, defaults to "
+                             ".pyplus_cache in the output directory")
+    parser.add_argument("--cache-size", type=int, default=512,
+                        help="size limit of the translation cache in MB")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always translate, ignoring the translation cache")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only analyze the functions that changed since the last run")
+    parser.add_argument("--profile", default=None,
+                        help="file to append a JSON profiling report per script to")
+    parser.add_argument("--unit-size", type=int, default=None,
+                        help="split each script into .cpp files of about this many "
+                             "lines sharing a .hpp header")
+    parser.add_argument("--build", default=None,
+                        choices=list(buildgenerator.BuildGenerator.build_files),
+                        help="also generate a build description for the output")
+    parser.add_argument("--build-profile", default="release",
+                        choices=list(buildgenerator.BuildGenerator.profile_flags),
+                        help="optimization profile of the generated build")
+    parser.add_argument("--lto", action="store_true",
+                        help="use link time optimization in the generated build")
+    parser.add_argument("--unity", action="store_true",
+                        help="compile each script as a single unit in the generated build")
+    parser.add_argument("--fast-io", action="store_true",
+                        help="unsync the C++ streams from stdio so printing is faster")
+    parser.add_argument("--small-sets", type=int, default=None, metavar="N",
+                        help="turn sets only holding integers from 0 to N-1 into bitsets, "
+                             "N at most " + str(translationcontext.TranslationContext.max_small_set_size))
+    parser.add_argument("--check", action="store_true",
+                        help="also check that the translations compile")
+    parser.add_argument("--check-full", action="store_true",
+                        help="fully compile the translations when checking them")
+    parser.add_argument("--compiler", default="g++",
+                        help="C++ compiler used to check the translations")
+    parser.add_argument("--daemon", action="store_true",
+                        help="answer JSON-RPC translate requests read from stdin")
+    parser.add_argument("--socket", default=None,
+                        help="answer JSON-RPC translate requests sent to this Unix socket")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep translating the sources whenever they change")
+    parser.add_argument("--poll-interval", type=float, default=0.5,
+                        help="seconds between checks of the sources when watching")
+    arguments = parser.parse_args()
+
+    context = None
+    if arguments.fast_io or arguments.small_sets is not None:
+        try:
+            context = translationcontext.TranslationContext(fast_io=arguments.fast_io,
+                                                            small_set_size=arguments.small_sets)
+        except ValueError as ex:
+            parser.error(str(ex))
+
+    build = None
+    if arguments.build is not None:
+        build = buildgenerator.BuildGenerator(arguments.build, arguments.build_profile,
+                                              arguments.lto, arguments.unity)
+
+    if arguments.watch:
+        if len(arguments.sources) == 0:
+            parser.error("--watch needs sources to watch")
+        watch(arguments.sources, arguments.output, arguments.poll_interval,
+              print_batch_summary, arguments.unit_size, build, context)
+        sys.exit(0)
+
+    if arguments.daemon or arguments.socket is not None:
+        serve(arguments.socket, arguments.unit_size, build, context)
+        sys.exit(0)
+
+    cache_dir = arguments.cache_dir
+    if arguments.no_cache:
+        cache_dir = None
+    elif cache_dir is None:
+        cache_dir = os.path.join(arguments.output, ".pyplus_cache")
+
+    cache_size = arguments.cache_size * 1024 * 1024
+
+    # Checked translations name the python lines the C++ came from, so
+    # compiler messages can be reported there
+    checking = arguments.check or arguments.check_full
+
+    profile_file = None
+    profile_callback = None
+    if arguments.profile is not None:
+        # One report per line so runs over many files can be streamed
+        profile_file = open(arguments.profile, "a")
+
+        def profile_callback(report):
+            profile_file.write(json.dumps(report) + "\n")
+
+    try:
+        if len(arguments.sources) == 0:
+            translations = [convert("examples/example_assignment.py", arguments.output,
+                                    cache_dir, cache_size, arguments.incremental,
+                                    profile_callback, arguments.unit_size, build, context,
+                                    checking)]
+        else:
+            translations = convert_batch(arguments.sources, arguments.output,
+                                         arguments.jobs, cache_dir, cache_size,
+                                         arguments.incremental, profile_callback,
+                                         arguments.unit_size, build, context, checking)
+            print_batch_summary(translations)
+    finally:
+        if profile_file is not None:
+            profile_file.close()
+
+    if checking:
+        check_cache_dir = None
+        if not arguments.no_cache:
+            check_cache_dir = os.path.join(arguments.output, ".pyplus_check_cache")
+        print_check_summary(check(translations, arguments.jobs, check_cache_dir,
+                                  arguments.compiler, arguments.check_full))